@@ -31,6 +31,7 @@ import time
 from ikalog import inputs
 from ikalog.engine import IkaEngine
 from ikalog.utils import config_loader
+from ikalog.utils.debug_artifacts import get_debug_artifacts
 from ikalog.logger import init_logger
 
 
@@ -60,8 +61,14 @@ def get_args():
                         dest='statink_payload', type=str,
                         help='Payload file to stat.ink. '
                         'If this is specified, the data is not uploaded.')
+    parser.add_argument('--frame_rate', dest='frame_rate', type=float,
+                        help='Frame rate to analyze. '
+                        'Other frames of recorded videos are not decoded.')
     parser.add_argument('--profile', dest='profile', action='store_true',
                         default=False)
+    parser.add_argument('--trace', dest='trace', type=str,
+                        help='Write the latest spans of the engine into a '
+                        'Chrome trace-event JSON file.')
     parser.add_argument('--time', '-t', dest='time', type=str)
     parser.add_argument('--time_msec', dest='time_msec', type=int)
     parser.add_argument('--video_id', dest='video_id', type=str)
@@ -69,6 +76,9 @@ def get_args():
                         help='Do not exit on EOFError with no next inputs.')
     parser.add_argument('--debug', dest='debug', action='store_true',
                         default=False)
+    parser.add_argument('--debug_artifacts', dest='debug_artifacts',
+                        type=str,
+                        help='Write debug images of scenes to the directory.')
 
     return vars(parser.parse_args())
 
@@ -88,13 +98,16 @@ if __name__ == "__main__":
     signal.signal(signal.SIGINT, signal_handler)
 
     args = get_args()
+    if args.get('debug_artifacts'):
+        get_debug_artifacts().enable(args['debug_artifacts'])
+
     capture, output_plugins = config_loader.config(args)
     capture.set_pos_msec(get_pos_msec(args))
 
     keep_alive = args.get('keep_alive') or capture.keep_alive
 
     engine = IkaEngine(enable_profile=args.get('profile'),
-                       keep_alive=keep_alive)
+                       keep_alive=keep_alive, trace_file=args.get('trace'))
     engine.pause(False)
     engine.set_capture(capture)
 
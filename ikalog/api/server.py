@@ -21,6 +21,7 @@
 from http.server import HTTPServer, SimpleHTTPRequestHandler
 import json
 import logging
+import threading
 import time
 
 import ikalog.constants
@@ -31,12 +32,28 @@ import cv2
 import numpy as np
 import umsgpack
 
-weapons = WeaponClassifier()
-weapons.load_model_from_file()
+_models = {}
+_models_lock = threading.Lock()
 
-abilities = GearPowerRecoginizer()
-abilities.load_model_from_file()
-abilities.knn_train()
+
+def _get_weapon_classifier():
+    # Models are loaded on the first request, not at import.
+    with _models_lock:
+        if 'weapons' not in _models:
+            weapons = WeaponClassifier()
+            weapons.load_model_from_file()
+            _models['weapons'] = weapons
+        return _models['weapons']
+
+
+def _get_gear_power_recoginizer():
+    with _models_lock:
+        if 'abilities' not in _models:
+            abilities = GearPowerRecoginizer()
+            abilities.load_model_from_file()
+            abilities.knn_train()
+            _models['abilities'] = abilities
+        return _models['abilities']
 
 
 class APIServer(object):
@@ -106,6 +123,7 @@ class APIServer(object):
         return response_payload
 
     def recoginize_weapons(self, payload):
+        weapons = _get_weapon_classifier()
         weapons_list = []
 
         for img_bytes in payload:
@@ -122,6 +140,7 @@ class APIServer(object):
         return response_payload
 
     def recoginize_abilities(self, payload):
+        abilities = _get_gear_power_recoginizer()
         abilities_list = []
         for img_bytes in payload:
             img = cv2.imdecode(np.fromstring(img_bytes, dtype='uint8'), 1)
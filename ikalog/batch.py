@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+"""
+Batch analysis of recorded videos with multiple processes.
+
+Each video file is a task. Long videos can be split into segments so
+that a single file also scales with the number of cores. Segments are
+cut at blank (black) frames, which appear between games, so no game
+spans two segments.
+
+Each task runs its own IkaEngine in a worker process. Recorded events
+and stat.ink payloads are merged back in the original order.
+"""
+
+import logging
+import multiprocessing
+from dataclasses import dataclass, field
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from ikalog.outputs.statink.collector import StatInkCollector
+from ikalog.outputs.statink.composer import StatInkComposer
+from ikalog.utils import IkaUtils
+
+logger = logging.getLogger()
+
+
+@dataclass
+class BatchTask:
+    index: int
+    source_file: str
+    start_msec: float = 0
+    end_msec: Optional[float] = None  # None: until EOF
+
+
+@dataclass
+class BatchResult:
+    task: BatchTask
+    events: list = field(default_factory=list)
+    payloads: list = field(default_factory=list)
+    num_sessions: int = 0
+
+
+def _is_blank_frame(frame):
+    # Same criteria as the Blank scene.
+    if frame.shape[0] != 720:
+        frame = cv2.resize(frame, (1280, 720))
+
+    if np.amax(frame[230 + 150:, :frame.shape[1] - 190, :]) >= 16:
+        return False
+    return np.amax(frame[230:230 + 350, :, :]) < 16
+
+
+def find_split_points(source_file, segment_msec, probe_interval_msec=1000):
+    """
+    Find positions to split the video into segments.
+
+    Starting from every |segment_msec|, the video is probed each
+    |probe_interval_msec| for a blank frame. The first blank frame found
+    is a split point, and the next segment is measured from there.
+
+    Args:
+        source_file: Path to the video file.
+        segment_msec: Preferred length of a segment in msec.
+        probe_interval_msec: Interval of probing in msec.
+    Returns:
+        A list of split positions in msec.
+    """
+    video_capture = cv2.VideoCapture(source_file)
+    if not video_capture.isOpened():
+        logger.error('%s: failed to open %s' % (__name__, source_file))
+        return []
+
+    fps = video_capture.get(cv2.CAP_PROP_FPS)
+    num_frames = video_capture.get(cv2.CAP_PROP_FRAME_COUNT)
+    if not (fps > 0 and num_frames > 0):
+        video_capture.release()
+        return []
+    duration_msec = num_frames / fps * 1000
+
+    split_points = []
+    target_msec = segment_msec
+    while target_msec < duration_msec:
+        found_msec = None
+        probe_msec = target_msec
+        while probe_msec < min(target_msec + segment_msec, duration_msec):
+            video_capture.set(cv2.CAP_PROP_POS_MSEC, probe_msec)
+            ret, frame = video_capture.read()
+            if not ret:
+                break
+
+            if _is_blank_frame(frame):
+                found_msec = probe_msec
+                break
+            probe_msec += probe_interval_msec
+
+        if found_msec is None:
+            # No blank frame in this window; extend the current segment.
+            target_msec += segment_msec
+            continue
+
+        split_points.append(found_msec)
+        target_msec = found_msec + segment_msec
+
+    video_capture.release()
+    return split_points
+
+
+def plan_tasks(source_files, segment_msec=None, probe_interval_msec=1000):
+    """
+    Build the list of tasks for the source files.
+
+    Args:
+        source_files: List of video files.
+        segment_msec: Preferred length of a segment in msec. If None,
+            each file is a single task.
+        probe_interval_msec: See find_split_points().
+    Returns:
+        A list of BatchTask, in order of the files and positions.
+    """
+    tasks = []
+    for source_file in source_files:
+        split_points = []
+        if segment_msec:
+            split_points = find_split_points(
+                source_file, segment_msec, probe_interval_msec)
+
+        starts = [0] + split_points
+        ends = split_points + [None]
+        for start_msec, end_msec in zip(starts, ends):
+            tasks.append(BatchTask(
+                index=len(tasks),
+                source_file=source_file,
+                start_msec=start_msec,
+                end_msec=end_msec,
+            ))
+    return tasks
+
+
+class BatchEventRecorder(object):
+    """
+    Record game events with the time and the game index.
+    """
+
+    recorded_prefixes = ('on_game_', 'on_lobby_', 'on_result_')
+
+    def on_uncaught_event(self, event_name, context):
+        if not event_name.startswith(self.recorded_prefixes):
+            return
+
+        self.events.append({
+            'event': event_name,
+            'msec': context['engine']['msec'],
+            'game_index': context['game'].get('index', 0),
+        })
+
+        if event_name in ('on_game_session_end', 'on_game_session_abort'):
+            self.num_sessions += 1
+
+    def __init__(self):
+        self.events = []
+        self.num_sessions = 0
+
+
+class BatchPayloadCollector(StatInkCollector):
+    """
+    Compose stat.ink payloads of the games, without posting them.
+    """
+
+    video_id = None
+
+    def close_game_session_handler(self, context):
+        cond = \
+            (context['game'].get('map', None) != None) or \
+            (context['game'].get('rule', None) != None) or \
+            (context['game'].get('won', None) != None)
+
+        if not cond:
+            return False
+
+        composer = StatInkComposer(self)
+        payload = composer.compose_payload(context)
+        composer.compose_agent_information(context, payload)
+
+        payload['automated'] = False
+        payload['events'] = self.events
+        self.payloads.append(payload)
+        return True
+
+    def __init__(self):
+        super(BatchPayloadCollector, self).__init__()
+        self.payloads = []
+        self._open_game_session(None)
+        self._called_close_game_session = False
+
+
+def _init_worker():
+    # Parallelism comes from the processes. Avoid oversubscription.
+    cv2.setNumThreads(1)
+
+
+def run_task(task, frame_rate=None, plugins=None):
+    """
+    Analyze a task with a new IkaEngine.
+
+    Args:
+        task: BatchTask to run.
+        frame_rate: Frame rate to analyze. None to analyze every frame.
+        plugins: Additional output plugins.
+    Returns:
+        BatchResult of the task.
+    """
+    from ikalog.engine import IkaEngine
+    from ikalog.inputs import CVFile
+
+    capture = CVFile()
+    capture.select_source(name=task.source_file)
+    capture.set_frame_rate(frame_rate)
+    if task.start_msec:
+        capture.set_pos_msec(task.start_msec)
+    capture.set_end_pos_msec(task.end_msec)
+
+    recorder = BatchEventRecorder()
+    collector = BatchPayloadCollector()
+
+    engine = IkaEngine()
+    engine.pause(False)
+    engine.close_session_at_eof = True
+    engine.set_capture(capture)
+    engine.set_plugins([recorder, collector] + list(plugins or []))
+
+    IkaUtils.dprint('%s: task %d: %s (%s - %s)' % (
+        __name__, task.index, task.source_file,
+        task.start_msec, task.end_msec))
+    engine.run()
+
+    return BatchResult(
+        task=task,
+        events=recorder.events,
+        payloads=collector.payloads,
+        num_sessions=recorder.num_sessions,
+    )
+
+
+def merge_results(results):
+    """
+    Merge the results of the tasks per source file.
+
+    Game indexes restart from zero in every segment. They are renumbered
+    so that they are sequential in the source file.
+
+    Args:
+        results: List of BatchResult in order of the tasks.
+    Returns:
+        A list of dicts with 'source_file', 'events' and 'payloads',
+        in order of the source files.
+    """
+    merged = []
+    last = None
+    game_index_offset = 0
+
+    for result in sorted(results, key=lambda r: r.task.index):
+        source_file = result.task.source_file
+        if (last is None) or (last['source_file'] != source_file):
+            last = {'source_file': source_file, 'events': [], 'payloads': []}
+            merged.append(last)
+            game_index_offset = 0
+
+        for event in result.events:
+            event = dict(event)
+            event['game_index'] += game_index_offset
+            last['events'].append(event)
+        last['payloads'].extend(result.payloads)
+
+        game_index_offset += result.num_sessions
+
+    return merged
+
+
+class BatchRunner(object):
+    """
+    Analyze recorded videos with a pool of worker processes.
+    """
+
+    def run(self, source_files):
+        """
+        Analyze the source files.
+
+        Args:
+            source_files: List of video files.
+        Returns:
+            See merge_results().
+        """
+        tasks = plan_tasks(source_files, self.segment_msec)
+        IkaUtils.dprint('%s: %d tasks, %d processes' % (
+            self, len(tasks), self.processes))
+
+        if self.processes == 1 or len(tasks) < 2:
+            results = [self._run_task(task) for task in tasks]
+        else:
+            with multiprocessing.Pool(self.processes, _init_worker) as pool:
+                results = list(pool.imap(self._run_task, tasks))
+
+        return merge_results(results)
+
+    def _run_task(self, task):
+        return run_task(task, frame_rate=self.frame_rate)
+
+    def __init__(self, processes=None, segment_msec=None, frame_rate=None):
+        """
+        Constructor
+
+        Args:
+            processes: Number of worker processes. Defaults to the
+                number of CPUs.
+            segment_msec: Preferred length of a segment in msec. None not
+                to split files.
+            frame_rate: Frame rate to analyze. None to analyze every
+                frame.
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.segment_msec = segment_msec
+        self.frame_rate = frame_rate
@@ -20,7 +20,6 @@
 
 from __future__ import print_function
 
-import copy
 import cv2
 import logging
 import pprint
@@ -29,9 +28,14 @@ import time
 import traceback
 
 from ikalog.utils import *
+from ikalog.utils.latency import get_latency_metrics
+from ikalog.utils.trace import TraceRecorder
 
 
 from .scenes.v3 import initialize_scenes
+from .scenes.scheduler import SceneScheduler, PHASE_LOBBY, PHASE_BATTLE, PHASE_RESULT
+from .scenes.circuit_breaker import SceneCircuitBreaker
+from .plugin_worker import EventSnapshotter, PluginWorker
 
 
 logger = logging.getLogger()
@@ -43,11 +47,17 @@ logger = logging.getLogger()
 
 class IkaEngine:
 
+    # Events delivered synchronously even to async plugins. Plugins
+    # register their services on on_initialize_plugin.
+    SYNC_EVENTS = ('on_initialize_plugin',)
+
     # Profiling
 
     def _profile_dump_scenes(self):
         for scene in self.scenes:
-            print('%4.3fs %s' % (scene._prof_time_took, scene))
+            p = scene._prof_histogram.percentiles((0.5, 0.99)) or [0.0, 0.0]
+            print('%4.3fs p50 %.2fms p99 %.2fms %s' % (
+                scene._prof_time_took, p[0] * 1000, p[1] * 1000, scene))
 
     def _profile_dump(self):
         self._profile_dump_scenes()
@@ -58,6 +68,25 @@ class IkaEngine:
     def disble_profile(self):
         self._enable_profile = False
 
+    # Tracing
+
+    def enable_trace(self, filename, max_events=100000):
+        """
+        Record spans of frames, scenes, events and plugin handlers into
+        a Chrome trace-event JSON file.
+        """
+        self.disable_trace()
+        self._tracer = TraceRecorder(filename, max_events=max_events)
+
+    def disable_trace(self):
+        if self._tracer is not None:
+            self._tracer.close()
+        self._tracer = None
+
+    def _trace_args(self, context):
+        engine = context.get('engine') or {}
+        return {'frame': engine.get('frame_index'), 'msec': engine.get('msec')}
+
     # Exception Logging
 
     def _exception_log_init(self, context):
@@ -111,44 +140,172 @@ class IkaEngine:
     def on_game_lost_sync(self, context):
         self.session_abort()
 
+    # phase transitions
+
+    def _set_phase(self, phase):
+        if self._scheduler.set_phase(phase):
+            self.context['engine']['phase'] = phase
+
+    def on_game_timer_detected(self, context, params=None):
+        self._set_phase(PHASE_BATTLE)
+
+    def on_game_beginning(self, context, params=None):
+        self._set_phase(PHASE_BATTLE)
+
+    def on_game_go_sign(self, context, params=None):
+        self._set_phase(PHASE_BATTLE)
+
+    def on_game_start(self, context, params=None):
+        self._set_phase(PHASE_BATTLE)
+
+    def on_game_finish(self, context, params=None):
+        self._set_phase(PHASE_RESULT)
+
+    def on_lobby_matching(self, context, params=None):
+        self._set_phase(PHASE_LOBBY)
+
+    def on_lobby_matched(self, context, params=None):
+        self._set_phase(PHASE_LOBBY)
+
+    def on_lobby_left_queue(self, context, params=None):
+        self._set_phase(PHASE_LOBBY)
+
+    def _find_handler(self, plugin, event_name):
+        handler = getattr(plugin, event_name, None)
+        if handler is not None:
+            return handler, False
+
+        handler = getattr(plugin, 'on_uncaught_event', None)
+        return handler, (handler is not None)
+
+    def _call_handler(self, plugin, event_name, handler, uncaught, params,
+                      context):
+        tracer = self._tracer
+        if tracer is not None:
+            trace_start = tracer.now()
+
+        self._latency.enter()
+        try:
+            if uncaught:
+                handler(event_name, context)
+            elif params is None:
+                handler(context)
+            else:
+                handler(context, params)
+        except:
+            logger.info('%s.%s() raised a exception >>>>' %
+                        (plugin.__class__.__name__, event_name))
+            for line in traceback.format_exc().split("\n"):
+                logger.info(line)
+            logger.info('<<<<<')
+        finally:
+            self._latency.exit(self._latency.histogram(
+                'ikalog_plugin_handler_seconds',
+                (('plugin', plugin.__class__.__name__), ('event', event_name))))
+
+            if tracer is not None:
+                tracer.add_span(
+                    '%s.%s' % (plugin.__class__.__name__, event_name),
+                    'plugin', trace_start, self._trace_args(context))
+
     def call_plugin(self, plugin, event_name, params, debug=False,
                     context=None):
         context = context or self.context
 
-        if hasattr(plugin, event_name):
-            #logger.debug('Call  %s' % plugin.__class__.__name__)
-            try:
-                if params is None:
-                    getattr(plugin, event_name)(context)
-                else:
-                    getattr(plugin, event_name)(context, params)
-            except:
-                logger.info('%s.%s() raised a exception >>>>' %
-                            (plugin.__class__.__name__, event_name))
-                for line in traceback.format_exc().split("\n"):
-                    logger.info(line)
-                logger.info('<<<<<')
-
-        elif hasattr(plugin, 'on_uncaught_event'):
-            #logger.debug('call plug-in hook (on_uncaught_event, %s):' % event_name)
-            try:
-                getattr(plugin, 'on_uncaught_event')(event_name, context)
-            except:
-                logger.info('%s.%s() raised a exception >>>>' %
-                            (plugin.__class__.__name__, event_name))
-                for line in traceback.format_exc().split("\n"):
-                    logger.info(line)
-                logger.info('<<<<<')
+        handler, uncaught = self._find_handler(plugin, event_name)
+        if handler is not None:
+            self._call_handler(plugin, event_name, handler, uncaught, params,
+                               context)
+
+    def _compile_event(self, event_name):
+        """
+        Build the list of handlers of the event, in order of the plugins.
+
+        Each entry is (plugin, handler, uncaught, worker). uncaught is True
+        if the handler is on_uncaught_event(). worker is the PluginWorker
+        if the event is delivered asynchronously.
+        """
+        handlers = []
+        for op in self.output_plugins:
+            handler, uncaught = self._find_handler(op, event_name)
+            if handler is None:
+                continue
+
+            worker = None
+            if event_name not in self.SYNC_EVENTS:
+                worker = self._plugin_workers.get(id(op))
+            handlers.append((op, handler, uncaught, worker))
+
+        self._dispatch_table[event_name] = handlers
+        return handlers
+
+    def _build_dispatch_table(self):
+        """
+        Build the event to handlers table. Events that no plugin defines
+        are added on the first call.
+        """
+        self._dispatch_table = {}
+
+        event_names = set()
+        for op in self.output_plugins:
+            event_names.update(
+                [name for name in dir(op) if name.startswith('on_')])
+        event_names.discard('on_uncaught_event')
+
+        for event_name in event_names:
+            self._compile_event(event_name)
+
+    def _get_handlers(self, event_name):
+        handlers = self._dispatch_table.get(event_name)
+        if handlers is None:
+            handlers = self._compile_event(event_name)
+        return handlers
 
     def call_plugins(self, event_name, params=None, debug=False, context=None):
+        handlers = self._get_handlers(event_name)
+        if not handlers:
+            return
+
         if not context:
             context = self.context
 
         #logger.debug('call plug-in hook (%s):' % event_name)
 
+        self.num_dispatched_events += 1
 
-        for op in self.output_plugins:
-            self.call_plugin(op, event_name, params, debug, context)
+        tracer = self._tracer
+        if tracer is not None:
+            trace_start = tracer.now()
+
+        # The snapshot is taken once and shared among async plugins.
+        snapshot = None
+
+        for op, handler, uncaught, worker in handlers:
+            if worker is None:
+                self._call_handler(op, event_name, handler, uncaught, params,
+                                   context)
+                continue
+
+            if snapshot is None:
+                snapshot = self._event_snapshotter.snapshot(context, params)
+            worker.put(event_name, *snapshot)
+
+        if tracer is not None:
+            tracer.add_span(event_name, 'event', trace_start,
+                            self._trace_args(context))
+
+    def _update_event_rate(self):
+        now = time.time()
+        elapsed = now - self._event_rate_time
+        if elapsed < 1.0:
+            return
+
+        num_events = self.num_dispatched_events - self._event_rate_count
+        self.events_per_second = num_events / elapsed
+        self.context['engine']['events_per_second'] = self.events_per_second
+
+        self._event_rate_time = now
+        self._event_rate_count = self.num_dispatched_events
 
     def call_plugins_later(self, event_name, params, debug=False, context=None):
         self._event_queue.append((event_name, params, context))
@@ -169,19 +326,32 @@ class IkaEngine:
 
         t = self.capture.get_current_timestamp()
         context['engine']['msec'] = t
+        context['engine']['frame_index'] += 1
         context['game']['offset_msec'] = IkaUtils.get_game_offset_msec(context)
 
+        # Derived planes (gray, HSV, 1080p, ...) are computed on demand
+        # and shared among scenes.
         if frame.shape[0] == 720:
-            context['engine']['frame'] = frame
-            context['engine']['frame_hd'] = cv2.resize(frame, (1920, 1080))  # :/
+            frame_view = FrameView(frame)
         elif frame.shape[0] == 1080:
-            context['engine']['frame_hd'] = frame
-            context['engine']['frame'] = cv2.resize(frame, (1280, 720))
+            frame_view = FrameView(cv2.resize(frame, (1280, 720)), frame_hd=frame)
         else:
             logger.info('Unexpected resolution %s' % str(frame.shape))
             return None, None
 
-        context['engine']['preview'] = copy.deepcopy(context['engine']['frame'])
+        context['engine']['frame'] = frame_view.bgr
+        context['engine']['frame_view'] = frame_view
+
+        # Upscaling the whole frame is expensive. Provide frame_hd only if
+        # any of scenes or plugins asks for it (or it is the source).
+        # Others should use frame_view.crop_hd() instead.
+        if self._want_frame_hd or (frame.shape[0] == 1080):
+            context['engine']['frame_hd'] = frame_view.hd
+        else:
+            context['engine']['frame_hd'] = None
+
+        # The preview image is built only if a preview plugin asks for it.
+        context['engine']['preview'] = PreviewLayer(frame_view.bgr)
         self.call_plugins('on_debug_read_next_frame', {})
 
         return frame, t
@@ -189,6 +359,7 @@ class IkaEngine:
     def stop(self):
         if not self._stop:
             self.call_plugins('on_stop', {})
+            self._stop_plugin_workers()
         self._stop = True
 
     def is_stopped(self):
@@ -238,6 +409,7 @@ class IkaEngine:
             # Time from start_offset_msec in msec.
             'offset_msec': None,
         }
+        self._set_phase(PHASE_LOBBY)
         self.call_plugins('on_game_reset', {})
         self._exception_log_init(self.context)
 
@@ -249,7 +421,13 @@ class IkaEngine:
                 'epoch_time': None,
                 'source_file': None,  # file path if input is a file.
                 'frame': None,
+                'frame_hd': None,
+                'frame_view': None,
                 'msec': None,
+                # Number of frames read, i.e. index of the frame from 1.
+                'frame_index': 0,
+                'phase': PHASE_LOBBY,
+                'events_per_second': None,
                 'service': {
                     'call_plugins': self.call_plugins,
                     'call_plugins_later': self.call_plugins_later,
@@ -266,6 +444,7 @@ class IkaEngine:
             'lobby': {
             }
         }
+        self._scheduler.reset()
         self.reset()
         self.session_close_wdt = None
 
@@ -302,22 +481,27 @@ class IkaEngine:
         if context['engine'].get('frame') is None:
             return False
 
+        tracer = self._tracer
+        if tracer is not None:
+            trace_start = tracer.now()
+
         try:
             scene.new_frame(context)
             scene.match(context)
+            self.scene_circuit_breaker.record_success(scene)
         except:
             if self._abort_at_scene_exception:
                 raise
 
-            scene_name = scene.__class__.__name__
-            desc = traceback.format_exc()
-
-            logger.info(f'{scene_name} raised an exception >>>>')
-            for line in traceback.format_exc().split("\n"):
-                logger.info(line)
-            logger.info('<<<<<')
-
-            self._exception_log_append(context, scene_name, desc)
+            # Logged and formatted once per traceback signature.
+            desc, _ = self.scene_circuit_breaker.record_failure(
+                scene, sys.exc_info())
+            self._exception_log_append(context, scene.__class__.__name__,
+                                       desc)
+        finally:
+            if tracer is not None:
+                tracer.add_span(scene.__class__.__name__, 'scene',
+                                trace_start, self._trace_args(context))
 
     def find_scene_object(self, scene_class_name):
         for scene in self.scenes:
@@ -327,16 +511,34 @@ class IkaEngine:
 
     def process_frame(self):
         context = self.context
+        start = time.perf_counter()
 
-        frame, t = self.read_next_frame()
+        tracer = self._tracer
+        if tracer is not None:
+            tracer.maybe_flush()
+
+        self._latency.enter()
+        try:
+            frame, t = self.read_next_frame()
+        finally:
+            self._latency.exit(self._frame_read_histogram)
+            if tracer is not None:
+                tracer.add_span('read_next_frame', 'engine', start,
+                                self._trace_args(context))
 
         if frame is None:
             return False
 
         self.call_plugins('on_frame_read', {})
 
+        msec = context['engine']['msec']
         for scene in self.scenes:
-            self.process_scene(scene)
+            if self.scene_circuit_breaker.allow(scene) and \
+                    self._scheduler.schedule(scene, msec):
+                self.process_scene(scene)
+            else:
+                # Other scenes may still ask the scene to match.
+                scene.new_frame(context)
 
         if self.session_close_wdt is not None:
             if self.session_close_wdt < context['engine']['msec']:
@@ -345,30 +547,48 @@ class IkaEngine:
 
         key = None
 
+        self._latency.enter()
         self.call_plugins('on_draw_preview', {})
         self.call_plugins('on_show_preview', {})
+        self._latency.exit(self._preview_histogram, inclusive=True)
 
         # FixMe: Since on_frame_next and on_key_press has non-standard arguments,
         # self.call_plugins() doesn't work for those.
 
-        for op in self.output_plugins:
-            if hasattr(op, 'on_frame_next'):
-                try:
-                    key = op.on_frame_next(context)
-                except:
-                    pass
+        for op, handler, uncaught, worker in self._get_handlers('on_frame_next'):
+            if uncaught or (worker is not None):
+                continue
+            try:
+                key = handler(context)
+            except:
+                pass
 
-        for op in self.output_plugins:
-            if hasattr(op, 'on_key_press'):
-                try:
-                    op.on_key_press(context, key)
-                except:
-                    pass
+        for op, handler, uncaught, worker in self._get_handlers('on_key_press'):
+            if uncaught or (worker is not None):
+                continue
+            try:
+                handler(context, key)
+            except:
+                pass
+
+        # Async plugins receive the events on their threads. Return values
+        # of on_frame_next() are ignored.
+        self._put_async_event('on_frame_next', None, context)
+        # on_key_press(context, key) has no call path without the key.
+        if key is not None:
+            self._put_async_event('on_key_press', key, context)
 
         while len(self._event_queue) > 0:
             event = self._event_queue.pop(0)
             self.call_plugins(event_name=event[0], params=event[1], context=event[2])
 
+        self._update_event_rate()
+        self._frame_histogram.observe(time.perf_counter() - start)
+
+        if tracer is not None:
+            tracer.add_span('process_frame', 'engine', start,
+                            self._trace_args(context))
+
     def put_source_file(self, file_path):
         return self.capture.put_source_file(file_path)
 
@@ -419,6 +639,9 @@ class IkaEngine:
             if 1:
                 self._exception_log_dump(self.context)
 
+            if self._tracer is not None:
+                self._tracer.flush(wait=True)
+
         self.stop()
 
     def set_capture(self, capture):
@@ -436,10 +659,44 @@ class IkaEngine:
 
         self.call_plugins('on_reset_capture', {})
 
+    def _update_frame_requirements(self):
+        self._want_frame_hd = any(
+            getattr(op, 'want_frame_hd', False) for op in self.output_plugins)
+
+    def _put_async_event(self, event_name, params, context):
+        snapshot = None
+        for op, handler, uncaught, worker in self._get_handlers(event_name):
+            if uncaught or (worker is None):
+                continue
+            if snapshot is None:
+                snapshot = self._event_snapshotter.snapshot(context, params)
+            worker.put(event_name, *snapshot)
+
+    def _start_plugin_workers(self):
+        self._stop_plugin_workers()
+
+        for op in self.output_plugins:
+            if (op is self) or (op in self.scenes):
+                continue
+            if getattr(op, 'async_dispatch', False):
+                logger.info('%s: %s receives events asynchronously' %
+                            (self, op.__class__.__name__))
+                self._plugin_workers[id(op)] = PluginWorker(op, self.call_plugin)
+
+    def _stop_plugin_workers(self):
+        for worker in self._plugin_workers.values():
+            worker.stop()
+        self._plugin_workers = {}
+        # Handlers are looked up again without the workers.
+        self._dispatch_table = {}
+
     def set_plugins(self, plugins):
         self.output_plugins = [self]
         self.output_plugins.extend(self.scenes)
         self.output_plugins.extend(plugins)
+        self._update_frame_requirements()
+        self._start_plugin_workers()
+        self._build_dispatch_table()
         self.call_plugins('on_initialize_plugin', {})
 
     def enable_plugin(self, plugin):
@@ -456,13 +713,41 @@ class IkaEngine:
         self.scenes = initialize_scenes(self)
 
     def __del__(self):
-        self.call_plugins('on_engine_destroy', {})
+        # The constructor may have failed before the plugins were set.
+        if hasattr(self, '_dispatch_table'):
+            self.call_plugins('on_engine_destroy', {})
 
     def __init__(self, enable_profile=False, abort_at_scene_exception=False,
-                 keep_alive=False):
+                 keep_alive=False, enable_scheduler=True, trace_file=None):
+        # Always-on latency metrics. See RESTAPIServer /api/v1/metrics.
+        self._latency = get_latency_metrics()
+        self._frame_histogram = self._latency.histogram('ikalog_frame_seconds')
+        self._frame_read_histogram = self._latency.histogram(
+            'ikalog_frame_read_seconds')
+        self._preview_histogram = self._latency.histogram(
+            'ikalog_preview_seconds')
+
+        # Opt-in Chrome trace-event recorder. See enable_trace().
+        self._tracer = None
+        if trace_file:
+            self.enable_trace(trace_file)
+
         self._initialize_scenes()
+        self._scheduler = SceneScheduler(enabled=enable_scheduler)
+        # Disables failing scenes for a while. See /api/v1/engine/scenes.
+        self.scene_circuit_breaker = SceneCircuitBreaker()
 
         self.output_plugins = [self]
+        self._plugin_workers = {}
+        self._dispatch_table = {}
+        self._event_snapshotter = EventSnapshotter()
+
+        # Number of events dispatched to the plugins.
+        self.num_dispatched_events = 0
+        self.events_per_second = 0.0
+        self._event_rate_time = time.time()
+        self._event_rate_count = 0
+        self._want_frame_hd = False
         self._services = {}
         self.last_capture = time.time() - 100
 
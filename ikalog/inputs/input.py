@@ -27,6 +27,7 @@ import cv2
 
 from ikalog.utils import IkaUtils
 from ikalog.inputs.filters import OffsetFilter
+from ikalog.inputs.prefetcher import FramePrefetcher
 
 logger = logging.getLogger()
 
@@ -51,6 +52,19 @@ class VideoInput(object):
     # Force keep_alive.
     keep_alive = False
 
+    ##
+    # prefetch_frames
+    # Number of frames to be decoded ahead on a background thread.
+    # 0 disables prefetching.
+    prefetch_frames = 0
+
+    ##
+    # prefetch_drop_oldest
+    # If True, drops the oldest prefetched frame when the buffer is full,
+    # so live sources keep up with real time. Otherwise the decoder waits
+    # for the engine; recorded videos (CVFile) never lose frames.
+    prefetch_drop_oldest = True
+
     ##
     # _initialize_driver_func()
     # Handler for source-specific initialization.
@@ -79,6 +93,23 @@ class VideoInput(object):
     def _select_device_by_name_func(self, name):
         raise
 
+    ##
+    # _skip_frame_func()
+    # Handler to skip a frame. Sources should override this to skip
+    # the frame without decoding it, if possible.
+    # @param self    the object
+    def _skip_frame_func(self):
+        self._read_frame_func()
+
+    ##
+    # _seek_func()
+    # Handler to seek the source.
+    # @param self    the object
+    # @param msec    the position to seek to.
+    # @return        True if succeeded. False if not supported.
+    def _seek_func(self, msec):
+        return False
+
     ##
     # _is_active_func()
     # @param self    the object
@@ -157,16 +188,25 @@ class VideoInput(object):
         if self.frame_skip_rt:
             tick = self.get_tick()
         elif self.fps_requested is not None:
-            tick = self.get_current_timestamp() + (1000 / self.fps_requested)
+            tick = self._get_current_timestamp_func() + (1000 / self.fps_requested)
         else:
             return
 
-        video_msec = self.get_current_timestamp()
+        video_msec = self._get_current_timestamp_func()
+
+        # Seek if the next frame is far away, instead of skipping
+        # every frame in between. The position may not be updated
+        # until the next read, so don't check it after seeking.
+        threshold = self.seek_threshold_msec
+        if (threshold is not None) and (tick - video_msec > threshold):
+            if self._seek_func(tick):
+                return None
+
         skip = video_msec < tick
         while skip:
-            frame_ = self._read_frame_func()
+            self._skip_frame_func()
 
-            video_msec = self.get_current_timestamp()
+            video_msec = self._get_current_timestamp_func()
             skip = video_msec < tick
 
         return None
@@ -179,6 +219,9 @@ class VideoInput(object):
     #
     # @return Image if capture succeeded. Otherwise None.
     def read_frame(self):
+        if self.prefetch_frames and not self.frame_skip_rt:
+            return self._read_prefetched_frame()
+
         try:
             self.lock.acquire()
             if not self.is_active():
@@ -186,6 +229,7 @@ class VideoInput(object):
 
             next_tick = None
             img = self._read_frame_func()
+            self._frame_msec = self._get_current_timestamp_func()
 
             # Skip some frames for performance.
             try:
@@ -202,6 +246,21 @@ class VideoInput(object):
         if img is None:
             return None
 
+        img = self._process_frame(img)
+        if img is None:
+            return None
+
+        if next_tick is not None:
+            self.last_tick = next_tick
+
+        return img
+
+    ##
+    # _process_frame(self, img)
+    #
+    # Validate the resolution, stretch and apply the offset filter.
+    # @return Image if the frame is valid. Otherwise None.
+    def _process_frame(self, img):
         if self.cap_optimal_input_resolution:
             res720p = (img.shape[0] == 720) and (img.shape[1] == 1280)
             res1080p = (img.shape[0] == 1080) and (img.shape[1] == 1920)
@@ -213,9 +272,6 @@ class VideoInput(object):
                 )
                 return None
 
-        if next_tick is not None:
-            self.last_tick = next_tick
-
         # need stratch?
         stratch = (
             img.shape[0] != self.output_geometry[0] or
@@ -231,6 +287,79 @@ class VideoInput(object):
         img = self._offset_filter.execute(img)
         return img
 
+    ##
+    # _decode_frame(self)
+    #
+    # Read and process a frame on the prefetch thread.
+    # @return Tuple of (image, timestamp of the image).
+    def _decode_frame(self):
+        with self.lock:
+            if not self.is_active():
+                raise EOFError()
+
+            img = self._read_frame_func()
+            msec = self._get_current_timestamp_func()
+
+            if self.cap_recorded_video:
+                try:
+                    self._skip_frame_recorded()
+                except EOFError:
+                    pass  # EOFError should be captured by the next cycle.
+
+        if img is not None:
+            img = self._process_frame(img)
+        return img, msec
+
+    def _read_prefetched_frame(self):
+        if not self.is_active():
+            return None
+
+        if self._prefetcher is None:
+            self._prefetcher = FramePrefetcher(
+                self._decode_frame,
+                self.prefetch_frames,
+                drop_oldest=self.prefetch_drop_oldest,
+            )
+
+        try:
+            img, msec = self._prefetcher.get()
+        except EOFError:
+            self._prefetcher = None
+            raise
+
+        self._frame_msec = msec
+
+        if img is not None and not self.cap_recorded_video:
+            self.last_tick = self._skip_frame_realtime()
+
+        return img
+
+    ##
+    # flush_prefetch(self)
+    #
+    # Stop prefetching and discard prefetched frames. Inputs should call
+    # this before changing the source, the position or the parameters
+    # of the decoding. Prefetching restarts on the next read_frame().
+    def flush_prefetch(self):
+        prefetcher = self._prefetcher
+        self._prefetcher = None
+        self._frame_msec = None
+
+        if prefetcher is not None:
+            prefetcher.stop()
+
+    ##
+    # set_prefetch(self, num_frames)
+    #
+    # @param num_frames   number of frames to be prefetched. 0 to disable.
+    # @param drop_oldest  drop the oldest frame when the buffer is full.
+    #                     None to keep the current policy.
+    def set_prefetch(self, num_frames, drop_oldest=None):
+        self.flush_prefetch()
+        self.prefetch_frames = num_frames
+        if drop_oldest is not None:
+            self.prefetch_drop_oldest = drop_oldest
+
     def _get_current_timestamp_func(self):
         return self.get_tick()
     ##
@@ -251,9 +380,12 @@ class VideoInput(object):
     ##
     # get_current_timestamp(self)
     #
-    # Get current timestamp information.
+    # Get current timestamp information. This is the timestamp of the
+    # last frame read, regardless of skipped or prefetched frames.
     # @return Timestamp (in msec)
     def get_current_timestamp(self):
+        if self._frame_msec is not None:
+            return self._frame_msec
         return self._get_current_timestamp_func()
 
     def get_epoch_time(self):
@@ -285,10 +417,24 @@ class VideoInput(object):
     # @param fps      frames per second to be read
     # @param realtime Realtime mode if True.
     def set_frame_rate(self, fps=None, realtime=False):
+        self.flush_prefetch()
         self.fps_requested = fps
         self.frame_skip_rt = realtime
 
+    ##
+    # set_seek_threshold(self, msec=None)
+    #
+    # When skipping frames of a recorded video, seek the source instead
+    # if the next frame is more than |msec| ahead. Seeking is not
+    # always faster, since the decoder has to restart from a keyframe.
+    #
+    # @param msec  the threshold in msec. None to disable seeking.
+    def set_seek_threshold(self, msec=None):
+        self.flush_prefetch()
+        self.seek_threshold_msec = msec
+
     def set_offset(self, offset=None):
+        self.flush_prefetch()
         if offset is None:
             self._offset_filter.disable()
 
@@ -313,6 +459,8 @@ class VideoInput(object):
         self.output_geometry = (1080, 1920)
         self.effective_lines = 1080
         self.lock = threading.Lock()
+        self._prefetcher = None
+        self._frame_msec = None
 
         self.is_realtime = True
         self.reset()
@@ -320,4 +468,5 @@ class VideoInput(object):
         self._offset_filter = OffsetFilter(self)
 
         self.set_frame_rate()
+        self.set_seek_threshold()
         self._initialize_driver_func()
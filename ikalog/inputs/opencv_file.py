@@ -35,6 +35,8 @@ logger = logging.getLogger()
 class CVFile(VideoInput):
 
     cap_recorded_video = True
+    prefetch_frames = 8
+    prefetch_drop_oldest = False
 
     # override
     def _initialize_driver_func(self):
@@ -43,6 +45,7 @@ class CVFile(VideoInput):
 
     # override
     def _cleanup_driver_func(self):
+        self.flush_prefetch()
         self.lock.acquire()
         try:
             if self.video_capture is not None:
@@ -84,11 +87,13 @@ class CVFile(VideoInput):
         return self._init_with_sources()
 
     def _init_with_sources(self):
+        self.flush_prefetch()
         if self._file_queue.empty():
             self.video_capture = None
             return False
 
         self._source_file = self._file_queue.get()
+        self._end_pos_msec = None
 
         self.lock.acquire()
         try:
@@ -121,10 +126,16 @@ class CVFile(VideoInput):
 
     # override
     def _read_frame_func(self):
-        ret, frame = self.video_capture.read()
-        if not ret:
+        # Frames to be skipped are only grabbed (demuxed), and only the
+        # last one is decoded.
+        if not self.video_capture.grab():
             raise EOFError()
 
+        if self._end_pos_msec is not None:
+            video_msec = self.video_capture.get(cv2.CAP_PROP_POS_MSEC)
+            if video_msec > self._end_pos_msec:
+                raise EOFError()
+
         if self.frame_skip_rt:
             systime_msec = self.get_tick()
             video_msec = self.video_capture.get(cv2.CAP_PROP_POS_MSEC)
@@ -132,17 +143,27 @@ class CVFile(VideoInput):
 
             skip = video_msec < systime_msec
             while skip:
-                ret, frame_ = self.video_capture.read()
-
-                if not ret:
-                    break
+                if not self.video_capture.grab():
+                    raise EOFError()
 
-                frame = frame_
                 video_msec = self.video_capture.get(cv2.CAP_PROP_POS_MSEC)
                 skip = video_msec < systime_msec
 
+        ret, frame = self.video_capture.retrieve()
+        if not ret:
+            raise EOFError()
+
         return frame
 
+    # override
+    def _skip_frame_func(self):
+        if not self.video_capture.grab():
+            raise EOFError()
+
+    # override
+    def _seek_func(self, msec):
+        return self.video_capture.set(cv2.CAP_PROP_POS_MSEC, msec)
+
     # override
     def get_epoch_time(self):
         if self._use_file_timestamp:
@@ -166,9 +187,19 @@ class CVFile(VideoInput):
     # override
     def set_pos_msec(self, pos_msec):
         """Moves the video position to |pos_msec| in msec."""
+        self.flush_prefetch()
         if self.video_capture:
             self.video_capture.set(cv2.CAP_PROP_POS_MSEC, pos_msec)
 
+    def set_end_pos_msec(self, pos_msec):
+        """Treats |pos_msec| in msec as the end of the current video.
+
+        Reading beyond the position raises EOFError. None to read
+        until the actual end of the video.
+        """
+        self.flush_prefetch()
+        self._end_pos_msec = pos_msec
+
     # override
     def get_source_file(self):
         return self._source_file
@@ -197,6 +228,7 @@ class CVFile(VideoInput):
         self._source_file = None
         self._file_queue = queue.Queue()
         self._epoch_time = None
+        self._end_pos_msec = None
         self._use_file_timestamp = True
         super(CVFile, self).__init__()
 
@@ -31,6 +31,10 @@ class GStreamer(VideoInput):
     # Note: This is for backward compatibility. GStreamer was a subclass of
     # CVFile which sets this variable True. It might be OK to remove it.
     cap_recorded_video = True
+    prefetch_frames = 8
+    # Pipelines are usually live, so prefetched frames are dropped when
+    # the engine falls behind. Set False for recorded videos.
+    prefetch_drop_oldest = True
 
     # override
     def _initialize_driver_func(self):
@@ -39,6 +43,7 @@ class GStreamer(VideoInput):
 
     # override
     def _cleanup_driver_func(self):
+        self.flush_prefetch()
         self.lock.acquire()
         try:
             if self.video_capture is not None:
@@ -57,6 +62,7 @@ class GStreamer(VideoInput):
 
     # override
     def _select_device_by_name_func(self, source):
+        self.flush_prefetch()
         self.lock.acquire()
         try:
             if self.is_active():
@@ -103,6 +109,11 @@ class GStreamer(VideoInput):
 
         return frame
 
+    # override
+    def _skip_frame_func(self):
+        if not self.video_capture.grab():
+            raise EOFError()
+
     def __init__(self):
         self.video_capture = None
         super(GStreamer, self).__init__()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import collections
+import logging
+import threading
+
+logger = logging.getLogger()
+
+_EOF = 'eof'
+_ERROR = 'error'
+_FRAME = 'frame'
+
+
+class FramePrefetcher(object):
+    """
+    Decode frames ahead on a background thread.
+
+    Frames are kept in a bounded ring buffer with their timestamps, so
+    decoding the next frames overlaps with analyzing the current one.
+    When the buffer is full, the decoder waits for the consumer
+    (recorded videos), or drops the oldest frame (live sources).
+
+    EOFError and other exceptions raised by the decoder are raised to
+    the consumer in order.
+    """
+
+    def get(self):
+        """
+        Return the next frame and its timestamp.
+
+        Blocks until a frame is available, or the prefetcher is stopped.
+
+        Returns:
+            A tuple of (img, msec). img may be None if the frame was
+            invalid. (None, None) if the prefetcher has been stopped.
+        """
+        with self._cond:
+            while not (self._buffer or self._stopped):
+                self._cond.wait()
+            if self._stopped:
+                return None, None
+            kind, value, msec = self._buffer.popleft()
+            self._cond.notify_all()
+
+        if kind == _EOF:
+            raise EOFError()
+        if kind == _ERROR:
+            raise value
+        return value, msec
+
+    def stop(self):
+        """
+        Stop the decoder thread and discard the buffered frames.
+        """
+        with self._cond:
+            self._stopped = True
+            self._buffer.clear()
+            self._cond.notify_all()
+
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=5.0)
+
+    def _put(self, item):
+        with self._cond:
+            if not self._drop_oldest:
+                while len(self._buffer) >= self._num_frames and not self._stopped:
+                    self._cond.wait()
+            elif len(self._buffer) >= self._num_frames:
+                self._buffer.popleft()
+                self.num_dropped_frames += 1
+
+            if self._stopped:
+                return False
+
+            self._buffer.append(item)
+            self._cond.notify_all()
+        return True
+
+    def _worker(self):
+        while True:
+            try:
+                img, msec = self._decode_func()
+                item = (_FRAME, img, msec)
+            except EOFError:
+                item = (_EOF, None, None)
+            except Exception as e:
+                item = (_ERROR, e, None)
+
+            if not self._put(item):
+                return
+
+            if item[0] != _FRAME:
+                return
+
+    def __init__(self, decode_func, num_frames, drop_oldest=False):
+        """
+        Constructor
+
+        Args:
+            decode_func: Function that returns a tuple of (img, msec) of
+                the next frame, or raises EOFError.
+            num_frames: Number of frames to be buffered.
+            drop_oldest: If True, drops the oldest frame when the buffer
+                is full. Otherwise waits for the consumer.
+        """
+        assert num_frames > 0
+
+        self._decode_func = decode_func
+        self._num_frames = num_frames
+        self._drop_oldest = drop_oldest
+        self._buffer = collections.deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.num_dropped_frames = 0
+
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
@@ -18,12 +18,15 @@
 #  limitations under the License.
 #
 
+import glob
 import os
 import pickle
 
 import cv2
 import numpy as np
 
+from ikalog.ml.model_bundle import load_model_arrays
+
 
 class ImageClassifier(object):
 
@@ -35,7 +38,9 @@ class ImageClassifier(object):
         self._pca_components = pca_components
         self._pca_mean = None
         self._pca_eigenvectors = None
-        pass
+        self._svm_dict = None
+        self._weights = None
+        self._bias = None
 
     """
     Persistency
@@ -66,6 +71,9 @@ class ImageClassifier(object):
         self._pca_components = state.get('pca_components')
         self._pca_mean = state.get('pca_mean')
         self._pca_eigenvectors = state.get('pca_eigenvectors')
+        self._svm_dict = None
+        self._weights = None
+        self._bias = None
 
     def save_svm_to_file(self, filename):
         assert len(self._svm_dict) == self._num_classes
@@ -76,7 +84,13 @@ class ImageClassifier(object):
             print('%s.%d.svm' % (filename, i))
             svm_obj.save(svm_filename)
 
+        self.save_linear_model_to_file(filename)
+
     def load_svm_from_file(self, filename):
+        # The compiled model is enough to predict, if it is up to date.
+        if self.load_linear_model_from_file(filename):
+            return
+
         self._svm_dict = []
 
         for i in range(self._num_classes):
@@ -85,13 +99,104 @@ class ImageClassifier(object):
             assert svm_obj is not None, 'Failed to load ML data: %s' % filename
             self._svm_dict.append(svm_obj)
 
+        self.compile_linear_model()
+
+    def _linear_model_filename(self, filename):
+        return '%s.linear.npz' % filename
+
+    def save_linear_model_to_file(self, filename):
+        if self._weights is None:
+            return False
+
+        np.savez(self._linear_model_filename(filename),
+                 weights=self._weights, bias=self._bias)
+        return True
+
+    def load_linear_model_from_file(self, filename):
+        """
+        Load the compiled model, unless it is missing or older than any of
+        the .svm files.
+        """
+        npz_filename = self._linear_model_filename(filename)
+        try:
+            npz_mtime = os.path.getmtime(npz_filename)
+            for i in range(self._num_classes):
+                svm_filename = '%s.%d.svm' % (filename, i)
+                if os.path.getmtime(svm_filename) > npz_mtime:
+                    return False
+
+            with np.load(npz_filename) as npz:
+                weights, bias = npz['weights'], npz['bias']
+        except (OSError, KeyError, ValueError):
+            return False
+
+        if weights.shape[0] != self._num_classes:
+            return False
+
+        self._svm_dict = None
+        self._weights, self._bias = weights, bias
+        return True
+
     def save_to_file(self, filename):
         f = open('%s.pickle.dat' % filename, 'wb')
         pickle.dump(self.__getstate__(), f)
         f.close()
         self.save_svm_to_file(filename)
 
+    def export_arrays(self):
+        """
+        Returns:
+            A dict of the arrays needed to predict, for the model bundle.
+        """
+        if self._weights is None:
+            self.compile_linear_model()
+
+        arrays = {
+            'num_classes': self._num_classes,
+            'weights': self._weights,
+            'bias': self._bias,
+        }
+        for key in ('rect', 'resize', 'labels', 'pca_components',
+                    'pca_mean', 'pca_eigenvectors'):
+            value = getattr(self, '_%s' % key)
+            if value is not None:
+                arrays[key] = value
+        return arrays
+
+    def import_arrays(self, arrays):
+        def get(key, f=lambda v: v):
+            return f(arrays[key]) if key in arrays else None
+
+        self._rect = get('rect', lambda v: tuple(v.tolist()))
+        self._resize = get('resize', lambda v: tuple(v.tolist()))
+        self._labels = get('labels', lambda v: v.tolist())
+        self._num_classes = int(arrays['num_classes'])
+        self._x = None
+        self._y = None
+        self._pca_components = get('pca_components', lambda v: v.tolist())
+        self._pca_mean = get('pca_mean')
+        self._pca_eigenvectors = get('pca_eigenvectors')
+        self._svm_dict = None
+        self._weights = arrays['weights']
+        self._bias = arrays['bias']
+
+    def load_from_bundle(self, filename):
+        """
+        Load the model from the model bundle, if it is up to date.
+        """
+        sources = ['%s.pickle.dat' % filename] + \
+            glob.glob('%s.*.svm' % glob.escape(filename))
+        arrays = load_model_arrays(filename, sources)
+        if arrays is None:
+            return False
+
+        self.import_arrays(arrays)
+        return True
+
     def load_from_file(self, filename):
+        if self.load_from_bundle(filename):
+            return
+
         f = open('%s.pickle.dat' % filename, 'rb')
         state = pickle.load(f)
         f.close()
@@ -240,6 +345,46 @@ class ImageClassifier(object):
         if verbose:
             print("Training done")
 
+        self.compile_linear_model()
+
+    def compile_linear_model(self):
+        """
+        Compile the linear SVMs into a weight matrix and a bias vector.
+
+        OpenCV's decision function of a two-class SVM is
+        sum(alpha * <sv, x>) - rho, and the sample belongs to the first
+        class label (-1) if it is positive. The margin of the class is the
+        negation, so that it is non-negative for the class:
+
+            margins = x . weights.T + bias
+
+        Returns:
+            True if compiled. False if any of the SVMs is not linear;
+            the SVMs are used to predict in that case.
+        """
+        self._weights, self._bias = None, None
+        if not self._svm_dict:
+            return False
+
+        weights = []
+        bias = []
+        for svm in self._svm_dict:
+            if svm.getKernelType() != cv2.ml.SVM_LINEAR:
+                return False
+
+            sv = np.array(svm.getSupportVectors(), dtype=np.float64)
+            rho, alpha, sv_index = svm.getDecisionFunction(0)
+            w = np.dot(np.array(alpha, dtype=np.float64).reshape(1, -1),
+                       sv[np.array(sv_index).reshape(-1)])
+            weights.append(-w.reshape(-1))
+            bias.append(rho)
+
+        # float32 is faster, and rounding errors only matter for samples
+        # on the boundary.
+        self._weights = np.array(weights, dtype=np.float32)
+        self._bias = np.array(bias, dtype=np.float32)
+        return True
+
     def train(self, x, y):
         self._x = np.array(x, dtype=np.float32)
         self._y = np.array(y, dtype=np.int32)
@@ -252,22 +397,58 @@ class ImageClassifier(object):
     Predict
     """
 
-    def predict_vector(self, x_list):
-        X_list = []
-
-        for x in x_list:
-            # x is a image.
-            #x_f = self.rect_to_feature(x)
-            x_f = x
-            X = np.array(x_f, dtype=np.float32).reshape(1, -1)
-            X_list.append(X[0])
+    def to_gray(self):
+        """
+        Return a classifier that takes grayscale images, for a model
+        trained with BGR images converted from grayscale images.
 
-        X_list = np.array(X_list, dtype=np.float32)
-        # print(X_list.shape)
+        The three channels of such images are the same, so the weights of
+        the channels are folded into one. It gives the same margins as
+        cvtColor(img, COLOR_GRAY2BGR) with a third of the work.
+        """
+        assert self._weights is not None, 'The model is not compiled'
+        assert self._pca_components is None
+
+        c = ImageClassifier(rect=self._rect, resize=self._resize,
+                            num_classes=self._num_classes,
+                            labels=self._labels)
+        c._weights = np.ascontiguousarray(
+            self._weights.reshape(self._num_classes, -1, 3).sum(axis=2))
+        c._bias = self._bias
+        return c
+
+    def _to_samples(self, x_list):
+        # x_list is a list of images, or an array of N samples.
+        if isinstance(x_list, np.ndarray) and len(x_list.shape) > 1:
+            X = x_list.reshape(x_list.shape[0], int(np.prod(x_list.shape[1:])))
+        else:
+            X = np.array([np.asarray(x).reshape(-1) for x in x_list])
+        X = np.asarray(X, dtype=np.float32)
 
         if self._pca_components is not None:
-            X = cv2.PCAProject(X, self._mean, self._eigenvectors)
+            X = cv2.PCAProject(X, self._pca_mean, self._pca_eigenvectors)
+        return X
 
+    def decision_function(self, x_list):
+        """
+        Compute the margins of the samples to each class.
+
+        Args:
+            x_list: A list of images, or an array of N samples.
+        Returns:
+            An array of N x num_classes margins. Positive (or zero) if the
+            sample belongs to the class.
+        """
+        assert self._weights is not None, 'The model is not compiled'
+        X = self._to_samples(x_list)
+        return np.dot(X, self._weights.T) + self._bias
+
+    def predict_vector(self, x_list):
+        if self._weights is not None:
+            margins = self.decision_function(x_list)
+            return np.where(margins >= 0, 1, -1).astype(np.int32)
+
+        X_list = self._to_samples(x_list)
         Y = np.zeros((len(self._svm_dict), X_list.shape[0]), dtype=np.int32)
 
         for i in range(len(self._svm_dict)):
@@ -285,6 +466,25 @@ class ImageClassifier(object):
         y[y_confusion != 1] = -1
         return y
 
+    def predict_batch(self, x_list):
+        """
+        Classify a batch of samples with one matrix multiplication.
+
+        Args:
+            x_list: A list of images, or an array of N samples.
+        Returns:
+            A tuple of (y, margins). y is an array of N class indexes, or
+            -1 if not exactly one class matched (same as predict_index()).
+            margins is an array of N margins of the best class.
+        """
+        margins = self.decision_function(x_list)
+        if margins.shape[0] == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0)
+
+        y = np.argmax(margins, axis=1).astype(np.int32)
+        y[np.sum(margins >= 0, axis=1) != 1] = -1
+        return y, np.max(margins, axis=1)
+
     def predict(self, x_list):
         y_index = self.predict_index(x_list)
 
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import logging
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger()
+
+
+def _binary_value(x):
+    """
+    Returns:
+        v if all the values of x are 0 or v (v > 0), otherwise None.
+    """
+    v = np.max(x) if x.size else 0
+    if (v > 0) and (np.count_nonzero(x) == np.count_nonzero(x == v)):
+        return float(v)
+    return None
+
+
+def _vote(neighbor_responses):
+    # Same as cv2.ml.KNearest: the most frequent response wins, and the
+    # smallest response wins a tie.
+    results = []
+    for row in neighbor_responses.tolist():
+        results.append(min(row, key=lambda r: (-row.count(r), r)))
+    return np.array(results, dtype=np.float32)
+
+
+class KNNIndex(object):
+    """
+    Brute-force nearest-neighbour index, a drop-in replacement for
+    cv2.ml.KNearest.findNearest() that queries a batch at once.
+
+    If all samples are binary images (0 or a single value), the samples
+    are packed into bits and compared by Hamming distance (popcount of
+    XOR), 8 pixels per byte. Otherwise squared Euclidean distances are
+    computed.
+
+    The results are identical to cv2.ml.KNearest: distances of integer
+    features are exact, and ties are broken in the order of the samples.
+    """
+
+    def find_nearest(self, queries, k):
+        """
+        Find k nearest neighbours of the queries.
+
+        Args:
+            queries: An array of N samples.
+            k: Number of neighbours.
+        Returns:
+            A tuple of (results, neighbor_responses, dists), like
+            cv2.ml.KNearest.findNearest() without retval.
+        """
+        queries = np.asarray(queries)
+        queries = queries.reshape(queries.shape[0], -1)
+        k = min(k, len(self.responses))
+
+        if self._is_binary_query(queries):
+            packed = np.packbits(queries > 0, axis=1)
+            hamming, neighbors = cv2.batchDistance(
+                packed, self._packed, cv2.CV_32S,
+                normType=cv2.NORM_HAMMING, K=k)
+            dists = hamming.astype(np.float32) * self._value ** 2
+        else:
+            dists, neighbors = cv2.batchDistance(
+                np.asarray(queries, dtype=np.float32), self._samples,
+                cv2.CV_32F, normType=cv2.NORM_L2SQR, K=k)
+
+        neighbor_responses = self.responses[neighbors]
+        return _vote(neighbor_responses), neighbor_responses, dists
+
+    def is_binary(self):
+        """
+        Returns:
+            True if the samples are compared by Hamming distance.
+        """
+        return self._packed is not None
+
+    def _is_binary_query(self, queries):
+        if not self.is_binary():
+            return False
+        # All the values are 0 or the value of the samples.
+        return np.count_nonzero(queries) == \
+            np.count_nonzero(queries == self._value)
+
+    def _build(self):
+        self._samples = np.ascontiguousarray(self.samples, dtype=np.float32)
+
+        self._value = _binary_value(self.samples)
+        self._packed = None
+        if self._value is not None:
+            self._packed = np.packbits(self.samples > 0, axis=1)
+
+    def __init__(self, samples, responses):
+        """
+        Constructor
+
+        Args:
+            samples: An array of samples.
+            responses: A list of responses of the samples.
+        """
+        samples = np.array(samples)
+        self.samples = samples.reshape(samples.shape[0], -1)
+        self.responses = np.array(responses, dtype=np.float32).reshape(-1)
+        assert self.samples.shape[0] == self.responses.shape[0]
+        self._build()
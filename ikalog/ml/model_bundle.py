@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import glob
+import logging
+import os
+import pickle
+import threading
+
+import numpy as np
+
+logger = logging.getLogger()
+
+# Version of the bundle format. Bundles of other versions are ignored.
+BUNDLE_VERSION = 1
+
+BUNDLE_FILENAME = 'models.bundle.npz'
+
+_VERSION_KEY = '__version__'
+
+
+def default_bundle_filename():
+    # Same as IkaUtils.get_path('data', BUNDLE_FILENAME), without importing
+    # ikalog.utils which imports the recognizers.
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    return os.path.join(base_dir, 'data', BUNDLE_FILENAME)
+
+
+def model_name(filename):
+    """
+    Returns:
+        The name of the model in the bundle.
+    """
+    return os.path.basename(filename)
+
+
+class ModelBundle(object):
+    """
+    Ready-to-use arrays of the models, compiled into a single .npz file.
+
+    The file is opened on the first lookup, and the arrays of a model are
+    read when the model is looked up. Models whose source files are newer
+    than the bundle are ignored, so the recognizers load their sources.
+    """
+
+    def get(self, filename, sources=None):
+        """
+        Look up the arrays of a model.
+
+        Args:
+            filename: Filename of the model.
+            sources: Filenames the model was compiled from. Defaults to
+                [filename].
+        Returns:
+            A dict of the arrays, or None if the model is not in the
+            bundle or out of date.
+        """
+        npz = self._open()
+        if npz is None:
+            return None
+
+        prefix = '%s/' % model_name(filename)
+        keys = [k for k in npz.files if k.startswith(prefix)]
+        if not keys:
+            return None
+
+        for source in (sources or [filename]):
+            try:
+                if os.path.getmtime(source) > self._mtime:
+                    logger.info('%s: %s is newer than the bundle' %
+                                (self, source))
+                    return None
+            except OSError:
+                pass
+
+        with self._lock:
+            return {k[len(prefix):]: npz[k] for k in keys}
+
+    def _open(self):
+        with self._lock:
+            # Don't share the file offset with the parent process.
+            if (self._npz is not None) and (self._pid == os.getpid()):
+                return self._npz
+            if self._failed or (self.filename is None):
+                return None
+
+            try:
+                npz = np.load(self.filename, allow_pickle=False)
+                version = int(npz[_VERSION_KEY])
+            except (OSError, KeyError, ValueError):
+                self._failed = True
+                return None
+
+            if version != BUNDLE_VERSION:
+                logger.warning('%s: unsupported version %s' %
+                               (self.filename, version))
+                npz.close()
+                self._failed = True
+                return None
+
+            self._npz = npz
+            self._pid = os.getpid()
+            self._mtime = os.path.getmtime(self.filename)
+            return self._npz
+
+    def close(self):
+        with self._lock:
+            if self._npz is not None:
+                self._npz.close()
+            self._npz = None
+            self._failed = False
+
+    @staticmethod
+    def write(filename, models):
+        """
+        Write a bundle.
+
+        Args:
+            filename: Filename of the bundle.
+            models: A dict of {model filename: dict of arrays}.
+        """
+        arrays = {_VERSION_KEY: np.array(BUNDLE_VERSION)}
+        for filename_, model_arrays in models.items():
+            for key, value in model_arrays.items():
+                arrays['%s/%s' % (model_name(filename_), key)] = \
+                    np.asarray(value)
+
+        # Don't let the readers see a partially written bundle.
+        tmp_filename = '%s.tmp.npz' % filename
+        np.savez(tmp_filename, **arrays)
+        os.replace(tmp_filename, filename)
+
+    def __init__(self, filename):
+        """
+        Constructor
+
+        Args:
+            filename: Filename of the bundle, or None for an empty bundle.
+        """
+        self.filename = filename
+        self._npz = None
+        self._pid = None
+        self._mtime = None
+        self._failed = False
+        self._lock = threading.RLock()
+
+
+_bundle = None
+_bundle_lock = threading.Lock()
+
+
+def get_bundle():
+    """
+    Returns:
+        The model bundle of the process.
+    """
+    global _bundle
+    with _bundle_lock:
+        if _bundle is None:
+            _bundle = ModelBundle(default_bundle_filename())
+        return _bundle
+
+
+def set_bundle(bundle):
+    """
+    Replace the model bundle of the process.
+
+    Returns:
+        The previous bundle.
+    """
+    global _bundle
+    with _bundle_lock:
+        prev, _bundle = _bundle, bundle
+        return prev
+
+
+def load_model_arrays(filename, sources=None):
+    return get_bundle().get(filename, sources)
+
+
+"""
+Compiler
+"""
+
+
+def _compile_knn_model(filename):
+    # KNN models are pickled as [samples, responses, (names)].
+    with open(filename, 'rb') as f:
+        l = pickle.load(f)
+
+    if not (isinstance(l, (list, tuple)) and len(l) in (2, 3) and
+            isinstance(l[0], np.ndarray) and (len(l[0]) == len(l[1]))):
+        return None
+
+    arrays = {'samples': l[0], 'responses': np.asarray(l[1])}
+    if len(l) == 3:
+        arrays['names'] = np.asarray(l[2])
+    return arrays
+
+
+def _compile_image_classifier(filename):
+    from ikalog.ml.classifier import ImageClassifier
+
+    c = ImageClassifier()
+    c.load_from_file(filename)
+    return c.export_arrays()
+
+
+def _compile_weapon_classifier(filename):
+    from ikalog.utils.neuralnet.weapon import WeaponClassifier
+
+    c = WeaponClassifier()
+    c.load_model_from_file(filename)
+    return c.export_arrays()
+
+
+def compile_models(dest_filename=None, data_dir=None):
+    """
+    Compile the models under the data directory into a bundle.
+
+    Returns:
+        A list of filenames of the compiled models.
+    """
+    dest_filename = dest_filename or default_bundle_filename()
+    data_dir = data_dir or os.path.dirname(default_bundle_filename())
+
+    targets = []
+    for pattern in ('*.model', '*.knn.data'):
+        for filename in sorted(glob.glob(os.path.join(data_dir, pattern))):
+            targets.append((filename, _compile_knn_model))
+
+    weapons_filename = os.path.join(data_dir, 'weapons.nn.data')
+    if os.path.exists(weapons_filename):
+        targets.append((weapons_filename, _compile_weapon_classifier))
+
+    pattern = os.path.join(data_dir, 'spl2', '*.pickle.dat')
+    for filename in sorted(glob.glob(pattern)):
+        targets.append((filename[:-len('.pickle.dat')],
+                        _compile_image_classifier))
+
+    # Compile from the sources, not from the current bundle.
+    prev_bundle = set_bundle(ModelBundle(None))
+    models = {}
+    try:
+        for filename, compile_func in targets:
+            try:
+                arrays = compile_func(filename)
+            except Exception as e:
+                logger.warning('%s: skipped (%s: %s)' %
+                               (filename, e.__class__.__name__, e))
+                continue
+
+            if arrays is None:
+                logger.info('%s: skipped (not a KNN model)' % filename)
+                continue
+            models[filename] = arrays
+    finally:
+        set_bundle(prev_bundle)
+
+    ModelBundle.write(dest_filename, models)
+    if prev_bundle is not None:
+        prev_bundle.close()
+    return sorted(models.keys())
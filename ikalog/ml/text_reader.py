@@ -26,8 +26,6 @@ import numpy as np
 from ikalog.ml import classifier
 
 
-_array0to1280 = np.array(range(1280), dtype=np.int32)
-
 def get_min_and_max(array_2d):
     """
     ゼロエリアを除いた最小枠を求める
@@ -38,8 +36,8 @@ def get_min_and_max(array_2d):
     # print(sum_x)
     # print(sum_y)
 
-    x_pixels = np.extract(sum_x > 0, _array0to1280)
-    y_pixels = np.extract(sum_y > 0, _array0to1280)
+    x_pixels = np.flatnonzero(sum_x > 0)
+    y_pixels = np.flatnonzero(sum_y > 0)
     #print('x_pixels', x_pixels)
     #print('y_pixels', y_pixels)
 
@@ -55,28 +53,22 @@ def get_min_and_max(array_2d):
 class PerCharacter(object):
 
     def cut(self, img, img_hist_x):
+        """
+        Find runs of non-empty columns. Runs narrower than four pixels
+        are ignored, except for the one at the right end.
+        """
+        in_char = np.concatenate(
+            ([False], np.asarray(img_hist_x) > 0, [False]))
+        edges = np.flatnonzero(in_char[1:] != in_char[:-1])
+        x_starts, x_ends = edges[0::2], edges[1::2]
+
         chars = []
-        in_char = False
-        x_start = None
-        last_x = None
-
-        for x in range(len(img_hist_x)):
-            if in_char:
-                if img_hist_x[x] > 0:
-                    continue
-                else:
-                    char = (x_start, x - 1)
-                    if char[1] - char[0] > 2:
-                        chars.append((x_start, x - 1))
-                    in_char = False
-            else:
-                if img_hist_x[x] > 0:
-                    x_start = x
-                    in_char = True
-                else:
-                    continue
-        if in_char:
-            chars.append((x_start, x))
+        last_x = len(img_hist_x) - 1
+        for x_start, x_end in zip(x_starts.tolist(), x_ends.tolist()):
+            if x_end > last_x:
+                chars.append((x_start, last_x))
+            elif (x_end - 1) - x_start > 2:
+                chars.append((x_start, x_end - 1))
 
         return chars
 
@@ -86,6 +78,11 @@ class TextReader(object):
         self._c = classifier.ImageClassifier()
         self._c.load_from_file('data/spl2/spl2.font2.dat')
 
+        # The font is trained with BGR images converted from grayscale.
+        self._c_gray = self._c.to_gray()
+        self._glyphs = np.zeros(
+            (16, self._c._resize[1], self._c._resize[0]), dtype=np.uint8)
+
     def read_int(self, img, verbose=False, crop_min_per_char=False):
         val_str, val_int = None, None
         val_str = self.read_char(img)
@@ -95,7 +92,13 @@ class TextReader(object):
             pass
         return val_int
 
-    def read_char(self, img, verbose=False, crop_min_per_char=False):
+    def segment(self, img, crop_min_per_char=False):
+        """
+        Cut a binarized text image into character images.
+
+        Returns:
+            A list of character images, or None if no text is found.
+        """
         rect = get_min_and_max(img)
         if rect is None:
             return None
@@ -108,44 +111,79 @@ class TextReader(object):
 
         img_char_list = list(map(lambda t: img[:, t[0]:t[1]], z))
 
-        img_char_f_list = []
-
-        s = ''
-        i = 0
-        for i in range(len(img_char_list)):
-            c = img_char_list[i]
-            if crop_min_per_char:
+        if crop_min_per_char:
+            for i in range(len(img_char_list)):
+                c = img_char_list[i]
                 rect = get_min_and_max(c)
                 if rect is None:
                     return None
                 x1, y1, x2, y2 = rect
-                c = c[y1:y2, x1: x2]
-
-            #cv2.imshow('text_read', c)
-            # cv2.waitKey()
-
-            if verbose:
-                cv2.imshow('image', c)
-            c = cv2.resize(c, self._c._resize)
-            c = cv2.cvtColor(c, cv2.COLOR_GRAY2BGR)
-            # print(c.shape)
-            y = self._c.predict1_index(c)
-
-            if y >= 0:
-                s = "%s%s" % (s, self._c._labels[y])
-                _l = str(y)
-            else:
+                img_char_list[i] = c[y1:y2, x1: x2]
+
+        return img_char_list
+
+    def normalize(self, img_char_list):
+        """
+        Resize character images into the preallocated glyph array.
+
+        Returns:
+            An array of N glyphs. It is overwritten on the next call.
+        """
+        n = len(img_char_list)
+        if n > self._glyphs.shape[0]:
+            self._glyphs = np.zeros(
+                (n * 2,) + self._glyphs.shape[1:], dtype=np.uint8)
+
+        for i in range(n):
+            cv2.resize(img_char_list[i], self._c._resize,
+                       dst=self._glyphs[i])
+        return self._glyphs[:n]
+
+    def classify(self, glyphs):
+        """
+        Classify glyphs with one classifier call.
+
+        Returns:
+            A list of characters. None for unknown characters.
+        """
+        y, margins = self._c_gray.predict_batch(glyphs)
+        labels = self._c._labels
+        return [(labels[i] if i >= 0 else None) for i in y]
+
+    def read_char_list(self, img_list, verbose=False, crop_min_per_char=False):
+        """
+        Read texts from binarized images, with one classifier call.
+
+        Returns:
+            A list of strings. None if no text is found in the image.
+        """
+        img_char_lists = [self.segment(img, crop_min_per_char)
+                          for img in img_list]
+        img_chars = [c for l in img_char_lists if l for c in l]
+        chars = self.classify(self.normalize(img_chars))
+
+        results = []
+        i = 0
+        for l in img_char_lists:
+            if l is None:
+                results.append(None)
+                continue
+
+            s = ''
+            for j in range(len(l)):
                 if verbose:
-                    print('%d 文字目が読めない' % i)
-                _l = 'confused'
-                # return None
+                    cv2.imshow('image', l[j])
+                    print(chars[i + j])
+                    cv2.waitKey(1000)
 
-            if verbose:
-                print(y)
-                cv2.waitKey(1000)
+                if chars[i + j] is not None:
+                    s = "%s%s" % (s, chars[i + j])
+                elif verbose:
+                    print('%d 文字目が読めない' % j)
+            results.append(s)
+            i += len(l)
 
-            # cv2.imwrite('number.%s.%s.png' %
-            #             (_l, time.time()), img_char_list[i])
-        # print('result', s)
+        return results
 
-        return s
+    def read_char(self, img, verbose=False, crop_min_per_char=False):
+        return self.read_char_list([img], verbose, crop_min_per_char)[0]
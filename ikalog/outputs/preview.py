@@ -31,7 +31,11 @@ class Screen(object):
     last_update = 0
 
     def on_show_preview(self, context, params):
-        img = context['engine'].get('preview', context['engine']['frame'])
+        preview = context['engine'].get('preview')
+        if preview is not None:
+            img = preview.render()
+        else:
+            img = context['engine']['frame']
         img_resized = cv2.resize(img, self.video_size)
 
         cv2.imshow('IkaLog', img_resized)
@@ -38,8 +38,7 @@ class PreviewDetected(object):
 
 
         for rect in self.rects:
-            cv2.rectangle(
-                context['engine']['preview'],
+            context['engine']['preview'].rectangle(
                 rect[0], rect[1],
                 color=(255, 255, 255),  # BGR
                 thickness=4
@@ -28,6 +28,9 @@ from ikalog.utils import *
 
 class ScreenshotPlugin(IkaLogPlugin):
 
+    # Encoding and writing PNGs should not block the frame processing.
+    async_dispatch = True
+
     def __init__(self, dest_dir=None):
         super(ScreenshotPlugin, self).__init__()
         self._memory = None
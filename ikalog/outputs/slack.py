@@ -30,6 +30,9 @@ _ = Localization.gettext_translation('slack', fallback=True).gettext
 
 class Slack(object):
 
+    # Posting to Slack should not block the frame processing.
+    async_dispatch = True
+
     def apply_ui(self):
         self.enabled = self.checkEnable.GetValue()
         self.url = self.editURL.GetValue()
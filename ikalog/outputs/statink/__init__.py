@@ -22,7 +22,6 @@ import json
 import os
 import pprint
 import sys
-import threading
 import time
 import traceback
 import webbrowser
@@ -32,7 +31,7 @@ import umsgpack
 from datetime import datetime
 from ikalog.outputs.statink.collector import StatInkCollector
 from ikalog.outputs.statink.composer import StatInkComposer
-from ikalog.utils.statink_uploader import UploadToStatInk
+from ikalog.utils.statink_uploader import StatInkUploader
 from ikalog.utils import *
 
 _ = Localization.gettext_translation('statink', fallback=True).gettext
@@ -60,6 +59,9 @@ class StatInkPlugin(StatInkCollector):
         config['enable_s2s'] = False
         config['s2s_path'] = None
 
+        # Directory to keep payloads until they are uploaded.
+        config['spool_dir'] = None
+
     def on_validate_configuration(self, config):
         boolean_params = ['enabled', 'write_payload_to_file', 'show_response', 'track_inklings',
                           'track_special_gauge', 'track_special_weapon', 'track_objective', 'track_splatzone', 'enable_s2s']
@@ -283,18 +285,17 @@ class StatInkPlugin(StatInkCollector):
             IkaUtils.dprint(traceback.format_exc())
 
 
-    def _post_payload_worker(self, context, payload, api_key,
-                             call_plugins_later_func=None):
-        url_statink_v2_battle = '%s/api/v2/battle' % self.config[
-            'endpoint_url']
-
-        # This function runs on worker thread.
-        error, statink_response = UploadToStatInk(payload,
-                                                  api_key,
-                                                  url_statink_v2_battle,
-                                                  self.config['show_response'],
-                                                  (self.config['dry_run'] == 'server'))
+    def _get_uploader(self):
+        if self._uploader is None:
+            spool_dir = self.config.get('spool_dir') or \
+                IkaUtils.get_path('statink_spool')
+            self._uploader = StatInkUploader(
+                spool_dir, show_response=self.config['show_response'])
+        return self._uploader
 
+    def _post_payload_done(self, context, call_plugins_later_func,
+                           error, statink_response):
+        # This function runs on the uploader thread.
         if not call_plugins_later_func:
             return
 
@@ -339,10 +340,41 @@ class StatInkPlugin(StatInkCollector):
         call_plugins_later_func = \
             context['engine']['service']['call_plugins_later']
 
-        thread = threading.Thread(
-            target=self._post_payload_worker,
-            args=(copied_context, payload, api_key, call_plugins_later_func))
-        thread.start()
+        def callback(error, statink_response):
+            self._post_payload_done(copied_context, call_plugins_later_func,
+                                    error, statink_response)
+
+        url_statink_v2_battle = '%s/api/v2/battle' % self.config[
+            'endpoint_url']
+
+        self._get_uploader().submit(
+            payload, api_key,
+            url=url_statink_v2_battle,
+            video_id=self.video_id,
+            dry_run=(self.config['dry_run'] == 'server'),
+            callback=callback,
+        )
+
+    def on_initialize_plugin(self, context, params=None):
+        if not self.config['enabled'] or self.config['dry_run'] == True:
+            return
+
+        if self.payload_file:
+            return
+
+        # Upload payloads left in the spool by the previous sessions.
+        uploader = self._get_uploader()
+        num_pending = len(uploader.pending())
+        if num_pending:
+            IkaUtils.dprint('%s: uploading %d spooled payload(s)' %
+                            (self, num_pending))
+
+    def on_stop(self, context, params=None):
+        if self._uploader is not None:
+            # Payloads not uploaded in time are uploaded on the next start.
+            self._uploader.flush(timeout=30.0)
+            self._uploader.stop()
+            self._uploader = None
 
     def payload2json(self, payload):
         payload = payload.copy()
@@ -364,6 +396,9 @@ class StatInkPlugin(StatInkCollector):
 
         self._s2s_last_battle_number_i = None
         self._s2s_last_check_time = None
+        self._uploader = None
+        self.video_id = None
+        self.payload_file = None
 
 
 class StatInk(StatInkPlugin):
@@ -377,7 +412,7 @@ class StatInk(StatInkPlugin):
                  anon_all=False, anon_others=False,
                  debug=False, dry_run=False, url='https://stat.ink',
                  video_id=None, payload_file=None,
-                 enable_s2s=False, s2s_path=None):
+                 enable_s2s=False, s2s_path=None, spool_dir=None):
         super(StatInk, self).__init__()
 
         config = self.config
@@ -396,6 +431,7 @@ class StatInk(StatInkPlugin):
         config['anon_others'] = anon_others
         config['enable_s2s'] = enable_s2s
         config['s2s_path'] = s2s_path
+        config['spool_dir'] = spool_dir
         self._s2s_prepare()
 
         self.video_id = video_id
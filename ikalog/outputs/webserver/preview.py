@@ -23,52 +23,161 @@ import time
 
 import cv2
 
+from ikalog.utils import *
+
+
+class PreviewBroadcaster(object):
+    """
+    Encode preview frames into JPEG once, and share them among the
+    MJPEG clients.
+
+    Frames are encoded on a thread at most max_fps times per second, and
+    only while a client is connected.
+    """
+
+    def put_frame(self, frame):
+        """
+        Set the latest frame. Never blocks.
+        """
+        if frame is None:
+            return
+
+        with self._cond:
+            self._frame = frame
+            self._frame_seq += 1
+            if self._num_listeners > 0:
+                self._cond.notify_all()
+
+    def add_listener(self):
+        with self._cond:
+            self._num_listeners += 1
+            if (self._thread is None) or (not self._thread.is_alive()):
+                self._stopped = False
+                self._thread = threading.Thread(
+                    target=self._worker, daemon=True,
+                    name='PreviewBroadcaster')
+                self._thread.start()
+            self._cond.notify_all()
+
+    def remove_listener(self):
+        with self._cond:
+            self._num_listeners -= 1
+
+    def wait_jpeg(self, last_seq, timeout=None):
+        """
+        Wait for a JPEG image newer than last_seq.
+
+        Args:
+            last_seq: Sequence number of the last image the client got.
+            timeout: Timeout in seconds.
+        Returns:
+            A tuple of (seq, jpeg), or None if stopped or timed out.
+        """
+        with self._cond:
+            r = self._cond.wait_for(
+                lambda: self._stopped or (self._jpeg_seq > last_seq),
+                timeout=timeout)
+            if self._stopped or (not r):
+                return None
+            return self._jpeg_seq, self._jpeg
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _encode(self, frame):
+        result, jpeg = cv2.imencode(
+            '.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self._quality])
+        if not result:
+            return None
+        return jpeg.tobytes()
+
+    def _worker(self):
+        encoded_seq = 0
+        next_time = 0
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if (self._num_listeners > 0) and \
+                            (self._frame_seq > encoded_seq):
+                        delay = next_time - time.time()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+
+                if self._stopped:
+                    return
+                frame = self._frame
+                encoded_seq = self._frame_seq
+
+            next_time = time.time() + self._interval
+
+            # Encode outside the lock so that put_frame() does not block.
+            jpeg = self._encode(frame)
+            if jpeg is None:
+                continue
+
+            with self._cond:
+                self._jpeg = jpeg
+                self._jpeg_seq += 1
+                self.num_encoded_frames += 1
+                self._cond.notify_all()
+
+    def __init__(self, max_fps=10, quality=95):
+        """
+        Constructor
+
+        Args:
+            max_fps: Maximum frame rate of the stream.
+            quality: JPEG quality (0 - 100).
+        """
+        self._interval = 1.0 / max_fps
+        self._quality = int(quality)
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_seq = 0
+        self._jpeg = None
+        self._jpeg_seq = 0
+        self._num_listeners = 0
+        self._stopped = False
+        self._thread = None
+        self.num_encoded_frames = 0
+
 
 class PreviewRequestHandler(object):
 
     def __init__(self, http_handler):
         self._http_handler = http_handler
-        self._plugin = http_handler.server.parent
-        self._frame = None
-        self._new_image = False
-        self._stopped = False
+        broadcaster = http_handler.server.parent.preview_broadcaster
 
         self._http_handler.send_response(200)
         self._http_handler.send_header(
             'Content-type', 'multipart/x-mixed-replace; boundary=--frame_boundary')
         self._http_handler.end_headers()
 
-        self._plugin._listeners.append(self)
+        broadcaster.add_listener()
+        try:
+            seq = 0
+            while True:
+                r = broadcaster.wait_jpeg(seq)
+                if r is None:
+                    break
+                seq, jpeg = r
 
-        while not self._stopped:
-            time.sleep(0.05)
+                self._http_handler.wfile.write(
+                    '--frame_boundary\r\n'.encode('utf-8')
+                )
+                self._http_handler.send_header('Content-Type', 'image/jpeg')
+                self._http_handler.send_header('Content-Length', str(len(jpeg)))
+                self._http_handler.end_headers()
+                self._http_handler.wfile.write(jpeg)
 
-            if (self._frame is None):
-                continue
-
-            # FIXME: JPEG data should be shared among connections, for
-            # performance
-            result, jpeg = cv2.imencode('.jpg', self._frame)
-            if not result:
-                continue
-
-            jpeg_length = len(jpeg)
-            self.new_image = False
+        except (BrokenPipeError, ConnectionResetError):
+            IkaUtils.dprint('%s: the client disconnected' % self)
 
-            self._http_handler.wfile.write(
-                '--frame_boundary\r\n'.encode('utf-8')
-            )
-            self._http_handler.send_header('Content-Type', 'image/jpeg')
-            self._http_handler.send_header('Content-Length', str(jpeg_length))
-            self._http_handler.end_headers()
-            self._http_handler.wfile.write(jpeg)
-
-        self._plugin._listeners.remove(self)
-
-    def on_event(self, event_name, context, params=None):
-        if event_name == 'on_show_preview':
-            self._frame = context['engine']['frame']
-            self._new_image = (self._frame is not None)
-
-        elif event_name == 'on_stop':
-            self._stopped = True
+        finally:
+            broadcaster.remove_listener()
@@ -33,7 +33,8 @@ import errno
 import cv2
 
 from ikalog.utils import *
-from .preview import PreviewRequestHandler
+from ikalog.utils.latency import get_latency_metrics
+from .preview import PreviewBroadcaster, PreviewRequestHandler
 from ikalog.version import IKALOG_VERSION
 
 
@@ -162,6 +163,15 @@ class APIServer(object):
     def _engine_preview(self, request_handler, payload):
         handler = PreviewRequestHandler(request_handler)
 
+    def _engine_scenes(self, request_handler, payload):
+        engine = _request_handler2engine(request_handler)
+        response = Response()
+        response.response = {
+            'status': 'ok',
+            'scenes': engine.scene_circuit_breaker.status(),
+        }
+        return response
+
     def _engine_stop(self, request_handler, payload):
         engine = _request_handler2engine(request_handler)
         engine.stop()
@@ -382,6 +392,12 @@ class APIServer(object):
         }
         return response
 
+    def _metrics_get(self, request_handler, payload):
+        response = Response()
+        response.content_type = 'text/plain; version=0.0.4'
+        response.response = get_latency_metrics().format_prometheus()
+        return response
+
     def process_request(self, request_handler, path, payload):
         handler = {
             '/view': self._view_game,
@@ -389,6 +405,7 @@ class APIServer(object):
             '/api/v1/engine/context/game': self._engine_context_game,
             '/api/v1/engine/source': self._engine_source,
             '/api/v1/engine/preview': self._engine_preview,
+            '/api/v1/engine/scenes': self._engine_scenes,
             '/api/v1/engine/stop': self._engine_stop,
             '/api/v1/input/devices': self._input_devices,
             '/api/v1/webui/system_info': self._webui_system_info,
@@ -402,6 +419,7 @@ class APIServer(object):
             '/api/v1/config/set': self._config_set,
             '/api/v1/config/validate': self._config_validate,
             '/api/v1/status/get': self._status_get,
+            '/api/v1/metrics': self._metrics_get,
         }.get(path, None)
 
         if handler is None:
@@ -501,11 +519,13 @@ class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
 
 class RESTAPIServer(object):
 
-    def __init__(self, enabled=False, bind_addr='127.0.0.1', port=8888, open_wui=True):
+    def __init__(self, enabled=False, bind_addr='127.0.0.1', port=8888, open_wui=True,
+                 preview_fps=10, preview_quality=95):
         self._bind_addr = bind_addr
         self._port = port
-        self._listeners = []
         self._httpd = None
+        self.preview_broadcaster = PreviewBroadcaster(
+            max_fps=preview_fps, quality=preview_quality)
         self._open_wui = open_wui
 
         self._worker_thread = None
@@ -556,13 +576,11 @@ class RESTAPIServer(object):
             del self._httpd
             IkaUtils.dprint('%s: Stopped.' % (self))
 
-        # Notify on_stop event to child listeners to stopping mjpeg stream.
-        for listener in self._listeners:
-            listener.on_event("on_stop", context, None)
+        # Stop the mjpeg streams.
+        self.preview_broadcaster.stop()
 
-    def on_uncaught_event(self, event_name, context, params=None):
-        for listener in self._listeners:
-            listener.on_event(event_name, context, params)
+    def on_show_preview(self, context, params):
+        self.preview_broadcaster.put_frame(context['engine']['frame'])
 
 if __name__ == "__main__":
     host = 'localhost'
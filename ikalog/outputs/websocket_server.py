@@ -18,6 +18,8 @@
 #  limitations under the License.
 #
 
+import asyncio
+import collections
 import json
 import os
 import sys
@@ -27,6 +29,7 @@ import time
 
 try:
     import tornado.ioloop
+    import tornado.iostream
     import tornado.web
     import tornado.websocket
     import tornado.template
@@ -34,14 +37,44 @@ try:
 except:
     _tornado_imported = False
 
+import umsgpack
+
 from ikalog.utils import *
 
 _ = Localization.gettext_translation('websocket_server', fallback=True).gettext
 
 # IkaLog Output Plugin: WebSocket server.
 
+# Connected clients. Accessed only on the IOLoop thread.
 websockets = []
 
+# High-rate events. Only the latest one is kept in the buffers.
+COALESCE_EVENTS = ('on_game_paint_score_update',)
+
+
+class Message(object):
+    """
+    A message to the clients. Encoded at most once per format.
+    """
+
+    def encode(self, binary=False):
+        if binary:
+            if self._msgpack is None:
+                self._msgpack = umsgpack.packb(self._d)
+            return self._msgpack
+
+        if self._json is None:
+            self._json = json.dumps(
+                self._d, separators=(',', ':'), ensure_ascii=False)
+        return self._json
+
+    def __init__(self, d):
+        self._d = d
+        self._json = None
+        self._msgpack = None
+        self.event = d.get('event')
+        self.coalesce = self.event in COALESCE_EVENTS
+
 
 class IndexHandler(tornado.web.RequestHandler):
     def get(self):
@@ -50,14 +83,20 @@ class IndexHandler(tornado.web.RequestHandler):
 
 
 class WebSocketHandler(tornado.websocket.WebSocketHandler):
-    def initialize(self, callback):
+    def initialize(self, callback, max_buffer=64):
         self.callback = callback
+        self.max_buffer = max_buffer
+        self.binary = False
+        self._messages = collections.deque()
+        self._sending = False
 
     def check_origin(self, origin):
         print('%s: origin %s' % (self, origin))
         return True
 
     def open(self):
+        # ws://host:port/ws?format=msgpack for msgpack binary frames.
+        self.binary = (self.get_argument('format', 'json') == 'msgpack')
         IkaUtils.dprint("%s: Connected" % self)
         websockets.append(self)
 
@@ -66,22 +105,86 @@ class WebSocketHandler(tornado.websocket.WebSocketHandler):
 
     def on_close(self):
         IkaUtils.dprint("%s: Closed" % self)
-        del websockets[websockets.index(self)]
+        if self in websockets:
+            websockets.remove(self)
+
+    def send(self, message):
+        """
+        Queue a message to the client. Called on the IOLoop thread.
+
+        Clients that cannot keep up with max_buffer messages are
+        disconnected.
+        """
+        if message.coalesce:
+            for i, queued in enumerate(self._messages):
+                if queued.event == message.event:
+                    del self._messages[i]
+                    break
+
+        if len(self._messages) >= self.max_buffer:
+            IkaUtils.dprint('%s: Disconnecting a slow client' % self)
+            if self in websockets:
+                websockets.remove(self)
+            self._messages.clear()
+            self.close()
+            return
+
+        self._messages.append(message)
+        if not self._sending:
+            self._sending = True
+            tornado.ioloop.IOLoop.current().spawn_callback(self._send_messages)
+
+    async def _send_messages(self):
+        try:
+            while self._messages:
+                message = self._messages.popleft()
+                await self.write_message(
+                    message.encode(self.binary), binary=self.binary)
+        except (tornado.websocket.WebSocketClosedError,
+                tornado.iostream.StreamClosedError):
+            self._messages.clear()
+        finally:
+            self._sending = False
 
 
 class WebSocketServer(object):
 
     def _send_message(self, d):
-        if len(websockets) == 0:
+        # Called on the engine thread. The messages are handed to the
+        # IOLoop thread, which owns the websockets.
+        if (len(websockets) == 0) or (self._ioloop is None):
             return
 
-        IkaUtils.dprint('%s: number of websockets = %d' %
-                        (self, len(websockets)))
-        d_json = json.dumps(d, separators=(',', ':'), ensure_ascii=False)
+        message = Message(d)
+        with self._lock:
+            if message.coalesce:
+                for i, queued in enumerate(self._queue):
+                    if queued.event == message.event:
+                        del self._queue[i]
+                        break
+            self._queue.append(message)
 
-        for s in websockets:
-            IkaUtils.dprint('  Sending a message to %s' % s)
-            s.write_message(d_json)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+
+        try:
+            self._ioloop.add_callback(self._flush_messages)
+        except RuntimeError:
+            # The IOLoop has been closed.
+            with self._lock:
+                self._queue.clear()
+                self._flush_scheduled = False
+
+    def _flush_messages(self):
+        with self._lock:
+            messages = list(self._queue)
+            self._queue.clear()
+            self._flush_scheduled = False
+
+        for message in messages:
+            for s in list(websockets):
+                s.send(message)
 
     # In-game basic events
 
@@ -286,17 +389,28 @@ class WebSocketServer(object):
 
     def worker_func(self, websocket_server):
         print(websocket_server)
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        ioloop = tornado.ioloop.IOLoop.current()
+
         self.application = tornado.web.Application([
             (r'/', IndexHandler),
-            (r'/ws', WebSocketHandler, dict(callback=self.on_message)),
+            (r'/ws', WebSocketHandler, dict(callback=self.on_message,
+                                            max_buffer=self._max_buffer)),
         ])
 
-        # FIXME: bind_addr
-        self.application.listen(websocket_server._port)
+        http_server = self.application.listen(
+            websocket_server._port, address=websocket_server._bind_addr)
+        self._ioloop = ioloop
 
         IkaUtils.dprint('%s: Listen port %d' % (self, websocket_server._port))
         IkaUtils.dprint('%s: Started server thread' % self)
-        tornado.ioloop.IOLoop.instance().start()
+        ioloop.start()
+
+        self._ioloop = None
+        http_server.stop()
+        for s in list(websockets):
+            s.close()
+        ioloop.close(all_fds=True)
         IkaUtils.dprint('%s: Stopped server thread' % self)
 
     def on_message(self, raw):
@@ -310,7 +424,9 @@ class WebSocketServer(object):
             pass
 
     def shutdown_server(self):
-        tornado.ioloop.IOLoop.instance().stop()
+        ioloop = self._ioloop
+        if ioloop is not None:
+            ioloop.add_callback(ioloop.stop)
 
     def initialize_server(self):
         if self.worker_thread is not None:
@@ -396,7 +512,18 @@ class WebSocketServer(object):
     def on_config_apply(self, context):
         self.apply_ui()
 
-    def __init__(self, enabled=False, bind_addr='127.0.0.1', port=9090):
+    def __init__(self, enabled=False, bind_addr='127.0.0.1', port=9090,
+                 max_buffer=64):
+        """
+        Constructor
+
+        Args:
+            enabled: True to start the server.
+            bind_addr: Address to listen on.
+            port: Port to listen on.
+            max_buffer: Number of messages buffered for each client.
+                Clients that cannot keep up are disconnected.
+        """
         self.players = []
         self.colors = {"neutral_color_hue": 135}
         if not _tornado_imported:
@@ -404,7 +531,15 @@ class WebSocketServer(object):
             print("インストールするには以下のコマンドを利用してください。\n    pip install tornado\n")
             return
         self._enabled = enabled
-        self._port = 9090
+        self._bind_addr = bind_addr
+        self._port = port
+        self._max_buffer = max_buffer
+
+        self._ioloop = None
+        self._lock = threading.Lock()
+        self._queue = collections.deque()
+        self._flush_scheduled = False
+
         self.worker_thread = None
         self.initialize_server()
 
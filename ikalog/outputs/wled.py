@@ -31,6 +31,11 @@ PALETTE_RAINBOW = 11
 
 class WLED(object):
 
+    # Requests to the lamps should not block the frame processing. Only
+    # the latest state matters.
+    async_dispatch = True
+    async_overflow = 'coalesce'
+
     ##
     # Creates initial color segments for a single squid lamp, with three groups of LEDs
     # Group 1: 8 LEDs. Swapped R & G channels from the wled settings
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import collections
+import logging
+import threading
+
+from ikalog.utils.context_snapshot import copy_value, snapshot_context
+
+logger = logging.getLogger()
+
+# Overflow policies of the event queue.
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_COALESCE = 'coalesce'
+
+
+class EventSnapshotter(object):
+    """
+    Take snapshots of the context and params of events.
+
+    Plugins on worker threads receive the snapshots, so the engine can go
+    on updating the context. Frames and the engine are shared, and
+    unchanged parts of the context are shared with the previous snapshot.
+    Snapshots must be treated as read-only.
+    """
+
+    def snapshot(self, context, params):
+        """
+        Returns:
+            A tuple of (context, params).
+        """
+        prev = self._prev if (self._prev_source is context) else None
+        snapshot = snapshot_context(context, prev=prev)
+
+        self._prev = snapshot
+        self._prev_source = context
+        return snapshot, copy_value(params)
+
+    def __init__(self):
+        self._prev = None
+        self._prev_source = None
+
+
+class PluginWorker(object):
+    """
+    Deliver events to an output plugin on its own thread.
+
+    Plugins opt in by setting the attributes below (e.g. in IkaConfig.py
+    or in the constructor):
+
+      async_dispatch: True to deliver events asynchronously.
+      async_queue_size: Number of events to be queued. (default: 64)
+      async_overflow: What to do when the queue is full.
+          'drop_oldest' drops the oldest event (default).
+          'coalesce' replaces the queued event of the same name with the
+          new one, so the plugin sees the latest state of frequent events
+          (e.g. on_frame_next). Falls back to 'drop_oldest'.
+    """
+
+    def put(self, event_name, context, params):
+        """
+        Queue an event. Never blocks.
+
+        Args:
+            event_name: Name of the event.
+            context: The snapshot of the context.
+            params: The snapshot of the params.
+        """
+        with self._cond:
+            if self._stopped:
+                return False
+
+            if self._overflow == OVERFLOW_COALESCE:
+                for i, event in enumerate(self._queue):
+                    if event[0] == event_name:
+                        del self._queue[i]
+                        self.num_coalesced_events += 1
+                        break
+
+            if len(self._queue) >= self._queue_size:
+                self._queue.popleft()
+                self.num_dropped_events += 1
+
+            self._queue.append((event_name, context, params))
+            self._cond.notify_all()
+        return True
+
+    def stop(self, timeout=5.0):
+        """
+        Deliver the queued events, and stop the thread.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.warning('%s: %s did not stop in %s seconds' % (
+                    self, self.plugin.__class__.__name__, timeout))
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not (self._queue or self._stopped):
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                event_name, context, params = self._queue.popleft()
+
+            # call_plugin() catches exceptions of the plugin.
+            self._call_plugin(self.plugin, event_name, params,
+                              context=context)
+
+    def __init__(self, plugin, call_plugin, queue_size=None, overflow=None):
+        """
+        Constructor
+
+        Args:
+            plugin: The output plugin.
+            call_plugin: Function to call an event handler of the plugin,
+                same as IkaEngine.call_plugin().
+            queue_size: Number of events to be queued. Defaults to
+                plugin.async_queue_size.
+            overflow: Overflow policy. Defaults to plugin.async_overflow.
+        """
+        self.plugin = plugin
+        self._call_plugin = call_plugin
+        self._queue_size = \
+            queue_size or getattr(plugin, 'async_queue_size', None) or 64
+        self._overflow = overflow or \
+            getattr(plugin, 'async_overflow', None) or OVERFLOW_DROP_OLDEST
+        assert self._overflow in (OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE)
+        assert self._queue_size > 0
+
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.num_dropped_events = 0
+        self.num_coalesced_events = 0
+
+        self._thread = threading.Thread(
+            target=self._worker, daemon=True,
+            name='PluginWorker-%s' % plugin.__class__.__name__)
+        self._thread.start()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import collections
+import logging
+import time
+import traceback
+
+logger = logging.getLogger()
+
+# States of a scene.
+STATE_ENABLED = 'enabled'
+STATE_DISABLED = 'disabled'
+# Re-enabled after the backoff; disabled again if the next run fails.
+STATE_PROBING = 'probing'
+
+
+def traceback_signature(exc_type, tb):
+    """
+    Returns:
+        A hashable signature of the exception: its type and the code
+        locations of the traceback. The message is not included, so
+        the same error with different values has the same signature.
+    """
+    frames = []
+    while tb is not None:
+        frames.append((tb.tb_frame.f_code.co_filename, tb.tb_lineno))
+        tb = tb.tb_next
+    return (exc_type.__name__, tuple(frames))
+
+
+class _Signature(object):
+
+    def __init__(self, exc_type, text, now):
+        self.exc_type = exc_type
+        self.text = text
+        self.count = 0
+        self.first_time = now
+        self.last_time = now
+        self.last_log_time = None
+        self.count_since_log = 0
+
+
+class _SceneFailures(object):
+
+    def __init__(self, window_size):
+        self.state = STATE_ENABLED
+        self.count = 0
+        self.recent = collections.deque(maxlen=window_size)
+        self.signatures = {}
+        self.backoff = 0.0
+        self.disabled_until = None
+        self.num_disabled = 0
+
+
+class SceneCircuitBreaker(object):
+    """
+    Account exceptions of scenes, and disable failing scenes for a while.
+
+    Exceptions are grouped by scene and traceback signature. The
+    traceback is formatted and logged on the first occurrence of a
+    signature; later occurrences are logged as a one-line summary at
+    most once per log_interval seconds.
+
+    If a scene fails max_failures times within window seconds, it is
+    disabled for backoff seconds. Afterwards the scene runs again; if it
+    fails on the first run, it is disabled again for twice as long (up
+    to max_backoff), otherwise the backoff is reset.
+    """
+
+    def allow(self, scene):
+        """
+        Returns:
+            True if the scene may run.
+        """
+        if not self._disabled:
+            return True
+
+        name = scene.__class__.__name__
+        failures = self._disabled.get(name)
+        if failures is None:
+            return True
+
+        if self._clock() < failures.disabled_until:
+            return False
+
+        del self._disabled[name]
+        failures.state = STATE_PROBING
+        self._probing[name] = failures
+        logger.info('%s: re-enabled %s' % (self, name))
+        return True
+
+    def record_success(self, scene):
+        if not self._probing:
+            return
+
+        failures = self._probing.pop(scene.__class__.__name__, None)
+        if failures is None:
+            return
+
+        failures.state = STATE_ENABLED
+        failures.backoff = 0.0
+        failures.recent.clear()
+        logger.info('%s: %s recovered' % (self, scene.__class__.__name__))
+
+    def record_failure(self, scene, exc_info):
+        """
+        Account an exception of the scene.
+
+        Args:
+            exc_info: sys.exc_info() of the exception.
+        Returns:
+            (formatted traceback, True if the signature is new)
+        """
+        name = scene.__class__.__name__
+        now = self._clock()
+
+        failures = self._scenes.get(name)
+        if failures is None:
+            failures = _SceneFailures(self._max_failures)
+            self._scenes[name] = failures
+        failures.count += 1
+        failures.recent.append(now)
+
+        exc_type, exc_value, tb = exc_info
+        key = traceback_signature(exc_type, tb)
+        sig = failures.signatures.get(key)
+        is_new = sig is None
+        if is_new:
+            text = ''.join(traceback.format_exception(*exc_info))
+            sig = _Signature(exc_type.__name__, text, now)
+            failures.signatures[key] = sig
+        sig.count += 1
+        sig.last_time = now
+        sig.count_since_log += 1
+
+        if is_new:
+            logger.info(f'{name} raised an exception >>>>')
+            for line in sig.text.rstrip('\n').split('\n'):
+                logger.info(line)
+            logger.info('<<<<<')
+            sig.last_log_time = now
+            sig.count_since_log = 0
+        elif now - sig.last_log_time >= self._log_interval:
+            logger.info('%s raised %s again (%d times in %ds, %d in total)' % (
+                name, sig.exc_type, sig.count_since_log,
+                now - sig.last_log_time, sig.count))
+            sig.last_log_time = now
+            sig.count_since_log = 0
+
+        probing = self._probing.pop(name, None) is not None
+        if probing or ((len(failures.recent) >= self._max_failures) and
+                       (now - failures.recent[0] <= self._window)):
+            self._disable(name, failures, now, probing)
+
+        return sig.text, is_new
+
+    def _disable(self, name, failures, now, probing):
+        if probing and failures.backoff:
+            failures.backoff = min(failures.backoff * 2, self._max_backoff)
+        else:
+            failures.backoff = self._backoff
+
+        failures.state = STATE_DISABLED
+        failures.disabled_until = now + failures.backoff
+        failures.num_disabled += 1
+        failures.recent.clear()
+        self._disabled[name] = failures
+
+        logger.warning('%s: disabled %s for %ds (%d failures in total)' % (
+            self, name, failures.backoff, failures.count))
+
+    def status(self):
+        """
+        Returns:
+            A dict of {scene name: status} of the scenes that have failed.
+        """
+        now = self._clock()
+        r = {}
+        for name, failures in list(self._scenes.items()):
+            disabled = failures.state == STATE_DISABLED
+            r[name] = {
+                'state': failures.state,
+                'failures': failures.count,
+                'num_disabled': failures.num_disabled,
+                'backoff_sec': failures.backoff,
+                'disabled_remaining_sec':
+                    max(0.0, failures.disabled_until - now) if disabled
+                    else 0.0,
+                'exceptions': [
+                    {
+                        'exception': sig.exc_type,
+                        'count': sig.count,
+                        'last_seen_sec_ago': now - sig.last_time,
+                        'text': sig.text,
+                    } for sig in sorted(list(failures.signatures.values()),
+                                        key=lambda s: -s.count)
+                ],
+            }
+        return r
+
+    def reset(self):
+        self._scenes = {}
+        self._disabled = {}
+        self._probing = {}
+
+    def __init__(self, max_failures=5, window=10.0, backoff=30.0,
+                 max_backoff=600.0, log_interval=60.0, clock=time.monotonic):
+        """
+        Constructor
+
+        Args:
+            max_failures: Number of failures to disable a scene.
+            window: Window in seconds to count the failures in.
+            backoff: Initial time in seconds to disable a scene for.
+            max_backoff: Maximum time in seconds to disable a scene for.
+            log_interval: Minimum interval in seconds to log repeated
+                exceptions of the same signature.
+        """
+        self._max_failures = max(1, max_failures)
+        self._window = window
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._log_interval = log_interval
+        self._clock = clock
+        self.reset()
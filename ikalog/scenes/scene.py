@@ -23,10 +23,25 @@ import time
 import cv2
 
 from ikalog.utils import *
+from ikalog.utils.latency import get_latency_metrics
 
 
 class Scene(object):
 
+    # Set True if the scene reads context['engine']['frame_hd'].
+    # Scenes that read only a few regions in 1080p coordinates should
+    # use FrameView.crop_hd() instead, so the engine can skip upscaling
+    # the whole frame.
+    want_frame_hd = False
+
+    # Game phases in which the engine runs the scene on each frame
+    # (see ikalog.scenes.scheduler). None to run in every phase.
+    scene_phases = None
+
+    # Minimum interval in msec between runs of the scene. 0 to run the
+    # scene on every frame.
+    scene_interval_msec = 0
+
     # シーンクラスを単体で動作させるためのクラスメソッド
     @classmethod
     def main_func(cls):
@@ -91,29 +106,25 @@ class Scene(object):
     def match_no_cache(self, context):
         raise Exception('%s: _match_no_cache must be overrided' % self)
 
+    # Time spent in nested scenes (is_another_scene_matched()) and plugin
+    # handlers is measured by themselves, and excluded from the scene.
     def _prof_enter(self):
-        self._prof_time_enter = time.time()
-        # FIXME: Scene profile includes plugin calls
+        self._latency.enter()
 
     def _prof_exit(self):
-        if self._prof_time_enter is None:
-            IkaUtils.dprint(
-                '%s: _prof_time_enter is None at _prof_exit(). Fix me.' % self)
-            return
-        duration = time.time() - self._prof_time_enter
-        self._prof_time_took = self._prof_time_took + duration
-        self._prof_time_enter = None
+        self._prof_time_took += self._latency.exit(self._prof_histogram)
 
     def match(self, context):
         self._prof_enter()
 
-        if (self._matched is None):
-            self._matched = self.match_no_cache(context)
+        try:
+            if (self._matched is None):
+                self._matched = self.match_no_cache(context)
 
-            if self._matched:
-                self._set_matched(context)
-
-        self._prof_exit()
+                if self._matched:
+                    self._set_matched(context)
+        finally:
+            self._prof_exit()
         return self._matched
 
     # 初期化時に一度だけ呼ばれる
@@ -132,11 +143,7 @@ class Scene(object):
         if scene is None:
             return None
 
-        self._prof_exit()
-        r = (scene.match(context) != False)
-        self._prof_enter()
-
-        return r
+        return (scene.match(context) != False)
 
     def find_scene_object(self, scene_name):
         if (self._engine is None):
@@ -167,9 +174,11 @@ class Scene(object):
             self._call_plugins = self._call_plugins_nop
             self._call_plugins_later = self._call_plugins_nop
 
-        self._init_scene()
-
-        self._prof_time_enter = False
+        self._latency = get_latency_metrics()
+        self._prof_histogram = self._latency.histogram(
+            'ikalog_scene_seconds', (('scene', self.__class__.__name__),))
         self._prof_time_took = 0.0
 
+        self._init_scene()
+
         self.reset()
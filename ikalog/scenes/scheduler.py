@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import logging
+
+logger = logging.getLogger()
+
+# Game phases.
+PHASE_LOBBY = 'lobby'
+PHASE_BATTLE = 'battle'
+PHASE_RESULT = 'result'
+
+ALL_PHASES = (PHASE_LOBBY, PHASE_BATTLE, PHASE_RESULT)
+
+
+class SceneScheduler(object):
+    """
+    Decide which scenes to run on the current frame.
+
+    Scenes declare the phases in which they can match (scene_phases)
+    and the minimum interval between runs (scene_interval_msec). The
+    engine switches the phase on game events.
+    """
+
+    def set_phase(self, phase):
+        """
+        Switch the current phase.
+
+        Returns:
+            True if the phase has changed.
+        """
+        assert phase in ALL_PHASES
+
+        if phase == self.phase:
+            return False
+
+        logger.info('%s: phase %s -> %s' % (self, self.phase, phase))
+        self.phase = phase
+        return True
+
+    def schedule(self, scene, msec):
+        """
+        Return True if the scene should run on the frame at |msec|.
+        """
+        if not self.enabled:
+            return True
+
+        phases = getattr(scene, 'scene_phases', None)
+        if (phases is not None) and (self.phase not in phases):
+            return False
+
+        interval_msec = getattr(scene, 'scene_interval_msec', 0)
+        if interval_msec and (msec is not None):
+            last_msec = self._last_run_msec.get(scene)
+            if (last_msec is not None) and (0 <= msec - last_msec < interval_msec):
+                return False
+            self._last_run_msec[scene] = msec
+
+        return True
+
+    def reset(self):
+        self.phase = PHASE_LOBBY
+        self._last_run_msec = {}
+
+    def __init__(self, enabled=True):
+        """
+        Constructor
+
+        Args:
+            enabled: If False, every scene runs on every frame.
+        """
+        self.enabled = enabled
+        self.reset()
@@ -358,16 +358,16 @@ class Spl2GameSpecialWeaponActivation(StatefulScene):
                     color = (0, 0, 90)
                 elif roi.state == roi.state_tracking:
                     color = (0, 255, 0) if matched else (0, 0, 255)
-                    cv2.putText(context['engine']['preview'], text=roi.special_weapon_id or 'None', org=(
+                    context['engine']['preview'].put_text(text=roi.special_weapon_id or 'None', org=(
                         roi.x, roi.y - 5), fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=0.7, color=(0, 255, 0), thickness=2, lineType=cv2.LINE_4)
 
-                cv2.rectangle(context['engine']['preview'],
-                              pt1=(roi.x, roi.y),
-                              pt2=(roi.x + roi.width, roi.y + roi.height),
-                              color=color,
-                              thickness=2,
-                              lineType=cv2.LINE_4,
-                              shift=0)
+                context['engine']['preview'].rectangle(
+                    pt1=(roi.x, roi.y),
+                    pt2=(roi.x + roi.width, roi.y + roi.height),
+                    color=color,
+                    thickness=2,
+                    lineType=cv2.LINE_4,
+                    shift=0)
 
         return r
 
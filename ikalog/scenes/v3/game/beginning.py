@@ -23,6 +23,7 @@ import logging
 import time
 
 from ikalog.scenes.stateful_scene import StatefulScene
+from ikalog.scenes.scheduler import PHASE_BATTLE
 from ikalog.utils import *
 
 
@@ -34,6 +35,8 @@ class Spl3GameBeginning(StatefulScene):
     Detect Beginning of the match.
     """
 
+    scene_phases = (PHASE_BATTLE,)
+
     def reset(self):
         super(Spl3GameBeginning, self).reset()
 
@@ -23,12 +23,16 @@ import time
 import cv2
 
 from ikalog.scenes.stateful_scene import StatefulScene
+from ikalog.scenes.scheduler import PHASE_BATTLE
 from ikalog.ml.classifier import ImageClassifier
 from ikalog.utils import *
 from ikalog.utils.character_recoginizer import *
 
 
 class Spl3GameDead(StatefulScene):
+
+    scene_phases = (PHASE_BATTLE,)
+
     coordinates = {
         'ja': {'top': 238, 'left': 485, 'width': 309, 'height': 31},
         'en': {'top': 274, 'left': 485, 'width': 309, 'height': 35},
@@ -43,7 +47,7 @@ class Spl3GameDead(StatefulScene):
             c = self.coordinates['en']
 
         if self.preview:
-            cv2.rectangle(context['engine']['preview'],
+            context['engine']['preview'].rectangle(
                 pt1=(c['left'], c['top']),
                 pt2=(c['left'] + c['width'], c['top'] + c['height']),
                 color=(0, 0, 255),
@@ -93,7 +97,7 @@ class Spl3GameDead(StatefulScene):
         weapon_id = self.deadly_weapon_recoginizer.match(img_weapon_b_bgr)
 
         if self.preview:
-            cv2.rectangle(context['engine']['preview'],
+            context['engine']['preview'].rectangle(
                 pt1=(c['left'], c['top']),
                 pt2=(c['left'] + c['width'], c['top'] + c['height']),
                 color=(0, 255, 0),
@@ -174,7 +178,7 @@ class Spl3GameDead(StatefulScene):
         matched = self.mask_dead.match(context['engine']['frame'])
 
         if self.preview:
-            cv2.putText(context['engine']['preview'], text='dead/%s' % matched, org=(1000,600), fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=1.0, color=(0,255,0), thickness=2, lineType=cv2.LINE_4)
+            context['engine']['preview'].put_text(text='dead/%s' % matched, org=(1000,600), fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=1.0, color=(0,255,0), thickness=2, lineType=cv2.LINE_4)
 
         if matched:
             self.recoginize_and_vote_death_reason(context)
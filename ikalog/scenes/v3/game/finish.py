@@ -27,6 +27,7 @@ import numpy as np
 from ikalog.ml.classifier import ImageClassifier
 from ikalog.utils import *
 from ikalog.scenes.stateful_scene import StatefulScene
+from ikalog.scenes.scheduler import PHASE_BATTLE, PHASE_RESULT
 
 
 class ROIRect:
@@ -59,13 +60,16 @@ def convert_color(color, mode):
 
 class Spl3GameFinish(StatefulScene):
 
+    # Keep watching after the battle in case the finish was missed.
+    scene_phases = (PHASE_BATTLE, PHASE_RESULT)
+
     def reset(self):
         super(Spl3GameFinish, self).reset()
 
         self._last_event_msec = - 100 * 1000
 
 
-    def match1(self, frame):
+    def match1(self, frame_view):
         lang = None  # FIXME
         roi = ROIs.get(lang) or ROIs.get('ja')
 
@@ -73,8 +77,7 @@ class Spl3GameFinish(StatefulScene):
         Phase 1: Check Finish! (GAME!)
         """
         img_mask_roi = self._finish_mask[roi.y: roi.y + roi.h, roi.x: roi.x + roi.w, 0]
-        img_roi = frame[roi.y: roi.y + roi.h, roi.x: roi.x + roi.w]
-        img_roi_hsv = cv2.cvtColor(img_roi, cv2.COLOR_BGR2HSV)
+        img_roi_hsv = frame_view.crop(roi.x, roi.y, roi.w, roi.h, plane='hsv')
         img_roi_v = img_roi_hsv[:, :, 2]
         img_roi_v2 = cv2.inRange(img_roi_v, 20, 70)
         img_finish_loss = abs(np.array(img_roi_v2, dtype=np.uint32) - (255 - img_mask_roi))
@@ -90,7 +93,7 @@ class Spl3GameFinish(StatefulScene):
         """
         Phase 2: Check the belt on black bg
         """
-        img_frame_hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        img_frame_hsv = frame_view.hsv
         img_frame_hsv_masked = img_frame_hsv & self._finish_mask
 
         # Check the color distribution, but all of 720p pixels are too much to do that.
@@ -115,19 +118,17 @@ class Spl3GameFinish(StatefulScene):
 
         bg_method=matcher.MM_COLOR_BY_HUE(hue=tape_hue, visibility=tape_vis)
         self._mask_finish.bg_method=bg_method
-        matched = self._mask_finish.match(frame)
+        matched = self._mask_finish.match(frame_view)
 
         return matched
 
 
     def _state_default(self, context):
-        frame = context['engine']['frame']
-
-        matched = self.match1(frame)
+        matched = self.match1(get_frame_view(context))
         if 0:
             preview = context['engine']['preview']
-            cv2.putText(preview, "game_finish %s" % matched, (100, 100),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            preview.put_text("game_finish %s" % matched, (100, 100),
+                             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
         if matched:
             self._last_event_msec = context['engine']['msec']
@@ -138,12 +139,11 @@ class Spl3GameFinish(StatefulScene):
 
     def _state_wait_for_timeout(self, context):
         # detection test only
-        frame = context['engine']['frame']
-        matched = self.match1(frame)
+        matched = self.match1(get_frame_view(context))
         if 0:
             preview = context['engine']['preview']
-            cv2.putText(preview, "game_finish %s" % matched, (100, 100),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            preview.put_text("game_finish %s" % matched, (100, 100),
+                             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
         if self.matched_in(context, 60 * 10000, attr='_last_event_msec'):
             return False
@@ -25,7 +25,9 @@ import cv2
 from ikalog.ml.classifier import ImageClassifier
 
 from ikalog.scenes.scene import Scene
+from ikalog.scenes.scheduler import PHASE_BATTLE
 from ikalog.utils import *
+from ikalog.utils.debug_artifacts import get_debug_artifacts
 from ikalog.utils.character_recoginizer import *
 
 from ikalog.utils.player_name import normalize_player_name
@@ -33,6 +35,8 @@ from ikalog.utils.player_name import normalize_player_name
 
 class Spl3GameKill(Scene):
 
+    scene_phases = (PHASE_BATTLE,)
+
     def reset(self):
         super(Spl3GameKill, self).reset()
 
@@ -51,13 +55,12 @@ class Spl3GameKill(Scene):
         for n in range(len(killed_y)):
             y = killed_y[n]
 
-            cv2.rectangle(img_preview720p,
-                          pt1=(x, y),
-                          pt2=(x + 49, y + 25),
-                          color=(0, 0, 255),
-                          thickness=2,
-                          lineType=cv2.LINE_4,
-                          shift=0)
+            img_preview720p.rectangle(pt1=(x, y),
+                                      pt2=(x + 49, y + 25),
+                                      color=(0, 0, 255),
+                                      thickness=2,
+                                      lineType=cv2.LINE_4,
+                                      shift=0)
 
             # Detect kill
             img_killed = context['engine']['frame'][y: y + 25, x:x + 49]
@@ -100,8 +103,8 @@ class Spl3GameKill(Scene):
                 'pos': n,
             })
 
-            if 0:
-                cv2.imshow('img_kill_hid', img_name_w_normalized)
+            get_debug_artifacts().submit('kill/name', img_name_norm,
+                                         context['engine']['msec'])
 
         return found
 
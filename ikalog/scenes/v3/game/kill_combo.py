@@ -23,10 +23,13 @@ import sys
 import cv2
 
 from ikalog.scenes.scene import Scene
+from ikalog.scenes.scheduler import PHASE_BATTLE
 from ikalog.utils import *
 
 class Spl3GameKillCombo(Scene):
 
+    scene_phases = (PHASE_BATTLE,)
+
     def reset(self):
         super(Spl3GameKillCombo, self).reset()
         self.resetParams()
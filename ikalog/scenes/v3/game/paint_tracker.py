@@ -25,7 +25,9 @@ import uuid
 import cv2
 
 from ikalog.scenes.scene import Scene
+from ikalog.scenes.scheduler import PHASE_BATTLE
 from ikalog.utils import *
+from ikalog.utils.debug_artifacts import get_debug_artifacts
 from ikalog.utils.character_recoginizer.number2 import Number2Classifier
 from ikalog.utils.image_filters import MM_WHITE
 
@@ -37,6 +39,10 @@ class Spl3PaintTracker(Scene):
     Paint Tracker for Splatoon 3
     """
 
+    scene_phases = (PHASE_BATTLE,)
+    # The counter is updated slowly.
+    scene_interval_msec = 250
+
     def reset(self):
         super(Spl3PaintTracker, self).reset()
 
@@ -46,17 +52,18 @@ class Spl3PaintTracker(Scene):
         """
         preview = context['engine']['preview']
 
-        img_counter = context['engine']['frame_hd'][52: 52 + 67, 1496: 1496+167]
+        img_counter = get_frame_view(context).crop_hd(1496, 52, 167, 67)
         img_counter_gray = MM_WHITE()(img_counter)
         img_counter_gray_bgr = cv2.cvtColor(img_counter_gray, cv2.COLOR_GRAY2BGR)
-        cv2.imshow("paint counter", img_counter_gray_bgr)
+        get_debug_artifacts().submit('paint_counter', img_counter_gray_bgr,
+                                     context['engine']['msec'])
 
 #        number2.training_mode =  True
         s = number2.match(img_counter_gray_bgr, num_digits=(4, 5), char_height=(50, 60))
 #        print(f"paint score {s}")
 
         if s:
-            cv2.putText(preview, "%s" % s, (1000, 100), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,255,255) , 2)
+            preview.put_text("%s" % s, (1000, 100), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,255,255) , 2)
 
         return []
 
@@ -25,6 +25,7 @@ import cv2
 import numpy as np
 
 from ikalog.scenes.stateful_scene import StatefulScene
+from ikalog.scenes.scheduler import PHASE_BATTLE
 from ikalog.utils import *
 
 
@@ -44,12 +45,10 @@ class ROIRect:
         self.h = h
 
 
-def detect_team_color(img_team):
+def detect_team_color(img_team_hsv):
     """
-    img = masked image of the team
+    img_team_hsv = masked image of the team, in HSV
     """
-    img_team_hsv = cv2.cvtColor(img_team, cv2.COLOR_BGR2HSV)
-
     img_team_h_1d = img_team_hsv[:, :, 0].reshape(
         (-1))  # Hue Channel but 1D array
     # FIXME: remove low-saturation pixels (black/gray/white) to remove abesnt players
@@ -69,6 +68,8 @@ class Spl3GameTeamColors(StatefulScene):
     FIXME: no tri-color battle support yet
     """
 
+    scene_phases = (PHASE_BATTLE,)
+
     def reset(self):
         super(Spl3GameTeamColors, self).reset()
 
@@ -155,8 +156,9 @@ class Spl3GameTeamColors(StatefulScene):
             ROIRect(x=697, y=15, w=240, h=60),
         ]
 
-        frame = context['engine']['frame']
-        img_frame_masked = frame & self._inklings2_mask
+        # The masks are black/white, so masking the HSV plane is
+        # equivalent to converting the masked frame.
+        img_frame_masked = get_frame_view(context).hsv & self._inklings2_mask
         # cv2.imshow("team_colors", img_frame_masked)
 
         team_colors = []
@@ -176,8 +178,9 @@ class Spl3GameTeamColors(StatefulScene):
                 img_bgr = cv2.cvtColor(img, cv2.COLOR_HSV2BGR)
                 color = img_bgr[0, 0, :]
 
-                context['engine']['preview'][roi.y + roi.h: roi.y +
-                                             roi.h + 5, roi.x: roi.x + roi.w] = color
+                context['engine']['preview'].fill_rect(
+                    (roi.x, roi.y + roi.h), (roi.x + roi.w, roi.y + roi.h + 5),
+                    color)
                 continue
 
         # ToDo: check result
@@ -203,8 +206,8 @@ class Spl3GameTeamColors(StatefulScene):
         # Detect team colors again each img_team roi
         team_colors = [None, None, None]  # Team Colors in Hue value.
 
-        frame = context['engine']['frame']
-        img_frame_masked = frame & self._inklings3_mask
+        frame_view = get_frame_view(context)
+        img_frame_masked = frame_view.hsv & self._inklings3_mask
 
         """
         Step 1: Check the bar at the step of inklings by Hue distribution
@@ -220,8 +223,8 @@ class Spl3GameTeamColors(StatefulScene):
         # team_colors[] from inklings indicator. Smaller value is better
         max_color_loss = 0
 
-        img_bar = frame[67: 67+10, 349:349+583]
-        img_bar_h = cv2.cvtColor(img_bar, cv2.COLOR_BGR2HSV)[0]
+        img_bar = frame_view.crop(349, 67, 583, 10, plane='hsv')
+        img_bar_h = img_bar[0]
         hist, bins = np.histogram(img_bar_h, 256, [0, 256])
 
         # set 0 to the top 3 clusters (== squid team colors)
@@ -29,6 +29,7 @@ import numpy as np
 from ikalog.scenes.stateful_scene import StatefulScene
 from ikalog.ml.text_reader import TextReader
 from ikalog.utils import *
+from ikalog.utils.debug_artifacts import get_debug_artifacts
 
 from ikalog.utils.character_recoginizer.number2 import Number2Classifier
 
@@ -64,6 +65,9 @@ class CustomTimeCoordinate:
     def crop(self, frame):
         return frame[self.top: self.top + self.height, self.left: self.left + self.width]
 
+    def crop_hd(self, frame_view):
+        return frame_view.crop_hd(self.left, self.top, self.width, self.height)
+
     def left720p(self):
         return int(self.left * 1280 / 1920) if self.left != 0 else 0
 
@@ -85,14 +89,13 @@ class CustomTimeCoordinate:
             height=self.height720p(),
         )
 
-    def drawRect(self, img_preview720p, color=(0, 0, 255)):
-        cv2.rectangle(img_preview720p,
-                      pt1=(self.left, self.top),
-                      pt2=(self.left + self.width, self.top + self.height),
-                      color=(0, 0, 255),
-                      thickness=2,
-                      lineType=cv2.LINE_4,
-                      shift=0)
+    def drawRect(self, preview, color=(0, 0, 255)):
+        preview.rectangle(pt1=(self.left, self.top),
+                          pt2=(self.left + self.width, self.top + self.height),
+                          color=(0, 0, 255),
+                          thickness=2,
+                          lineType=cv2.LINE_4,
+                          shift=0)
 
 
 # Coordinates of time possible
@@ -107,14 +110,14 @@ class TimerReader(object):
     _p_threshold = 0.7
     time_regexp = re.compile('(\d+):(\d+)')
 
-    def _read_time(self, img):
-        # if self._debug:
-        cv2.imwrite('time.png', img)
+    def _read_time(self, img_gray):
+        get_debug_artifacts().submit('timer/time', img_gray)
 
-        img = cv2.resize(img, (img.shape[1] * 2, img.shape[0] * 2))
+        # The input is a grayscale image, so its HSV visibility channel
+        # would be the same image; threshold it as is.
+        img_gray = cv2.resize(
+            img_gray, (img_gray.shape[1] * 2, img_gray.shape[0] * 2))
 
-        img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        img_gray = img_hsv[:, :, 2]
         img_gray[img_gray < 210] = 0
         #img_gray[img_hsv[:, :, 1] > 30] = 0
         img_gray[img_gray > 0] = 255
@@ -127,7 +130,6 @@ class TimerReader(object):
         return val_str
 
     def read_time(self, img):
-        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
         timestr = self._read_time(img)
 
         if not timestr:
@@ -212,8 +214,8 @@ class Spl3GameTimer(StatefulScene):
         coordinate = self._coordinate or TimeCoordinate
 
         preview = context['engine']['preview']
-        cv2.putText(preview, f"t: {s}", (coordinate.left720p(), 100),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        preview.put_text(f"t: {s}", (coordinate.left720p(), 100),
+                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
     def match_any_timer(self, context, preview=True):
         """
@@ -331,13 +333,14 @@ class Spl3GameTimer(StatefulScene):
         # FIXME: detect time value in yellow, less than 1 minutes - not working now.
         #        Current classifier only works with white number
 
-        img_timer = coordinate.crop(context['engine']['frame_hd'])
+        img_timer = coordinate.crop_hd(get_frame_view(context))
         #img_timer_gray = cv2.cvtColor(img_timer, cv2.COLOR_BGR2GRAY)
         # cv2.normalize(
         #    cv2.cvtColor(img_timer_gray, cv2.COLOR_GRAY2BGR),
         #    img_timer, 0, 255, norm_type=cv2.NORM_MINMAX)
 
-        cv2.imshow("timer: %s" % coordinate.id, img_timer)
+        get_debug_artifacts().submit('timer/%s' % coordinate.id, img_timer,
+                                     context['engine']['msec'])
         s = number2.match(img_timer)
 
         m = re.match("^(\d).(\d{2,2})$", s)
@@ -23,7 +23,9 @@ import logging
 import time
 
 from ikalog.scenes.stateful_scene import StatefulScene
+from ikalog.scenes.scheduler import PHASE_BATTLE
 from ikalog.utils import *
+from ikalog.utils.debug_artifacts import get_debug_artifacts
 
 
 logger = logging.getLogger()
@@ -34,6 +36,8 @@ class Spl3GameWeapons(StatefulScene):
     Detect weapon types
     """
 
+    scene_phases = (PHASE_BATTLE,)
+
     def reset(self):
         super(Spl3GameWeapons, self).reset()
 
@@ -64,9 +68,9 @@ class Spl3GameWeapons(StatefulScene):
         return False
 
     def detect_weapons(self, context):
-        filename = 'screenshots/weapon_detect.%s.png' % time.time()
-
-        cv2.imwrite(filename, context['engine']['frame'])
+        get_debug_artifacts().submit('weapon_detect',
+                                     context['engine']['frame'],
+                                     context['engine']['msec'])
         logger.info("Weapon detection performed")
 
     def dump(self, context):
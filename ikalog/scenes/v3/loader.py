@@ -33,19 +33,23 @@ from .lobby import Spl3Lobby
 from ikalog.scenes.blank import Blank
 
 
+# Scenes of the engine, in order of processing.
+SCENE_CLASSES = [
+    Spl3PaintTracker,
+    Spl3Lobby,
+    Spl3GameBeginning,
+    Spl3GameFinish,
+    Spl3GameKill,
+#    Spl3GameDead,
+    Spl3GameKillCombo,
+    Spl3GameTeamColors,
+    Spl3GameTimer,
+    Spl3GameWeapons,
+
+    Blank,
+]
+
+
 def initialize_scenes(engine):
-    s = [
-        Spl3PaintTracker(engine),
-        Spl3Lobby(engine),
-        Spl3GameBeginning(engine),
-        Spl3GameFinish(engine),
-        Spl3GameKill(engine),
-#        Spl3GameDead(engine),
-        Spl3GameKillCombo(engine),
-        Spl3GameTeamColors(engine),
-        Spl3GameTimer(engine),
-        Spl3GameWeapons(engine),
-
-        Blank(engine),
-    ]
+    s = [scene_class(engine) for scene_class in SCENE_CLASSES]
     return s
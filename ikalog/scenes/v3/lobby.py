@@ -24,6 +24,7 @@ import cv2
 import numpy as np
 
 from ikalog.scenes.stateful_scene import StatefulScene
+from ikalog.scenes.scheduler import PHASE_LOBBY, PHASE_RESULT
 from ikalog.utils import *
 
 from ikalog.ml.classifier import ImageClassifier
@@ -36,6 +37,8 @@ class Spl3Lobby(StatefulScene):
     based on World Premiere
     """
 
+    scene_phases = (PHASE_LOBBY, PHASE_RESULT)
+
     def reset(self):
         super(Spl3Lobby, self).reset()
 
@@ -51,7 +54,7 @@ class Spl3Lobby(StatefulScene):
             pass # ??
 
     def _state_default(self, context):
-        frame = context['engine']['frame']
+        frame = get_frame_view(context)
 
         r_yellow = self._mask_yellow_hud.match(frame)
         r_matching = self._mask_matching.match(frame)
@@ -81,7 +84,7 @@ class Spl3Lobby(StatefulScene):
             self._switch_state(self._state_left_queue)
 
     def _state_left_queue(self, context):
-        frame = context['engine']['frame']
+        frame = get_frame_view(context)
         r_yellow = self._mask_yellow_hud.match(frame)
 
         if (r_yellow):
@@ -95,7 +98,7 @@ class Spl3Lobby(StatefulScene):
 
 
     def _state_matching(self, context):
-        frame = context['engine']['frame']
+        frame = get_frame_view(context)
 
         r_matching = self._mask_matching.match(frame)
 
@@ -118,7 +121,7 @@ class Spl3Lobby(StatefulScene):
             self._switch_state(self._state_matched)
 
     def _state_matched(self, context):
-        frame = context['engine']['frame']
+        frame = get_frame_view(context)
 
         r_matched = self._mask_matched.match(frame)
         if r_matched:
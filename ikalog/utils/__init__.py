@@ -21,6 +21,9 @@ from __future__ import print_function
 
 from .image_loader import imread
 
+from .frame_view import FrameView, get_frame_view
+from .preview_layer import PreviewLayer
+
 from .ikautils import IkaUtils
 from .image_utils import ImageUtils
 from .matcher import IkaMatcher
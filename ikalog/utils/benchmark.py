@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import copy
+import glob
+import logging
+import os
+import platform
+import time
+import traceback
+
+import cv2
+import numpy as np
+
+from ikalog.utils.image_filters.filters import *
+from ikalog.utils.matcher import IkaMatcher
+
+logger = logging.getLogger()
+
+# Kernels of IkaMatcher2 to try, in (name, module) order.
+KERNELS = [
+    ('Numpy_uint8', 'ikalog.utils.ikamatcher2.reference'),
+    ('Numpy_uint8_fast', 'ikalog.utils.ikamatcher2.reference'),
+    ('Numpy_1bit', 'ikalog.utils.ikamatcher2.reference'),
+    ('NEON', 'ikalog.utils.ikamatcher2.arm_neon'),
+    ('HAL', 'lib.ikamatcher2_kernel_hal'),
+]
+
+FILTERS = [
+    ('MM_WHITE', MM_WHITE()),
+    ('MM_NOT_WHITE', MM_NOT_WHITE()),
+    ('MM_BLACK', MM_BLACK()),
+    ('MM_DARK', MM_DARK()),
+    ('MM_NOT_DARK', MM_NOT_DARK()),
+    ('MM_COLOR_BY_HUE',
+     MM_COLOR_BY_HUE(hue=(30 - 5, 30 + 5), visibility=(200, 255))),
+    ('MM_NOT_COLOR_BY_HUE',
+     MM_NOT_COLOR_BY_HUE(hue=(30 - 5, 30 + 5), visibility=(200, 255))),
+]
+
+PERCENTILES = (50, 90, 99)
+
+
+def available_kernels():
+    """
+    Return a list of (name, class) of the kernels that can be imported
+    on this platform.
+    """
+    kernels = []
+    for name, module_name in KERNELS:
+        try:
+            module = __import__(module_name, fromlist=[name])
+            kernels.append((name, getattr(module, name)))
+        except Exception:
+            logger.debug('%s: kernel %s is not available' % (__name__, name))
+    return kernels
+
+
+def _find_matchers(obj, seen):
+    # Walk the attributes of the scene for IkaMatchers, including the
+    # ones in MultiClassIkaMatchers, lists and dicts.
+    if id(obj) in seen:
+        return []
+    seen.add(id(obj))
+
+    if isinstance(obj, IkaMatcher):
+        return [obj]
+    if isinstance(obj, (list, tuple)):
+        children = obj
+    elif isinstance(obj, dict):
+        children = obj.values()
+    elif hasattr(obj, '__dict__') and \
+            type(obj).__module__.startswith('ikalog.'):
+        children = vars(obj).values()
+    else:
+        return []
+
+    matchers = []
+    for child in list(children):
+        matchers.extend(_find_matchers(child, seen))
+    return matchers
+
+
+def _most_common(counts, max_sizes):
+    sizes = sorted(counts, key=lambda size: (-counts[size], size))
+    return sizes[:max_sizes] if max_sizes else sizes
+
+
+def matcher_sizes(scene_classes=None, max_sizes=None):
+    """
+    Return the distinct (width, height) of the IkaMatchers of the scenes.
+
+    Scenes whose data files are not available are skipped.
+
+    Args:
+        scene_classes: Scenes to look into. Defaults to the scenes of
+            the engine.
+        max_sizes: If set, return up to this number of the most common sizes.
+    """
+    if scene_classes is None:
+        from ikalog.scenes.v3.loader import SCENE_CLASSES
+        scene_classes = SCENE_CLASSES
+
+    counts = {}
+    seen = set()
+    for scene_class in scene_classes:
+        try:
+            scene = scene_class(None)
+        except Exception:
+            logger.debug('%s: failed to initialize %s' %
+                         (__name__, scene_class.__name__))
+            continue
+
+        for matcher in _find_matchers(list(vars(scene).values()), seen):
+            size = (matcher._width, matcher._height)
+            counts[size] = counts.get(size, 0) + 1
+
+    return _most_common(counts, max_sizes)
+
+
+def mask_sizes(mask_dir='masks', max_sizes=None):
+    """
+    Return the distinct (width, height) of the regions matched by the
+    mask images.
+
+    Most masks are full frames with the region of interest painted, so
+    the size is the bounding box of the non-zero pixels of the mask.
+
+    Args:
+        mask_dir: Directory of the masks. Subdirectories are searched.
+        max_sizes: If set, return up to this number of the most common sizes.
+    """
+    counts = {}
+    filenames = glob.glob(os.path.join(mask_dir, '**', '*.png'),
+                          recursive=True)
+    for filename in sorted(filenames):
+        img = cv2.imread(filename, 0)
+        if img is None:
+            continue
+        points = cv2.findNonZero(img)
+        if points is None:
+            continue
+        x, y, w, h = cv2.boundingRect(points)
+        size = (w, h)
+        counts[size] = counts.get(size, 0) + 1
+
+    return _most_common(counts, max_sizes)
+
+
+def measure(func, repeat=100, warmup=3):
+    """
+    Call func() repeatedly and summarize the elapsed time.
+
+    Returns:
+        A dict of the elapsed time in milliseconds: mean, min, max and
+        p50/p90/p99.
+    """
+    for i in range(warmup):
+        func()
+
+    samples = np.empty(repeat, dtype=np.float64)
+    for i in range(repeat):
+        t1 = time.perf_counter()
+        func()
+        samples[i] = time.perf_counter() - t1
+    samples *= 1000.0
+
+    result = {
+        'repeat': repeat,
+        'mean': float(np.mean(samples)),
+        'min': float(np.min(samples)),
+        'max': float(np.max(samples)),
+    }
+    for p, value in zip(PERCENTILES, np.percentile(samples, PERCENTILES)):
+        result['p%d' % p] = float(value)
+    return result
+
+
+def _random_mask(width, height, seed=0):
+    np.random.seed(seed)
+    return np.random.randint(0, 2, (height, width), dtype=np.uint8) * 255
+
+
+def _random_frame(seed=0):
+    np.random.seed(seed)
+    return np.random.randint(0, 256, (720, 1280, 3), dtype=np.uint8)
+
+
+def bench_kernels(sizes, repeat=100):
+    """
+    Benchmark encode() and logical_and/or_popcnt() of the kernels.
+    """
+    results = []
+    for name, kernel_class in available_kernels():
+        for width, height in sizes:
+            kernel = kernel_class(width, height)
+            kernel.load_mask(_random_mask(width, height, seed=1))
+            img = _random_mask(width, height, seed=2)
+            img_encoded = kernel.encode(img)
+
+            params = {'kernel': name, 'size': '%dx%d' % (width, height)}
+            results.append(dict(
+                params, name='kernel.encode',
+                **measure(lambda: kernel.encode(img), repeat)))
+            results.append(dict(
+                params, name='kernel.and_or_popcnt',
+                **measure(lambda: (kernel.logical_and_popcnt(img_encoded),
+                                   kernel.logical_or_popcnt(img_encoded)),
+                          repeat)))
+    return results
+
+
+def bench_filters(sizes, repeat=100):
+    """
+    Benchmark the image filters on crops of a frame, and on the frame.
+    """
+    frame = _random_frame()
+    sizes = list(sizes)
+    if (1280, 720) not in sizes:
+        sizes.append((1280, 720))
+
+    results = []
+    for name, image_filter in FILTERS:
+        for width, height in sizes:
+            img_bgr = frame[0: height, 0: width]
+            img_hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
+            img_gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+
+            results.append(dict(
+                name='filter', filter=name, size='%dx%d' % (width, height),
+                **measure(lambda: image_filter(
+                    img_bgr=img_bgr, img_gray=img_gray, img_hsv=img_hsv),
+                    repeat)))
+
+            if not image_filter.want_hsv_image:
+                continue
+
+            # Without the HSV image, color filters convert the image, or
+            # use the color LUT if enabled.
+            results.append(dict(
+                name='filter_bgr', filter=name,
+                size='%dx%d' % (width, height),
+                **measure(lambda: image_filter(img_bgr=img_bgr), repeat)))
+
+            lut_filter = copy.copy(image_filter)
+            if not lut_filter.enable_color_lut():
+                continue
+            results.append(dict(
+                name='filter_lut', filter=name,
+                size='%dx%d' % (width, height),
+                **measure(lambda: lut_filter(img_bgr=img_bgr), repeat)))
+    return results
+
+
+def _text_image(text, height=60, scale=2.0):
+    img = np.zeros((height, 60 * len(text), 3), dtype=np.uint8)
+    cv2.putText(img, text, (5, height - 8), cv2.FONT_HERSHEY_SIMPLEX,
+                scale, (255, 255, 255), 5)
+    return img
+
+
+def bench_recognizers(sizes=None, repeat=100):
+    """
+    Benchmark the recognizers whose models are available.
+
+    The recognizers read text of their own size, so sizes is ignored.
+    """
+    results = []
+
+    try:
+        from ikalog.utils.character_recoginizer.number2 import Number2Classifier
+        number2 = Number2Classifier()
+        img_timer = _text_image('4:59')
+        img_counter = _text_image('1234p')
+        results.append(dict(
+            name='recognizer', recognizer='Number2Classifier.timer',
+            **measure(lambda: number2.match(img_timer), repeat)))
+        results.append(dict(
+            name='recognizer', recognizer='Number2Classifier.counter',
+            **measure(lambda: number2.match(
+                img_counter, num_digits=(4, 5), char_height=(50, 60)),
+                repeat)))
+    except Exception:
+        logger.warning('%s: Number2Classifier is not available' % __name__)
+        logger.debug(traceback.format_exc())
+
+    try:
+        from ikalog.ml.text_reader import TextReader
+        text_reader = TextReader()
+        img_text = cv2.cvtColor(_text_image('123'), cv2.COLOR_BGR2GRAY)
+        results.append(dict(
+            name='recognizer', recognizer='TextReader',
+            **measure(lambda: text_reader.read_char(img_text), repeat)))
+    except Exception:
+        logger.warning('%s: TextReader is not available' % __name__)
+        logger.debug(traceback.format_exc())
+
+    return results
+
+
+SUITES = {
+    'kernels': bench_kernels,
+    'filters': bench_filters,
+    'recognizers': bench_recognizers,
+}
+
+
+def result_key(result):
+    """
+    Return the key to identify the same benchmark among runs.
+    """
+    return tuple(sorted(
+        (k, v) for k, v in result.items() if isinstance(v, str)))
+
+
+def run(suites=None, mask_dir='masks', max_sizes=5, repeat=100):
+    """
+    Run the benchmark suites.
+
+    Returns:
+        A dict with the environment and the list of results.
+    """
+    sizes = matcher_sizes(max_sizes=max_sizes) or \
+        mask_sizes(mask_dir, max_sizes=max_sizes) or [(1024, 1024)]
+
+    results = []
+    for suite in (suites or sorted(SUITES)):
+        results.extend(
+            [dict(r, suite=suite) for r in SUITES[suite](sizes, repeat)])
+
+    return {
+        'time': time.time(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'kernels': [name for name, kernel_class in available_kernels()],
+        'results': results,
+    }
+
+
+def compare(baseline, report, key='p50', tolerance=0.2):
+    """
+    Compare the report with the baseline report.
+
+    Returns:
+        A list of (result_key, baseline_msec, msec) of the benchmarks
+        slower than the baseline by more than the tolerance.
+    """
+    baseline_results = {result_key(r): r for r in baseline['results']}
+
+    regressions = []
+    for r in report['results']:
+        b = baseline_results.get(result_key(r))
+        if b is None:
+            continue
+        if r[key] > b[key] * (1.0 + tolerance):
+            regressions.append((result_key(r), b[key], r[key]))
+    return regressions
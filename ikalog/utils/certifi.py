@@ -27,6 +27,8 @@ class Certifi(object):
 
     @staticmethod
     def where():
+        from ikalog.utils.ikautils import IkaUtils
+
         cacert_pem = IkaUtils.get_path('cacert.pem')
         if os.path.exists(cacert_pem):
             return cacert_pem
@@ -22,6 +22,9 @@ import cv2
 import numpy as np
 import pickle
 
+from ikalog.ml.knn_index import KNNIndex
+from ikalog.ml.model_bundle import load_model_arrays
+
 from ikalog.utils.character_recoginizer import *
 
 # vertical_trim_policy
@@ -118,9 +121,13 @@ class CharacterRecoginizer(object):
         f.close()
 
     def load_model_from_file(self, file):
-        f = open(file, 'rb')
-        l = pickle.load(f)
-        f.close()
+        arrays = load_model_arrays(file)
+        if arrays is not None:
+            l = [arrays['samples'], arrays['responses'].tolist()]
+        else:
+            f = open(file, 'rb')
+            l = pickle.load(f)
+            f.close()
         self.samples = l[0]
         self.responses = l[1]
 
@@ -146,11 +153,7 @@ class CharacterRecoginizer(object):
         self.responses.append(response)
 
     def train(self):
-        samples = np.array(self.samples, np.float32)
-        responses = np.array(self.responses, np.float32)
-        responses = responses.reshape((responses.size, 1))
-        responses = np.array(self.responses, np.float32)
-        self.model.train(samples, cv2.ml.ROW_SAMPLE, responses)
+        self.index = KNNIndex(self.samples, self.responses)
         self.trained = True
 
     def extract_characters(self, img):
@@ -224,7 +227,12 @@ class CharacterRecoginizer(object):
 
         return samples
 
-    def match1(self, img):
+    def normalize_sample(self, img):
+        """
+        Returns:
+            The thresholded image of the character, or None if the image
+            is almost black.
+        """
         if (img.shape[0] != self.sample_width) or (img.shape[1] != self.sample_height):
             img = cv2.resize(
                 img, (self.sample_width, self.sample_height), interpolation=cv2.INTER_NEAREST)
@@ -239,23 +247,45 @@ class CharacterRecoginizer(object):
 
         if raito < 0.1:
             # ほぼ真っ黒
-            return 0
+            return None
 
-        sample = img.reshape((1, img.shape[0] * img.shape[1]))
-        sample = np.array(sample, np.float32)
+        return img
 
+    def match_samples(self, samples):
+        """
+        Recognize the characters at once.
+
+        Returns:
+            A list of the character codes. 0 for almost black images.
+        """
         k = 3
 
-        retval, results, neigh_resp, dists = self.model.findNearest(sample, k)
+        imgs = [self.normalize_sample(img) for img in samples]
+        features = [img.reshape(-1) for img in imgs if img is not None]
+        if not features:
+            return [0] * len(imgs)
+
+        results = iter(self.index.find_nearest(np.array(features), k)[0])
+
+        codes = []
+        for img in imgs:
+            if img is None:
+                codes.append(0)
+                continue
 
-        # 学習データを集めたいときなど
-        if self.training_mode:
-            import time
-            cv2.imwrite('training/numbers/%s.%s.png' %
-                        (retval, time.time()), img)
+            d = int(next(results))
+            codes.append(d)
 
-        d = int(results.ravel())
-        return d
+            # 学習データを集めたいときなど
+            if self.training_mode:
+                import time
+                cv2.imwrite('training/numbers/%s.%s.png' %
+                            (float(d), time.time()), img)
+
+        return codes
+
+    def match1(self, img):
+        return self.match_samples([img])[0]
 
     def match(self, img, num_digits=None, char_width=None, char_height=None):
         if not self.trained:
@@ -269,9 +299,8 @@ class CharacterRecoginizer(object):
         )
 
         s = ''
-        for sample in samples:
-            c = chr(self.match1(sample))
-            s = s + c
+        for c in self.match_samples(samples):
+            s = s + chr(c)
 
         return s
 
@@ -303,4 +332,4 @@ class CharacterRecoginizer(object):
 
         self.samples = None  # np.empty((0, 21 * 14))
         self.responses = []
-        self.model = cv2.ml.KNearest_create()
+        self.index = None
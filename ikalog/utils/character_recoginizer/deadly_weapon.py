@@ -22,6 +22,7 @@ import cv2
 import os
 import numpy as np
 
+from ikalog.ml.model_bundle import load_model_arrays
 from ikalog.utils.character_recoginizer import *
 from ikalog.utils import *
 from ikalog.constants import cause_of_death_v2
@@ -134,9 +135,14 @@ class DeadlyWeaponRecoginizer(CharacterRecoginizer):
         f.close()
 
     def load_model_from_file(self, file):
-        f = open(file, 'rb')
-        l = pickle.load(f)
-        f.close()
+        arrays = load_model_arrays(file)
+        if arrays is not None:
+            l = [arrays['samples'], arrays['responses'].tolist(),
+                 arrays['names'].tolist()]
+        else:
+            f = open(file, 'rb')
+            l = pickle.load(f)
+            f.close()
         self.samples = l[0]
         self.responses = l[1]
         self.name2id_table = l[2]
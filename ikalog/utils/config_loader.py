@@ -80,6 +80,7 @@ def _init_source(opts):
         source.select_source(name=(opts.get('input_file') or
                                    input_args.get('source')))
         source.set_frame_rate(input_args.get('frame_rate'))
+        source.set_seek_threshold(input_args.get('seek_threshold_msec'))
         source.set_use_file_timestamp(input_args.get('use_file_timestamp'))
         return source
 
@@ -134,6 +135,15 @@ def _replace_vars(args, vars):
         replaced[arg_key] = arg_val
     return replaced
 
+
+def _set_async_args(plugin, args):
+    plugin.async_dispatch = args.get('enabled', True)
+    if 'queue_size' in args:
+        plugin.async_queue_size = args['queue_size']
+    if 'overflow' in args:
+        plugin.async_overflow = args['overflow']
+
+
 def _init_outputs(opts):
     # 使いたいプラグインを適宜設定
     OutputPlugins = []
@@ -271,6 +281,14 @@ def _init_outputs(opts):
     if 'Say' in output_plugins:
         args = _replace_vars(output_args['Say'], vars)
         OutputPlugins.append(outputs.Say(**args))
+
+    # 非同期でイベントを受け取るプラグインの設定
+    async_args = getattr(IkaConfig, 'ASYNC_PLUGINS', None) or {}
+    for op in OutputPlugins:
+        args = async_args.get(op.__class__.__name__)
+        if args is not None:
+            _set_async_args(op, args)
+
     return OutputPlugins
 
 
@@ -281,6 +299,11 @@ def config(opts):
     if hasattr(IkaConfig, 'IkaConfig'):
         return IkaConfig.IkaConfig().config(opts)
 
+    # IkaMatcher2 のカーネルを選択 (マスクを作る前に行う)
+    if getattr(IkaConfig, 'IKAMATCHER2_KERNEL', None):
+        from ikalog.utils.ikamatcher2 import matcher
+        matcher.load_kernel(IkaConfig.IKAMATCHER2_KERNEL)
+
     # 使いたい入力を設定
     source = _init_source(opts)
 
@@ -297,6 +320,10 @@ def config(opts):
     if 'frame_rate' in source_args:
         source.set_frame_rate(source_args['frame_rate'])
 
+    # コマンドラインの --frame_rate を優先
+    if opts.get('frame_rate'):
+        source.set_frame_rate(opts['frame_rate'])
+
     # 使いたいプラグインを適宜設定
     OutputPlugins = _init_outputs(opts)
 
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import copy
+
+import numpy as np
+
+# Entries of context['engine'] that hold frame buffers.
+FRAME_KEYS = ('frame', 'frame_hd', 'frame_view', 'preview')
+
+# Entries of context['engine'] that hold the engine and its functions.
+ENGINE_KEYS = ('engine', 'service')
+
+# Sections of the context shared with the previous snapshot if unchanged.
+_SHARED_SECTIONS = ('game', 'lobby', 'scenes', 'config')
+
+_ATOMS = (type(None), bool, int, float, complex, str, bytes)
+
+
+def copy_value(value):
+    """
+    Copy a value of the context.
+
+    Containers are copied recursively. Images (numpy arrays) are shared
+    by reference: the engine and scenes replace images rather than
+    modify them, so they are treated as immutable.
+    """
+    t = type(value)
+    if t in _ATOMS:
+        return value
+    if t is dict:
+        return {k: copy_value(v) for k, v in value.items()}
+    if t is list:
+        return [copy_value(v) for v in value]
+    if t is tuple:
+        return tuple([copy_value(v) for v in value])
+    if t is np.ndarray:
+        return value
+    return copy.deepcopy(value)
+
+
+def _same(a, b):
+    # Shared images compare by identity inside containers, so == works
+    # unless an image has been replaced.
+    if type(a) is not type(b):
+        return False
+    try:
+        return bool(a == b)
+    except (ValueError, TypeError):
+        return False
+
+
+def _copy_section(value, prev):
+    if prev is None or type(value) is not dict or type(prev) is not dict:
+        return copy_value(value)
+
+    if _same(value, prev):
+        return prev
+
+    section = {}
+    for k, v in value.items():
+        if (k in prev) and _same(v, prev[k]):
+            section[k] = prev[k]
+        else:
+            section[k] = copy_value(v)
+    return section
+
+
+def snapshot_context(context, frames=True, engine=True, prev=None):
+    """
+    Return a snapshot of the context.
+
+    Snapshots must be treated as read-only: they share images with the
+    context, and unchanged parts with the previous snapshot.
+
+    Args:
+        context: The context.
+        frames: If True, frame buffers (frame, frame_hd, frame_view and
+            preview) are shared by reference. Otherwise they are None.
+        engine: If True, the engine and its services are shared.
+            Otherwise they are None and {}.
+        prev: The previous snapshot. Game, lobby, scenes and config
+            (or their entries) equal to the previous snapshot are shared
+            with it, instead of being copied again.
+    Returns:
+        The snapshot.
+    """
+    snapshot = {}
+    for key, value in context.items():
+        if key == 'engine':
+            continue
+        prev_value = prev.get(key) if (prev and key in _SHARED_SECTIONS) else None
+        snapshot[key] = _copy_section(value, prev_value)
+
+    if 'engine' in context:
+        snapshot_engine = {}
+        for key, value in context['engine'].items():
+            if key in FRAME_KEYS:
+                snapshot_engine[key] = value if frames else None
+            elif key in ENGINE_KEYS:
+                snapshot_engine[key] = value if engine else None
+            else:
+                snapshot_engine[key] = copy_value(value)
+
+        if (not engine) and ('service' in snapshot_engine):
+            snapshot_engine['service'] = {}
+        snapshot['engine'] = snapshot_engine
+
+    return snapshot
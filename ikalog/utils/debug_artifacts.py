@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+import cv2
+
+logger = logging.getLogger()
+
+
+def _safe_name(name):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_') or '_'
+
+
+class DebugArtifacts(object):
+    """
+    Sink for debug images of scenes and recognizers.
+
+    Scenes submit images by name (e.g. 'timer/default') instead of
+    calling cv2.imwrite() or cv2.imshow() on the frame path. If enabled,
+    every sample_every-th image of a name is accepted, at most one per
+    min_interval seconds, and written as
+    <directory>/<name>/<time>_<sequence>.png on a background thread.
+    Images are dropped if the writer falls behind.
+
+    If disabled (default), submit() returns immediately.
+    """
+
+    def submit(self, name, img, msec=None):
+        """
+        Submit an image.
+
+        Args:
+            name: Name of the artifact; '/' separates subdirectories.
+            img: The image. A copy is written, so the caller may modify
+                it afterwards.
+            msec: context['engine']['msec'] of the frame, if any.
+        Returns:
+            True if the image is accepted.
+        """
+        if not self.enabled:
+            return False
+
+        with self._lock:
+            count = self._counts.get(name, 0)
+            self._counts[name] = count + 1
+            if count % self._sample_every:
+                return False
+
+            now = time.time()
+            if now < self._next_time.get(name, 0):
+                return False
+            self._next_time[name] = now + self._min_interval
+
+            self._seq += 1
+            seq = self._seq
+
+        try:
+            self._queue.put_nowait((name, img.copy(), now, seq, msec))
+        except queue.Full:
+            self.num_dropped += 1
+            return False
+        return True
+
+    def _filename(self, name, t, seq, msec):
+        parts = [_safe_name(p) for p in name.split('/') if p]
+        dirname = os.path.join(self.directory, *parts)
+        basename = '%s_%06d' % (time.strftime('%Y%m%d_%H%M%S',
+                                              time.localtime(t)), seq)
+        if msec is not None:
+            basename = '%s_%dms' % (basename, msec)
+        return dirname, os.path.join(dirname, '%s.png' % basename)
+
+    def _worker_func(self, q):
+        while True:
+            item = q.get()
+            if item is None:
+                break
+
+            name, img, t, seq, msec = item
+            dirname, filename = self._filename(name, t, seq, msec)
+            try:
+                os.makedirs(dirname, exist_ok=True)
+                if not cv2.imwrite(filename, img):
+                    raise OSError('cv2.imwrite() failed')
+                self.num_written += 1
+            except Exception as e:
+                logger.warning('%s: failed to write %s: %s' %
+                               (self, filename, e))
+
+    def enable(self, directory='debug', sample_every=1, min_interval=1.0,
+               max_queue=16):
+        """
+        Start writing artifacts.
+
+        Args:
+            directory: Directory to write the images to.
+            sample_every: Accept every Nth image of each name.
+            min_interval: Minimum interval in seconds between images of
+                each name.
+            max_queue: Number of images to be queued for writing.
+        """
+        self.disable()
+
+        self.directory = directory
+        self._sample_every = max(1, int(sample_every))
+        self._min_interval = min_interval
+        self._counts = {}
+        self._next_time = {}
+        self._queue = queue.Queue(maxsize=max_queue)
+
+        self._worker = threading.Thread(
+            target=self._worker_func, args=(self._queue,),
+            name='DebugArtifacts')
+        self._worker.daemon = True
+        self._worker.start()
+        self.enabled = True
+        logger.info('%s: writing debug artifacts to %s' % (self, directory))
+
+    def disable(self):
+        """
+        Stop accepting artifacts, and wait for the queued ones.
+        """
+        self.enabled = False
+        if self._worker is None:
+            return
+
+        self._queue.put(None)
+        self._worker.join()
+        self._worker = None
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.num_written = 0
+        self.num_dropped = 0
+        self._sample_every = 1
+        self._min_interval = 0.0
+        self._counts = {}
+        self._next_time = {}
+        self._seq = 0
+        self._queue = None
+        self._worker = None
+        self._lock = threading.Lock()
+
+
+_debug_artifacts = DebugArtifacts()
+
+
+def get_debug_artifacts():
+    """
+    Returns:
+        The DebugArtifacts of the process.
+    """
+    return _debug_artifacts
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import cv2
+
+# Resolutions of context['engine']['frame'] and ['frame_hd'].
+FRAME_SIZE = (1280, 720)
+FRAME_HD_SIZE = (1920, 1080)
+
+# 720p to 1080p is a 2:3 scale. ROIs are aligned to 3 pixels (in 1080p)
+# and extended by this margin so that upscaling only the ROI gives the
+# same pixels as upscaling the whole frame.
+_HD_ALIGN = 3
+_HD_MARGIN = 3
+
+
+class FrameView(object):
+    """
+    Lazy, memoized view of a frame.
+
+    Derived planes (grayscale, HSV, downscaled copies) are computed on the
+    first access and shared by every scene and matcher for the rest of the
+    frame. Color conversions are per-pixel, so cropping a derived plane
+    gives the same result as converting the cropped BGR image.
+
+    The view also provides the 1080p resolution of the frame. If the
+    source is 720p, hd upscales the whole frame on first access, and
+    crop_hd() upscales only the requested ROI.
+
+    Derived planes are shared; callers must not modify them in place.
+    """
+
+    @property
+    def bgr(self):
+        return self._bgr
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self._bgr, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def hsv(self):
+        if self._hsv is None:
+            self._hsv = cv2.cvtColor(self._bgr, cv2.COLOR_BGR2HSV)
+        return self._hsv
+
+    @property
+    def hd(self):
+        if self._hd is None:
+            self._hd = cv2.resize(self._bgr, FRAME_HD_SIZE)
+        return self._hd
+
+    @property
+    def shape(self):
+        return self._bgr.shape
+
+    def resize(self, size, interpolation=cv2.INTER_NEAREST):
+        """
+        Return the frame scaled to size (width, height).
+        """
+        key = (tuple(size), interpolation)
+        img = self._resized.get(key)
+        if img is None:
+            img = cv2.resize(self._bgr, key[0], interpolation=interpolation)
+            self._resized[key] = img
+        return img
+
+    def crop(self, x, y, w, h, plane='bgr'):
+        """
+        Crop a rectangle from the plane ('bgr', 'gray' or 'hsv').
+        """
+        img = getattr(self, plane)
+        return img[y: y + h, x: x + w]
+
+    def crop_hd(self, x, y, w, h):
+        """
+        Crop a rectangle, given in 1080p coordinates, from the 1080p frame.
+
+        Only the ROI is upscaled unless the whole 1080p frame is already
+        available. The result is identical to cropping from hd.
+        """
+        if self._hd is not None:
+            return self._hd[y: y + h, x: x + w]
+
+        key = (x, y, w, h)
+        img = self._hd_rois.get(key)
+        if img is not None:
+            return img
+
+        hd_w, hd_h = FRAME_HD_SIZE
+        x1 = max(0, (x // _HD_ALIGN) * _HD_ALIGN - _HD_MARGIN)
+        y1 = max(0, (y // _HD_ALIGN) * _HD_ALIGN - _HD_MARGIN)
+        x2 = min(hd_w, -(-(x + w) // _HD_ALIGN) * _HD_ALIGN + _HD_MARGIN)
+        y2 = min(hd_h, -(-(y + h) // _HD_ALIGN) * _HD_ALIGN + _HD_MARGIN)
+
+        img_src = self._bgr[y1 * 2 // 3: y2 * 2 // 3, x1 * 2 // 3: x2 * 2 // 3]
+        img_hd = cv2.resize(img_src, (x2 - x1, y2 - y1))
+
+        img = img_hd[y - y1: y - y1 + h, x - x1: x - x1 + w]
+        self._hd_rois[key] = img
+        return img
+
+    def __init__(self, frame, frame_hd=None):
+        """
+        Constructor
+
+        Args:
+            frame: The frame in 720p.
+            frame_hd: The frame in 1080p, if the source is 1080p.
+        """
+        self._bgr = frame
+        self._hd = frame_hd
+        self._gray = None
+        self._hsv = None
+        self._resized = {}
+        self._hd_rois = {}
+
+
+def get_frame_view(context):
+    """
+    Return the FrameView of the current frame in the context.
+
+    The engine attaches the view in read_next_frame(). A new view is
+    created if the context has none, or if context['engine']['frame']
+    has been replaced since (e.g. scenes run stand-alone).
+    """
+    engine = context['engine']
+    frame = engine.get('frame')
+    view = engine.get('frame_view')
+
+    if frame is None:
+        return None
+
+    if (view is None) or (view.bgr is not frame):
+        view = FrameView(frame, frame_hd=engine.get('frame_hd'))
+        engine['frame_view'] = view
+
+    return view
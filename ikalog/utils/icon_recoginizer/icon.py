@@ -26,6 +26,8 @@ import pickle
 import cv2
 import numpy as np
 
+from ikalog.ml.knn_index import KNNIndex
+from ikalog.ml.model_bundle import load_model_arrays
 
 logger = logging.getLogger()
 
@@ -144,7 +146,7 @@ class IconRecoginizer(object):
     def knn_reset(self):
         self.samples = None  # np.empty((0, 21 * 14))
         self.responses = []
-        self.model = cv2.ml.KNearest_create()
+        self.index = None
         self.trained = False
 
     def predict(self, img):
@@ -152,10 +154,10 @@ class IconRecoginizer(object):
             return None, None
 
         features = np.array(self.extract_features(img), dtype=np.float32)
-        retval, results, neigh_resp, dists = \
-            self.model.findNearest(features.reshape((1, -1)), self._k)
+        results, neigh_resp, dists = \
+            self.index.find_nearest(features.reshape((1, -1)), self._k)
 
-        id = int(results.ravel())
+        id = int(results[0])
         name = self.id2name(id)
         return name, dists[0][0]
 
@@ -180,12 +182,8 @@ class IconRecoginizer(object):
 
     def knn_train(self):
         # 終わったら
-        samples = np.array(self.samples, np.float32)
-        responses = np.array(self.responses, np.float32)
-        responses = responses.reshape((responses.size, 1))
-
-        self.model.train(samples, cv2.ml.ROW_SAMPLE, responses)
-        logger.info('KNN Trained (%d samples)' % len(responses))
+        self.index = KNNIndex(self.samples, self.responses)
+        logger.info('KNN Trained (%d samples)' % len(self.responses))
         self.trained = True
 
     def learn_image_group(self, name=None, dir=None):
@@ -262,9 +260,14 @@ class IconRecoginizer(object):
         f.close()
 
     def load_model_from_file(self, file):
-        f = open(file, 'rb')
-        l = pickle.load(f)
-        f.close()
+        arrays = load_model_arrays(file)
+        if arrays is not None:
+            l = [arrays['samples'], arrays['responses'].tolist(),
+                 arrays['names'].tolist()]
+        else:
+            f = open(file, 'rb')
+            l = pickle.load(f)
+            f.close()
         self.samples = l[0]
         self.responses = l[1]
         self.icon_names = l[2]
@@ -25,6 +25,11 @@ import numpy as np
 
 class Kernel(object):
 
+    # Pixel value from which popcnt() counts a pixel of a 8-bit image
+    # after logical_and()/logical_or() with the (0/255) mask. Kernels
+    # that set this can be stacked by MultiClassIkaMatcher2.
+    popcnt_threshold = None
+
     def __init__(self, w, h):
         """
         Constructor
@@ -19,13 +19,16 @@
 #
 
 import cv2
+import os
 import platform
 import numpy as np
 import traceback
 
 from ikalog.utils.find_image_file import find_image_file
+from ikalog.utils.frame_view import FrameView
 from ikalog.utils.ikautils import IkaUtils
 from ikalog.utils.image_filters.filters import *
+from ikalog.utils.ikamatcher2.stacked import MaskStack, stack_key
 
 default_kernel = None  # Overrided by load_kernel()
 
@@ -43,13 +46,51 @@ class IkaMatcher2(object):
             (img.shape[1] == self._width)
         return cropped
 
+    def _crop_view(self, view, plane):
+        return view.crop(self._left, self._top, self._width, self._height,
+                         plane=plane)
+
     def generate_grayscale_image(self, img_obj):
         if img_obj['gray'] is not None:
             return
 
+        if img_obj['view'] is not None:
+            img_obj['gray'] = self._crop_view(img_obj['view'], 'gray')
+            return
+
         img_obj['gray'] = cv2.cvtColor(img_obj['bgr'], cv2.COLOR_BGR2GRAY)
 
+    def generate_hsv_image(self, img_obj):
+        if (img_obj['hsv'] is not None) or (img_obj['bgr'] is None):
+            return
+
+        if img_obj['view'] is not None:
+            img_obj['hsv'] = self._crop_view(img_obj['view'], 'hsv')
+            return
+
+        img_obj['hsv'] = cv2.cvtColor(img_obj['bgr'], cv2.COLOR_BGR2HSV)
+
+    def _prepare_img_object(self, img_obj, method):
+        if method.want_grayscale_image and (img_obj['gray'] is None):
+            self.generate_grayscale_image(img_obj)
+
+        if method.want_hsv_image and (img_obj['hsv'] is None):
+            self.generate_hsv_image(img_obj)
+
     def get_img_object(self, img):
+        """
+        Build the image object to match with.
+
+        Args:
+            img: A BGR or grayscale image (full frame or already cropped),
+                 or a FrameView of the frame. With a FrameView, grayscale
+                 and HSV planes are cropped from the frame-wide planes
+                 shared by all matchers.
+        """
+        if isinstance(img, FrameView):
+            return {'bgr': self._crop_view(img, 'bgr'), 'gray': None,
+                    'hsv': None, 'bg': None, 'fg': None, 'view': img}
+
         if not self._is_cropped(img):
             img = img[self._top: self._top + self._height,
                       self._left: self._left + self._width]
@@ -61,7 +102,8 @@ class IkaMatcher2(object):
             img_gray = None
             img_bgr = img
 
-        return {'bgr': img_bgr, 'gray': img_gray, 'bg': None, 'fg': None}
+        return {'bgr': img_bgr, 'gray': img_gray, 'hsv': None,
+                'bg': None, 'fg': None, 'view': None}
 
     def match(self, img, debug=None):
         matched, fg_score, bg_score = self.match_score(img, debug)
@@ -89,12 +131,12 @@ class IkaMatcher2(object):
                 bg_matched = True
             else:
                 if img_obj['bg'] is None:
-                    if self._bg_method.want_grayscale_image and (img_obj['gray'] is None):
-                        self.generate_grayscale_image(img_obj)
+                    self._prepare_img_object(img_obj, self._bg_method)
 
                     img_bg = 255 - \
                         self._bg_method(
-                            img_bgr=img_obj['bgr'], img_gray=img_obj['gray'])
+                            img_bgr=img_obj['bgr'], img_gray=img_obj['gray'],
+                            img_hsv=img_obj['hsv'])
                     img_obj['bg'] = self._kernel.encode(img_bg)
                 bg_pixels = self._kernel.logical_and_popcnt(img_obj['bg'])
 
@@ -113,11 +155,11 @@ class IkaMatcher2(object):
                 fg_matched = True
             else:
                 if img_obj['fg'] is None:
-                    if self._fg_method.want_grayscale_image and (img_obj['gray'] is None):
-                        self.generate_grayscale_image(img_obj)
+                    self._prepare_img_object(img_obj, self._fg_method)
 
                     img_fg = self._fg_method(
-                        img_bgr=img_obj['bgr'], img_gray=img_obj['gray'])
+                        img_bgr=img_obj['bgr'], img_gray=img_obj['gray'],
+                        img_hsv=img_obj['hsv'])
                     img_obj['fg'] = self._kernel.encode(img_fg)
                 fg_pixels = self._kernel.logical_or_popcnt(img_obj['fg'])
 
@@ -195,6 +237,7 @@ class MultiClassIkaMatcher2(object):
 
     def __init__(self):
         self._masks = []
+        self._stacks = None
 
     def add_mask(self, mask):
         if len(self._masks) > 0:
@@ -202,17 +245,71 @@ class MultiClassIkaMatcher2(object):
             # ToDo: compatibility check
 
         self._masks.append(mask)
+        self._stacks = None
+
+    def _build_stacks(self):
+        """
+        Group the masks into MaskStacks. Masks that cannot be stacked
+        are kept alone and matched with their own kernel.
+        """
+        groups = {}
+        for index, mask in enumerate(self._masks):
+            key = stack_key(mask) or ('unstacked', index)
+            groups.setdefault(key, []).append(index)
+
+        self._stacks = []
+        for key, indexes in groups.items():
+            stack = None
+            if key[0] != 'unstacked':
+                stack = MaskStack([self._masks[i] for i in indexes])
+            self._stacks.append((indexes, stack))
+
+    def match_scores(self, img, debug=None):
+        """
+        Score the image against all masks.
+
+        Args:
+            img: The image, as IkaMatcher2.match_score() accepts.
+        Returns:
+            A list of (fg_matched, fg_ratio, bg_ratio, mask) in order
+            the masks were added.
+        """
+        if len(self._masks) == 0:
+            return []
+
+        owner = self._masks[0]
+        img_obj = owner.get_img_object(img)
+
+        debug = debug or any(mask._debug for mask in self._masks)
+        if debug:
+            return [
+                mask.match_score_internal(img_obj, debug) + (mask,)
+                for mask in self._masks
+            ]
+
+        if self._stacks is None:
+            self._build_stacks()
+
+        results = [None] * len(self._masks)
+        for indexes, stack in self._stacks:
+            if stack is None:
+                mask = self._masks[indexes[0]]
+                results[indexes[0]] = \
+                    mask.match_score_internal(img_obj) + (mask,)
+                continue
+
+            scores = stack.match_scores(owner, img_obj)
+            for index, score in zip(indexes, scores):
+                results[index] = score + (self._masks[index],)
+
+        return results
 
     def match_best(self, img, debug=None):
         if len(self._masks) == 0:
             return 0.0, None
 
-        img_obj = self._masks[0].get_img_object(img)
-
         results = []
-        for mask in self._masks:
-            fg_matched, fg_ratio, bg_ratio = mask.match_score_internal(
-                img_obj, debug)
+        for fg_matched, fg_ratio, bg_ratio, mask in self.match_scores(img, debug):
             if fg_matched:
                 results.append([fg_ratio, mask])
 
@@ -226,12 +323,8 @@ class MultiClassIkaMatcher2(object):
         if len(self._masks) == 0:
             return 0.0, 0.0, None
 
-        img_obj = self._masks[0].get_img_object(img)
-
         results = []
-        for mask in self._masks:
-            fg_matched, fg_ratio, bg_ratio = mask.match_score_internal(
-                img_obj, debug)
+        for fg_matched, fg_ratio, bg_ratio, mask in self.match_scores(img, debug):
             # print(label, mask._label, bg_ratio, fg_ratio)
             if fg_matched and fg_ratio - bg_ratio > mask._threshold:
                 results.append([bg_ratio, fg_ratio, mask])
@@ -243,10 +336,39 @@ class MultiClassIkaMatcher2(object):
         return best
 
 
-def load_kernel():
+def _find_kernel(name):
+    if name == 'HAL':
+        from lib.ikamatcher2_kernel_hal import HAL
+        return HAL
+
+    if name == 'NEON':
+        from ikalog.utils.ikamatcher2.arm_neon import NEON
+        return NEON
+
+    from ikalog.utils.ikamatcher2 import reference
+    kernel_class = getattr(reference, name, None)
+    if kernel_class is None:
+        raise ValueError('Unknown IkaMatcher2 kernel: %s' % name)
+    return kernel_class
+
+
+def load_kernel(name=None):
+    """
+    Select the kernel for IkaMatcher2 created afterwards.
+
+    Args:
+        name: Name of the kernel (e.g. 'Numpy_1bit'). If None, the
+            IKALOG_IKAMATCHER2_KERNEL environment variable is used, or
+            the best kernel for the platform.
+    """
     global default_kernel
 
-    if platform.machine().startswith('armv7'):
+    name = name or os.environ.get('IKALOG_IKAMATCHER2_KERNEL')
+
+    if name:
+        default_kernel = _find_kernel(name)
+
+    elif platform.machine().startswith('armv7'):
         try:
             from lib.ikamatcher2_kernel_hal import HAL
             default_kernel = HAL
@@ -30,6 +30,9 @@ class Numpy_uint8(Kernel):
     zeros128 = np.zeros(128, dtype=np.uint8)
     _align = 128
 
+    # popcnt() counts the top bin of [0, 256) divided into 3.
+    popcnt_threshold = 171
+
     def encode(self, img):
         """
         Encode the image to internal image format.
@@ -78,10 +81,24 @@ class Numpy_uint8_fast(Numpy_uint8):
         return r
 
 
+# Number of set bits in each 16-bit value.
+_POPCNT16 = np.array(
+    [bin(i).count('1') for i in range(65536)], dtype=np.uint8)
+
+
 class Numpy_1bit(Kernel):
     # 128 bits for SIMD operation
     _align = 16
-    zeros128 = np.zeros(128, dtype=np.uint8)
+
+    # Pixels from this value are encoded as 1, the same pixels that
+    # Numpy_uint8.popcnt() counts.
+    popcnt_threshold = 171
+
+    def __init__(self, w, h):
+        super(Numpy_1bit, self).__init__(w, h)
+        self._packed_len = (w * h + 7) // 8
+        self._padded_len = \
+            (self._packed_len + self._align - 1) // self._align * self._align
 
     def encode(self, img):
         """
@@ -95,20 +112,12 @@ class Numpy_1bit(Kernel):
         assert img.shape[0] == self._h
         assert img.shape[1] == self._w
 
-        img_8b_1d = np.reshape(img, (-1))
-        img_1b_1d = np.packbits(img_8b_1d)
-
-        padding_len = self._align - (len(img_1b_1d) % self._align)
-        if padding_len:
-            img_1b_1d_p = np.append(img_1b_1d, self.zeros128[0: padding_len])
-        else:
-            img_1b_1d_p = img_1b_1d
+        img_1b_1d = np.packbits(np.reshape(img >= self.popcnt_threshold, (-1)))
 
-        assert len(img_1b_1d_p.shape) == 1
-        assert img_1b_1d_p.shape[0] >= (self._h * self._w / 8)
-        assert img_1b_1d_p.shape[0] % self._align == 0
+        # Padding bytes are zero, so they never count in popcnt().
+        img_1b_1d_p = np.zeros(self._padded_len, dtype=np.uint8)
+        img_1b_1d_p[0: self._packed_len] = img_1b_1d
 
-#        print('encode: %s %s' % (img_1b_1d.shape, img_1b_1d_p.shape))
         return img_1b_1d_p
 
     def decode(self, img):
@@ -125,9 +134,6 @@ class Numpy_1bit(Kernel):
 
         return img_8b_2d
 
-#    def convert(self, img):
-#        return np.packbits(img)
-
     def logical_or(self, img):
         r = self._img_mask | img
         return r
@@ -135,3 +141,18 @@ class Numpy_1bit(Kernel):
     def logical_and(self, img):
         r = self._img_mask & img
         return r
+
+    def popcnt(self, img):
+        """
+        Count set bits in the packed image.
+
+        Returns the count in the same type as Numpy_uint8.popcnt()
+        (float32 array of one element), so the ratios computed by
+        IkaMatcher2 are identical among the kernels.
+        """
+        if hasattr(np, 'bitwise_count'):
+            # numpy >= 2.0
+            count = np.bitwise_count(img).sum(dtype=np.int64)
+        else:
+            count = _POPCNT16[img.view(np.uint16)].sum(dtype=np.int64)
+        return np.array([count], dtype=np.float32)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import traceback
+
+import numpy as np
+
+from ikalog.utils.ikautils import IkaUtils
+
+# Number of set bits in each byte value.
+_POPCNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcnt_rows(img_packed):
+    """
+    Count set bits in each row of a packed 2D array.
+    """
+    return _POPCNT8[img_packed].sum(axis=1, dtype=np.int64)
+
+
+def _filter_key(method):
+    params = sorted(
+        (k, repr(v)) for k, v in vars(method).items() if not k.startswith('_'))
+    return (method.__class__, tuple(params))
+
+
+def stack_key(mask):
+    """
+    Return the key to group masks that can be stacked, or None.
+
+    Masks can be stacked if they have the same size, filters and kernel,
+    and the kernel tells its popcnt threshold.
+    """
+    kernel = mask._kernel
+    if getattr(kernel, 'popcnt_threshold', None) is None:
+        return None
+
+    return (
+        mask._width, mask._height, kernel.__class__,
+        _filter_key(mask._fg_method), _filter_key(mask._bg_method),
+    )
+
+
+class MaskStack(object):
+    """
+    Masks of IkaMatcher2 stacked into a packed bit array.
+
+    The filtered image is computed once and scored against all masks by
+    a single AND (background) or OR (foreground) and popcnt over the
+    stack. Ratios and thresholds are compared in float32, the same as
+    the per-mask kernels, so the results are identical to
+    IkaMatcher2.match_score_internal().
+    """
+
+    def _encode(self, img):
+        img_bits = (img >= self._popcnt_threshold).reshape(-1)
+        return np.packbits(img_bits)
+
+    def match_scores(self, owner, img_obj):
+        """
+        Score the image against all masks.
+
+        Args:
+            owner: IkaMatcher2 that created img_obj.
+            img_obj: The image object from owner.get_img_object().
+        Returns:
+            A list of (fg_matched, fg_ratio, bg_ratio) in order of masks.
+        """
+        num_masks = len(self.masks)
+        bg_ratio = np.zeros(num_masks, dtype=np.float32)
+        bg_matched = np.ones(num_masks, dtype=bool)
+
+        if self._bg_enabled.any():
+            try:
+                owner._prepare_img_object(img_obj, self._bg_method)
+                img_bg = 255 - self._bg_method(
+                    img_bgr=img_obj['bgr'], img_gray=img_obj['gray'],
+                    img_hsv=img_obj['hsv'])
+                bg_pixels = popcnt_rows(self._masks_packed & self._encode(img_bg))
+
+                ratio = bg_pixels.astype(np.float32) / self._area
+                bg_ratio = np.where(self._bg_enabled, ratio, bg_ratio)
+                bg_matched = ~self._bg_enabled | (ratio <= self._orig_threshold)
+            except:
+                IkaUtils.dprint('%s: bg_method %s caused a exception.' % (
+                    self, self._bg_method.__class__.__name__))
+                IkaUtils.dprint(traceback.format_exc())
+                bg_ratio[:] = 0.0
+                bg_matched[:] = ~self._bg_enabled
+
+        fg_ratio = np.where(bg_matched, np.float32(1.0), np.float32(0.0))
+        fg_matched = bg_matched.copy()
+
+        if (bg_matched & self._fg_enabled).any():
+            owner._prepare_img_object(img_obj, self._fg_method)
+            img_fg = self._fg_method(
+                img_bgr=img_obj['bgr'], img_gray=img_obj['gray'],
+                img_hsv=img_obj['hsv'])
+            fg_pixels = popcnt_rows(self._masks_packed | self._encode(img_fg))
+
+            ratio = fg_pixels.astype(np.float32) / self._area
+            enabled = bg_matched & self._fg_enabled
+            fg_ratio = np.where(enabled, ratio, fg_ratio)
+            fg_matched = bg_matched & (
+                ~self._fg_enabled | (ratio > self._threshold))
+
+        return list(zip(fg_matched.tolist(), fg_ratio, bg_ratio))
+
+    def __init__(self, masks):
+        """
+        Constructor
+
+        Args:
+            masks: List of IkaMatcher2 with the same stack_key().
+        """
+        mask0 = masks[0]
+        self.masks = masks
+        self._fg_method = mask0._fg_method
+        self._bg_method = mask0._bg_method
+        self._popcnt_threshold = mask0._kernel.popcnt_threshold
+        self._area = mask0._width * mask0._height
+
+        masks_bits = [
+            (m._kernel.decode(m._kernel._img_mask) > 0).reshape(-1)
+            for m in masks
+        ]
+        self._masks_packed = np.packbits(np.array(masks_bits), axis=1)
+
+        self._bg_enabled = np.array(
+            [m._orig_threshold is not None for m in masks])
+        self._orig_threshold = np.array(
+            [m._orig_threshold or 0.0 for m in masks], dtype=np.float32)
+        self._fg_enabled = np.array([m._threshold is not None for m in masks])
+        self._threshold = np.array(
+            [m._threshold or 0.0 for m in masks], dtype=np.float32)
@@ -282,11 +282,10 @@ class IkaUtils(object):
 
     @staticmethod
     def copy_context(context):
-        """Copies context as deep copy without Python objects."""
-        context2 = context.copy()  # shallow copy
-        context2['engine'] = context['engine'].copy()  # shallow copy
-        # Because some Python objects cannot be copied as deepcopy,
-        # these values are replaced with None before deepcopy.
-        context2['engine']['engine'] = None  # IkaEngine
-        context2['engine']['service'] = {}  # functions of IkaEngine
-        return copy.deepcopy(context2)
+        """Copies context without Python objects and frame buffers.
+
+        Images other than frames (e.g. context['game']['image_judge'])
+        are shared with the context, and must not be modified.
+        """
+        from ikalog.utils.context_snapshot import snapshot_context
+        return snapshot_context(context, frames=False, engine=False)
@@ -22,15 +22,17 @@ import cv2
 import numpy as np
 
 from ikalog.utils import IkaUtils
+from ikalog.utils.image_filters.color_lut import get_shared_lut
 
 class ImageFilter(object):
 
     want_grayscale_image = True
+    want_hsv_image = False
     
     # For backward compatibility
     _warned_evaluate_is_deprecated = False
 
-    def evaluate(self, img_bgr=None, img_gray=None):
+    def evaluate(self, img_bgr=None, img_gray=None, img_hsv=None):
         # if not hasattr(self, '_warned_evaluate_is_deprecated'):
 
         if not self._warned_evaluate_is_deprecated:
@@ -38,17 +40,30 @@ class ImageFilter(object):
             IkaUtils.dprint('%s: evaluate() is depricated.' % self)
             self._warned_evaluate_is_deprecated = True
 
-        return self(img_bgr=img_bgr, img_gray=img_gray)
+        return self(img_bgr=img_bgr, img_gray=img_gray, img_hsv=img_hsv)
 
-    def _run_filter(self, img_bgr=None, img_gray=None):
+    def _run_filter(self, img_bgr=None, img_gray=None, img_hsv=None):
         raise Exception('Need to be overrided')
 
-    def __call__(self, img_bgr=None, img_gray=None):
-        return self._run_filter(img_bgr=img_bgr, img_gray=img_gray)
+    def __call__(self, img_bgr=None, img_gray=None, img_hsv=None):
+        return self._run_filter(img_bgr=img_bgr, img_gray=img_gray, img_hsv=img_hsv)
 
 
 class MM_WHITE(ImageFilter):
 
+    # Color images are evaluated in HSV; grayscale is used only if no
+    # color image is available.
+    want_grayscale_image = False
+    want_hsv_image = True
+
+    # If True, the filter is compiled into the shared color LUT when it is
+    # created, and BGR images are evaluated with the LUT instead of
+    # converting them to HSV. The result is the same, but gathers from
+    # the 16MB table miss the cache, and it is slower than the HSV path
+    # on most images. See filter_lut of tools/IkaBench.py.
+    use_color_lut = False
+    _color_lut = None
+
     def _run_filter_gray_image(self, img_gray):
         assert(len(img_gray.shape) == 2)
 
@@ -60,15 +75,7 @@ class MM_WHITE(ImageFilter):
         img_match_v = cv2.inRange(img_gray, vis_min, vis_max)
         return img_match_v
 
-    def _run_filter(self, img_bgr=None, img_gray=None):
-        if (img_bgr is None):
-            return self._run_filter_gray_image(img_gray)
-
-        # カラー画像から白い部分だけ抜き出した白黒画像を作る
-
-        assert(len(img_bgr.shape) == 3)
-        assert(img_bgr.shape[2] == 3)
-
+    def _match_hsv(self, img_hsv):
         sat_min = min(self.sat_range)
         sat_max = max(self.sat_range)
         vis_min = min(self.visibility_range)
@@ -77,28 +84,63 @@ class MM_WHITE(ImageFilter):
         assert(sat_min >= 0 and sat_max <= 256)
         assert(vis_min >= 0 and vis_max <= 256)
 
-        img_hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
-        img_match_s = cv2.inRange(img_hsv[:, :, 1], sat_min, sat_max)
-        img_match_v = cv2.inRange(img_hsv[:, :, 2], vis_min, vis_max)
-        img_match = img_match_s & img_match_v
-        return img_match
+        return cv2.inRange(img_hsv, (0, sat_min, vis_min),
+                           (255, sat_max, vis_max))
+
+    def _match_bgr(self, img_bgr):
+        return self._match_hsv(cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV))
+
+    def _run_filter(self, img_bgr=None, img_gray=None, img_hsv=None):
+        if (img_bgr is None) and (img_hsv is None):
+            return self._run_filter_gray_image(img_gray)
+
+        # カラー画像から白い部分だけ抜き出した白黒画像を作る
+
+        if img_hsv is None:
+            assert(len(img_bgr.shape) == 3)
+            assert(img_bgr.shape[2] == 3)
+
+            if self._color_lut is not None:
+                lut, bit = self._color_lut
+                return lut(img_bgr, bit)
+
+            img_hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
+
+        return self._match_hsv(img_hsv)
+
+    def enable_color_lut(self):
+        """
+        Compile the filter into the shared color LUT, and evaluate BGR
+        images with it. Call this when the filter is created (e.g. in
+        _init_scene), never on the per-frame path.
+
+        Returns:
+            True if enabled. False if the shared LUTs are full.
+        """
+        key = ('MM_WHITE', min(self.sat_range), max(self.sat_range),
+               min(self.visibility_range), max(self.visibility_range))
+        self._color_lut = get_shared_lut(key, self._match_bgr)
+        return self._color_lut is not None
 
     def __init__(self, sat=(0, 32), visibility=(230, 256)):
         self.sat_range = sat  # assume tuple
         self.visibility_range = visibility  # assume tuple
 
+        if self.use_color_lut:
+            self.enable_color_lut()
+
 
 class MM_NOT_WHITE(MM_WHITE):
 
-    def _run_filter(self, img_bgr=None, img_gray=None):
+    def _run_filter(self, img_bgr=None, img_gray=None, img_hsv=None):
         img_result = super(MM_NOT_WHITE, self)._run_filter(
-            img_bgr=img_bgr, img_gray=img_gray)
+            img_bgr=img_bgr, img_gray=img_gray, img_hsv=img_hsv)
         return 255 - img_result
 
 
 class MM_BLACK(ImageFilter):
 
-    def _run_filter(self, img_bgr=None, img_gray=None):
+    def _run_filter(self, img_bgr=None, img_gray=None, img_hsv=None):
         assert((img_bgr is not None) or (img_gray is not None))
 
         if (img_gray is None):
@@ -128,15 +170,20 @@ class MM_NOT_DARK(MM_BLACK):
 
 class MM_NOT_BLACK(MM_BLACK):
 
-    def _run_filter(self, img_bgr=None, img_gray=None):
+    def _run_filter(self, img_bgr=None, img_gray=None, img_hsv=None):
         img_result = super(MM_NOT_BLACK, self)._run_filter(
-            img_bgr=img_bgr, img_gray=img_gray)
+            img_bgr=img_bgr, img_gray=img_gray, img_hsv=img_hsv)
         return 255 - img_result
 
 
 class MM_COLOR_BY_HUE(ImageFilter):
 
     want_grayscale_image = False
+    want_hsv_image = True
+
+    # See MM_WHITE and MM_WHITE.enable_color_lut().
+    use_color_lut = False
+    _color_lut = None
 
     def _hue_range_to_list(self, r):
         # FIXME: 0, 180をまたぐ場合にふたつに分ける
@@ -149,14 +196,7 @@ class MM_COLOR_BY_HUE(ImageFilter):
             max = max - 180
         return [(min, max)]
 
-    def _run_filter(self, img_bgr=None, img_gray=None):
-        assert(img_bgr is not None)
-        assert(len(img_bgr.shape) >= 3)
-        assert(img_bgr.shape[2] == 3)
-        assert(len(self._hue_range_to_list(self.hue_range)) == 1)  # FIXME
-
-        img_hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
-
+    def _match_hsv(self, img_hsv):
         vis_min = min(self.visibility_range)
         vis_max = max(self.visibility_range)
 
@@ -171,22 +211,58 @@ class MM_COLOR_BY_HUE(ImageFilter):
             assert(hue_max <= 255)
 
             #print('vis_min %d vis_max %d hue_min %d hue_max %d' % (vis_min, vis_max, hue_min, hue_max))
-            img_match_h = cv2.inRange(img_hsv[:, :, 0], hue_min, hue_max)
-            img_match_v = cv2.inRange(img_hsv[:, :, 2], vis_min, vis_max)
-            img_match = img_match_h & img_match_v
+            img_match = cv2.inRange(img_hsv, (hue_min, 0, vis_min),
+                                    (hue_max, 255, vis_max))
         return img_match
 
+    def _match_bgr(self, img_bgr):
+        return self._match_hsv(cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV))
+
+    def _run_filter(self, img_bgr=None, img_gray=None, img_hsv=None):
+        assert(len(self._hue_range_to_list(self.hue_range)) == 1)  # FIXME
+
+        if img_hsv is None:
+            assert(img_bgr is not None)
+            assert(len(img_bgr.shape) >= 3)
+            assert(img_bgr.shape[2] == 3)
+
+            if self._color_lut is not None:
+                lut, bit = self._color_lut
+                return lut(img_bgr, bit)
+
+            img_hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
+
+        return self._match_hsv(img_hsv)
+
+    def enable_color_lut(self):
+        """
+        Compile the filter into the shared color LUT, and evaluate BGR
+        images with it. Call this when the filter is created (e.g. in
+        _init_scene), never on the per-frame path.
+
+        Returns:
+            True if enabled. False if the shared LUTs are full.
+        """
+        key = ('MM_COLOR_BY_HUE',
+               tuple(self._hue_range_to_list(self.hue_range)),
+               min(self.visibility_range), max(self.visibility_range))
+        self._color_lut = get_shared_lut(key, self._match_bgr)
+        return self._color_lut is not None
+
     def __init__(self, hue=None, visibility=None):
         self.hue_range = hue  # assume tuple
         self.visibility_range = visibility  # assume tuple
 
+        if self.use_color_lut:
+            self.enable_color_lut()
+
 
 class MM_NOT_COLOR_BY_HUE(MM_COLOR_BY_HUE):
 
     want_grayscale_image = False
 
-    def _run_filter(self, img_bgr=None, img_gray=None):
+    def _run_filter(self, img_bgr=None, img_gray=None, img_hsv=None):
         img_result = super(MM_NOT_COLOR_BY_HUE, self)._run_filter(
-            img_bgr=img_bgr, img_gray=img_gray)
+            img_bgr=img_bgr, img_gray=img_gray, img_hsv=img_hsv)
         return 255 - img_result
 
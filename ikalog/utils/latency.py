@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import bisect
+import threading
+import time
+
+# Upper bounds (in seconds) of the histogram buckets.
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Number of the latest samples the rolling percentiles are computed from.
+DEFAULT_WINDOW = 1024
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+# Metrics and their help texts.
+METRICS = {
+    'ikalog_frame_seconds':
+        'Time to process a frame, from reading it to the last plugin event.',
+    'ikalog_frame_read_seconds':
+        'Time to read the next frame, excluding plugin handlers.',
+    'ikalog_scene_seconds':
+        'Time to match a scene, excluding nested scenes and plugin handlers.',
+    'ikalog_plugin_handler_seconds':
+        'Time of a plugin event handler.',
+    'ikalog_preview_seconds':
+        'Time to draw and show the preview, including plugin handlers.',
+}
+
+
+class LatencyHistogram(object):
+    """
+    Cumulative histogram of latencies, and a window of the latest samples
+    for rolling percentiles.
+    """
+
+    def observe(self, seconds):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+            self._window[self._window_pos] = seconds
+            self._window_pos = (self._window_pos + 1) % len(self._window)
+            self._window_len = min(self._window_len + 1, len(self._window))
+
+    def bucket_counts(self):
+        """
+        Returns:
+            A list of cumulative counts, one for each bucket and +Inf.
+        """
+        with self._lock:
+            counts = list(self._counts)
+
+        r = []
+        total = 0
+        for count in counts:
+            total += count
+            r.append(total)
+        return r
+
+    def percentiles(self, quantiles=DEFAULT_QUANTILES):
+        """
+        Returns:
+            A list of the latencies (nearest-rank) at the quantiles among
+            the latest samples, or None if no samples.
+        """
+        with self._lock:
+            samples = sorted(self._window[:self._window_len])
+
+        if not samples:
+            return None
+        return [samples[min(len(samples) - 1, int(q * len(samples)))]
+                for q in quantiles]
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=DEFAULT_WINDOW):
+        self.buckets = tuple(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._window = [0.0] * window
+        self._window_pos = 0
+        self._window_len = 0
+        self._lock = threading.Lock()
+
+
+class _Span(object):
+    __slots__ = ('start', 'children')
+
+    def __init__(self, start):
+        self.start = start
+        self.children = 0.0
+
+
+class LatencyMetrics(object):
+    """
+    Latency histograms of the engine, labeled by scene, plugin, etc.
+
+    enter() and exit() measure exclusive time: time spent in spans nested
+    on the same thread (e.g. a scene asking another scene to match, or
+    plugin handlers called by a scene) is subtracted from the outer span.
+    """
+
+    def histogram(self, name, labels=()):
+        """
+        Args:
+            name: Name of the metric.
+            labels: A tuple of (label name, value).
+        Returns:
+            The LatencyHistogram of the metric and labels.
+        """
+        key = (name, labels)
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.get(key)
+                if hist is None:
+                    hist = LatencyHistogram(self._buckets, self._window)
+                    self._histograms[key] = hist
+        return hist
+
+    def observe(self, name, seconds, labels=()):
+        self.histogram(name, labels).observe(seconds)
+
+    def _get_stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def enter(self):
+        """
+        Start a span on the current thread.
+        """
+        self._get_stack().append(_Span(time.perf_counter()))
+
+    def exit(self, hist, inclusive=False):
+        """
+        End the span started by the last enter() on the current thread.
+
+        Args:
+            hist: The LatencyHistogram to record to, or None.
+            inclusive: Record the time including the nested spans.
+        Returns:
+            The recorded time of the span in seconds.
+        """
+        stack = self._get_stack()
+        span = stack.pop()
+        duration = time.perf_counter() - span.start
+        if stack:
+            stack[-1].children += duration
+
+        if not inclusive:
+            duration = max(0.0, duration - span.children)
+        if hist is not None:
+            hist.observe(duration)
+        return duration
+
+    def format_prometheus(self, quantiles=DEFAULT_QUANTILES):
+        """
+        Returns:
+            The metrics in Prometheus text exposition format. Each metric
+            is a histogram, and <metric>_rolling is a summary of the
+            latest samples.
+        """
+        with self._lock:
+            items = sorted(self._histograms.items())
+
+        def _labels(labels, extra=()):
+            labels = tuple(labels) + tuple(extra)
+            if not labels:
+                return ''
+            return '{%s}' % ','.join(
+                '%s="%s"' % (k, _escape_label_value(v)) for k, v in labels)
+
+        lines = []
+        for family in ('histogram', 'summary'):
+            last_name = None
+            for (name, labels), hist in items:
+                metric = name if family == 'histogram' else \
+                    '%s_rolling' % name
+                if name != last_name:
+                    help_text = METRICS.get(name, name)
+                    if family == 'summary':
+                        help_text = '%s (latest %d samples)' % (
+                            help_text, self._window)
+                    lines.append('# HELP %s %s' % (metric, help_text))
+                    lines.append('# TYPE %s %s' % (metric, family))
+                    last_name = name
+
+                if family == 'histogram':
+                    counts = hist.bucket_counts()
+                    bounds = ['%g' % b for b in hist.buckets] + ['+Inf']
+                    for le, count in zip(bounds, counts):
+                        lines.append('%s_bucket%s %d' % (
+                            metric, _labels(labels, [('le', le)]), count))
+                    lines.append('%s_sum%s %.9f' % (
+                        metric, _labels(labels), hist.sum))
+                    lines.append('%s_count%s %d' % (
+                        metric, _labels(labels), hist.count))
+                    continue
+
+                values = hist.percentiles(quantiles)
+                if values is None:
+                    continue
+                for q, value in zip(quantiles, values):
+                    lines.append('%s%s %.9f' % (
+                        metric, _labels(labels, [('quantile', '%g' % q)]),
+                        value))
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=DEFAULT_WINDOW):
+        self._buckets = buckets
+        self._window = window
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n') \
+        .replace('"', '\\"')
+
+
+_metrics = LatencyMetrics()
+
+
+def get_latency_metrics():
+    """
+    Returns:
+        The LatencyMetrics of the process.
+    """
+    return _metrics
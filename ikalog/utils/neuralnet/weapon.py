@@ -24,6 +24,7 @@ import cv2
 import numpy as np
 import time
 
+from ikalog.ml.model_bundle import load_model_arrays
 from ikalog.utils import IkaUtils
 from ikalog.utils.neuralnet.functions import relu, forward_mlp
 
@@ -76,6 +77,11 @@ class WeaponClassifier(object):
     def load_model_from_file(self, model_file=None):
         _model_filename = model_file or self.model_filename()
 
+        arrays = load_model_arrays(_model_filename)
+        if arrays is not None:
+            self.import_arrays(arrays)
+            return
+
         f = open(_model_filename, 'rb')
         l = pickle.load(f)
         f.close()
@@ -89,6 +95,35 @@ class WeaponClassifier(object):
         # print(self._weapons_keys)
         # print(self._layers)
 
+    def export_arrays(self):
+        """
+        Returns:
+            A dict of the arrays of the model, for the model bundle.
+        """
+        arrays = {'weapons_keys': self._weapons_keys}
+        for i, layer in enumerate(self._layers):
+            for key, value in layer.items():
+                if key == 'activation':
+                    value = {relu: 'relu'}.get(value, value)
+                if value is not None:
+                    arrays['layers.%d.%s' % (i, key)] = value
+        return arrays
+
+    def import_arrays(self, arrays):
+        self._weapons_keys = arrays['weapons_keys'].tolist()
+
+        self._layers = []
+        while ('layers.%d.weight' % len(self._layers)) in arrays:
+            prefix = 'layers.%d.' % len(self._layers)
+            layer = {}
+            for key, value in arrays.items():
+                if key.startswith(prefix):
+                    layer[key[len(prefix):]] = value
+            if 'activation' in layer:
+                layer['activation'] = \
+                    {'relu': relu}.get(str(layer['activation']))
+            self._layers.append(layer)
+
     def image_to_feature(self, img_weapon):
         img_weapon_hsv = cv2.cvtColor(img_weapon, cv2.COLOR_BGR2HSV)
         img_weapon_hsv_f32 = np.asarray(img_weapon_hsv, dtype=np.float32)
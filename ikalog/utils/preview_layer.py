@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import cv2
+
+
+def _fill_rect(img, pt1, pt2, color):
+    img[pt1[1]: pt2[1], pt1[0]: pt2[0]] = color
+
+
+class PreviewLayer(object):
+    """
+    Overlay of the preview image, stored in context['engine']['preview'].
+
+    Scenes and plugins record draw commands to the layer. The preview
+    image (a copy of the frame with the commands applied) is built only
+    when a consumer calls render(), so nothing is copied nor drawn when
+    no preview plugin is enabled.
+
+    Arguments of the draw commands follow cv2.rectangle() and
+    cv2.putText().
+    """
+
+    def rectangle(self, pt1, pt2, color, thickness=1, lineType=cv2.LINE_8,
+                  shift=0):
+        self._commands.append((cv2.rectangle, (pt1, pt2, color), {
+            'thickness': thickness, 'lineType': lineType, 'shift': shift}))
+
+    def put_text(self, text, org, fontFace, fontScale, color, thickness=1,
+                 lineType=cv2.LINE_8):
+        self._commands.append((cv2.putText, (text, org, fontFace, fontScale, color), {
+            'thickness': thickness, 'lineType': lineType}))
+
+    def fill_rect(self, pt1, pt2, color):
+        self._commands.append((_fill_rect, (pt1, pt2, color), {}))
+
+    def render(self):
+        """
+        Return the preview image.
+
+        The image is built on the first call. Commands recorded after
+        that are applied on the next call.
+        """
+        if self._img is None:
+            self._img = self._frame.copy()
+
+        for func, args, kwargs in self._commands[self._num_rendered:]:
+            func(self._img, *args, **kwargs)
+        self._num_rendered = len(self._commands)
+
+        return self._img
+
+    def __init__(self, frame):
+        self._frame = frame
+        self._commands = []
+        self._num_rendered = 0
+        self._img = None
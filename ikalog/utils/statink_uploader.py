@@ -21,19 +21,49 @@
 import json
 import os
 import sys
+import threading
 import time
+import traceback
+import uuid
+
 import umsgpack
 import urllib3
 
 from ikalog.utils import *
 
+DEFAULT_URL = 'https://stat.ink/api/v1/battle'
 
-def UploadToStatInk(payload, api_key, url=None, video_id=None,
-                    show_response=False, dry_run=False):
-    name = 'UploadToStatInk'
-    if not url:
-        url = 'https://stat.ink/api/v1/battle'
+_HTTP_HEADERS = {
+    'Content-Type': 'application/x-msgpack',
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _create_pool(timeout=120.0):
+    # A single connection is kept alive to reuse the TLS session.
+    return urllib3.PoolManager(
+        num_pools=1,
+        maxsize=1,
+        cert_reqs='CERT_REQUIRED',  # Force certificate check
+        ca_certs=Certifi.where(),   # Path to the Certifi bundle.
+        timeout=timeout,            # Timeout (in sec)
+    )
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _create_pool()
+    return _pool
 
+
+def prepare_payload(payload, api_key, video_id=None, dry_run=False):
+    """
+    Return the msgpack bytes to be posted.
+    """
     # Payload data will be modified, so we copy it.
     # It is not deep copy, so only dict object is duplicated.
     payload = payload.copy()
@@ -44,60 +74,73 @@ def UploadToStatInk(payload, api_key, url=None, video_id=None,
     if isinstance(video_id, str) and (video_id != ''):
         payload['link_url'] = 'https://www.youtube.com/watch?v=%s' % video_id
 
-    mp_payload_bytes = umsgpack.packb(payload)
-    mp_payload = ''.join(map(chr, mp_payload_bytes))
-
-    http_headers = {
-        'Content-Type': 'application/x-msgpack',
-    }
-
-    IkaUtils.dprint('%s: POST %s' % (name, url))
-    time_post_start = time.time()
-
-    pool = urllib3.PoolManager(
-        cert_reqs='CERT_REQUIRED',  # Force certificate check
-        ca_certs=Certifi.where(),   # Path to the Certifi bundle.
-        timeout=120.0,              # Timeout (in sec)
-    )
+    return umsgpack.packb(payload)
 
-    # Post the payload
 
-    try:
-        req = pool.urlopen('POST', url,
-                           headers=http_headers,
-                           body=mp_payload,
-                           )
-    except urllib3.exceptions.SSLError as e:
-        # Handle incorrect certificate error.
-        IkaUtils.dprint('%s: SSLError, value: %s' % (name, e.value))
+def _is_retryable(req):
+    # Server errors and rate limits are retried. Other errors are final.
+    return (req.status >= 500) or (req.status == 429)
 
-    # Error detection
 
+def _parse_response(name, req, show_response=False):
     error = False
-    if req.status == 200: # assume stat.ink v1 API (or error)
+    if req.status == 200:  # assume stat.ink v1 API (or error)
         try:
             status = json.loads(req.data.decode('utf-8'))
-            error = 'error' in statink_response
+            error = 'error' in status
             if error:
-                IkaUtils.dprint('%s: API Error occured')
+                IkaUtils.dprint('%s: API Error occured' % name)
         except:
             error = True
-            IkaUtils.dprint('%s: Stat.ink returned non-JSON response')
+            IkaUtils.dprint('%s: Stat.ink returned non-JSON response' % name)
             status = {
                 'error': 'Not a JSON response',
             }
-    elif req.status == 201: # assume stat.ink v2 API
-        status = { 'battle_url': req.headers.get('Location') }
+    elif req.status == 201:  # assume stat.ink v2 API
+        status = {'battle_url': req.headers.get('Location')}
         if status['battle_url'] is None:
             del status['battle_url']
+    else:
+        error = True
+        status = {
+            'error': 'HTTP status %d' % req.status,
+        }
 
     # Debug messages
 
     if show_response or error:
         IkaUtils.dprint('%s: == Response begin ==' % name)
-        print(req.data.decode('utf-8'))
+        print(req.data.decode('utf-8', errors='replace'))
         IkaUtils.dprint('%s: == Response end ===' % name)
 
+    return error, status
+
+
+def UploadToStatInk(payload, api_key, url=None, video_id=None,
+                    show_response=False, dry_run=False):
+    name = 'UploadToStatInk'
+    if not url:
+        url = DEFAULT_URL
+
+    mp_payload = prepare_payload(payload, api_key, video_id, dry_run)
+
+    IkaUtils.dprint('%s: POST %s' % (name, url))
+    time_post_start = time.time()
+
+    # Post the payload
+
+    try:
+        req = _get_pool().urlopen('POST', url,
+                                  headers=_HTTP_HEADERS,
+                                  body=mp_payload,
+                                  )
+    except urllib3.exceptions.HTTPError as e:
+        # Includes incorrect certificate error.
+        IkaUtils.dprint('%s: %s' % (name, e))
+        return [True, {'error': str(e)}]
+
+    error, status = _parse_response(name, req, show_response)
+
     IkaUtils.dprint(
         '%s: POST Done. %d bytes in %f second(s).' % (
             name,
@@ -107,3 +150,207 @@ def UploadToStatInk(payload, api_key, url=None, video_id=None,
     )
 
     return [error, status]
+
+
+class StatInkUploader(object):
+    """
+    Upload payloads to stat.ink on a background thread.
+
+    Payloads are written to the spool directory first, and removed when
+    stat.ink accepts (or rejects) them, so they survive network outages
+    and restarts. Network and server errors are retried with exponential
+    backoff. Payloads left in the spool are uploaded on start.
+    """
+
+    def _spool_path(self, filename):
+        return os.path.join(self._spool_dir, filename)
+
+    def pending(self):
+        """
+        Return the filenames of the payloads in the spool, oldest first.
+        """
+        try:
+            filenames = os.listdir(self._spool_dir)
+        except FileNotFoundError:
+            return []
+        return sorted([f for f in filenames if f.endswith('.msgpack')])
+
+    def submit(self, payload, api_key, url=None, video_id=None,
+               dry_run=False, callback=None):
+        """
+        Spool a payload to be uploaded.
+
+        Args:
+            payload: The stat.ink payload.
+            api_key: The API key.
+            url: URL of the API endpoint.
+            video_id: YouTube video ID to link with the battle.
+            dry_run: If True, stat.ink validates the payload but doesn't
+                save it.
+            callback: Function called with (error, status) on the
+                uploader thread when the upload has finished.
+        Returns:
+            The filename in the spool.
+        """
+        body = prepare_payload(payload, api_key, video_id, dry_run)
+        entry = umsgpack.packb({'url': url or DEFAULT_URL, 'body': body})
+
+        # Filenames are sorted in order of submission.
+        with self._cond:
+            self._seq += 1
+            filename = '%s_%06d_%s.msgpack' % (
+                time.strftime('%Y%m%d_%H%M%S'), self._seq, uuid.uuid4().hex[:8])
+            # The uploader thread may finish the file as soon as it is in
+            # the spool, so the callback is registered beforehand.
+            if callback:
+                self._callbacks[filename] = callback
+
+        try:
+            # Spool files have the API key in plaintext.
+            os.makedirs(self._spool_dir, mode=0o700, exist_ok=True)
+            path = self._spool_path(filename)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(entry)
+            os.replace(path + '.tmp', path)
+        except:
+            with self._cond:
+                self._callbacks.pop(filename, None)
+            raise
+
+        with self._cond:
+            self._cond.notify_all()
+
+        IkaUtils.dprint('%s: spooled %s (%d bytes)' %
+                        (self, filename, len(body)))
+        return filename
+
+    def _retry_later(self, filename, reason):
+        self._num_failures += 1
+        delay = min(self._backoff_max,
+                    self._backoff_initial * (2 ** (self._num_failures - 1)))
+        self._next_attempt_time = time.time() + delay
+
+        IkaUtils.dprint('%s: failed to upload %s (%s). Retrying in %d seconds' %
+                        (self, filename, reason, delay))
+
+    def _finish(self, filename, error, status):
+        try:
+            os.remove(self._spool_path(filename))
+        except FileNotFoundError:
+            pass
+
+        with self._cond:
+            callback = self._callbacks.pop(filename, None)
+            self._cond.notify_all()
+
+        if callback is not None:
+            try:
+                callback(error, status)
+            except:
+                IkaUtils.dprint(traceback.format_exc())
+
+    def _upload(self, filename):
+        try:
+            with open(self._spool_path(filename), 'rb') as f:
+                entry = umsgpack.unpackb(f.read())
+            url, body = entry['url'], entry['body']
+        except:
+            IkaUtils.dprint('%s: broken spool file %s' % (self, filename))
+            IkaUtils.dprint(traceback.format_exc())
+            self._finish(filename, True, {'error': 'Broken spool file'})
+            return
+
+        IkaUtils.dprint('%s: POST %s' % (self, url))
+        time_post_start = time.time()
+
+        try:
+            req = self._pool.urlopen('POST', url,
+                                     headers=_HTTP_HEADERS, body=body,
+                                     retries=False)
+        except urllib3.exceptions.HTTPError as e:
+            self._retry_later(filename, e)
+            return
+
+        if _is_retryable(req):
+            self._retry_later(filename, 'HTTP status %d' % req.status)
+            return
+
+        self._num_failures = 0
+        error, status = _parse_response(str(self), req, self._show_response)
+
+        IkaUtils.dprint(
+            '%s: POST Done. %d bytes in %f second(s).' % (
+                self, len(body), int((time.time() - time_post_start) * 10) / 10))
+
+        self._finish(filename, error, status)
+
+    def _worker(self):
+        # Payloads in the spool are uploaded back to back, only waiting
+        # after failures.
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    wait_sec = self._next_attempt_time - time.time()
+                    if wait_sec <= 0 and self.pending():
+                        break
+                    self._cond.wait(timeout=wait_sec if wait_sec > 0 else None)
+
+            self._upload(self.pending()[0])
+
+    def flush(self, timeout=None):
+        """
+        Wait until the spool becomes empty, or an upload fails.
+
+        Returns:
+            True if all the payloads have been uploaded.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self.pending() and (self._num_failures == 0):
+                if (deadline is not None) and (time.time() >= deadline):
+                    break
+                self._cond.wait(timeout=0.5)
+        return not self.pending()
+
+    def stop(self, timeout=5.0):
+        """
+        Stop the uploader thread. Pending payloads stay in the spool.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+
+    def __init__(self, spool_dir, show_response=False, timeout=120.0,
+                 backoff_initial=10.0, backoff_max=3600.0):
+        """
+        Constructor
+
+        Args:
+            spool_dir: Directory to keep the payloads to be uploaded.
+            show_response: If True, prints responses from stat.ink.
+            timeout: Timeout of a request in seconds.
+            backoff_initial: Seconds to wait after the first failure. It
+                doubles on each consecutive failure.
+            backoff_max: Maximum seconds to wait.
+        """
+        self._spool_dir = spool_dir
+        self._show_response = show_response
+        self._backoff_initial = backoff_initial
+        self._backoff_max = backoff_max
+        self._pool = _create_pool(timeout)
+
+        self._cond = threading.Condition()
+        self._callbacks = {}
+        self._seq = 0
+        self._stopped = False
+        self._num_failures = 0
+        self._next_attempt_time = 0
+
+        self._thread = threading.Thread(
+            target=self._worker, daemon=True, name='StatInkUploader')
+        self._thread.start()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger()
+
+
+class TraceRecorder(object):
+    """
+    Record spans in the Chrome trace-event format.
+
+    The latest max_events spans are kept in memory, and written to the
+    file every flush_interval seconds (on a background thread) and on
+    close(). The file is replaced at once, so it always has the latest
+    spans. Open it with chrome://tracing or https://ui.perfetto.dev .
+
+    Usage:
+        start = tracer.now()
+        ...
+        tracer.add_span('name', 'category', start, {'frame': 1})
+    """
+
+    def now(self):
+        return time.perf_counter()
+
+    def add_span(self, name, cat, start, args=None):
+        """
+        Record a span from start (a value of now()) to now.
+        """
+        end = time.perf_counter()
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        # deque.append() is thread-safe.
+        self._events.append((name, cat, start, end, tid, args))
+
+    def _format_events(self, events, thread_names):
+        pid = os.getpid()
+        trace_events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+             'args': {'name': thread_name}}
+            for tid, thread_name in thread_names.items()
+        ]
+
+        for name, cat, start, end, tid, args in events:
+            event = {
+                'name': name,
+                'cat': cat,
+                'ph': 'X',
+                'ts': round((start - self._epoch) * 1e6, 3),
+                'dur': round((end - start) * 1e6, 3),
+                'pid': pid,
+                'tid': tid,
+            }
+            if args:
+                event['args'] = args
+            trace_events.append(event)
+
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def _write(self, events, thread_names):
+        with self._write_lock:
+            trace = self._format_events(events, thread_names)
+            tmp_filename = '%s.tmp' % self.filename
+            try:
+                with open(tmp_filename, 'w') as f:
+                    json.dump(trace, f, default=str)
+                os.replace(tmp_filename, self.filename)
+            except OSError as e:
+                logger.warning('%s: failed to write %s: %s' %
+                               (self, self.filename, e))
+
+    def flush(self, wait=False):
+        """
+        Write the spans to the file.
+
+        Args:
+            wait: Wait for the file to be written. Otherwise the file is
+                written on a background thread, and the flush is skipped
+                if the previous one is in progress.
+        """
+        self._last_flush = time.time()
+
+        if (self._writer is not None) and self._writer.is_alive():
+            if not wait:
+                return
+            self._writer.join()
+
+        events = list(self._events)
+        thread_names = dict(self._thread_names)
+        if wait:
+            self._write(events, thread_names)
+            return
+
+        self._writer = threading.Thread(
+            target=self._write, args=(events, thread_names),
+            name='TraceRecorder')
+        self._writer.daemon = True
+        self._writer.start()
+
+    def maybe_flush(self):
+        """
+        Flush if flush_interval seconds have passed since the last flush.
+        """
+        if (time.time() - self._last_flush) >= self._flush_interval:
+            self.flush()
+
+    def close(self):
+        self.flush(wait=True)
+
+    def __init__(self, filename, max_events=100000, flush_interval=10.0):
+        """
+        Constructor
+
+        Args:
+            filename: The trace-event JSON file to write.
+            max_events: Number of the latest spans to keep.
+            flush_interval: Interval in seconds to write the file.
+        """
+        self.filename = filename
+        self._events = collections.deque(maxlen=max_events)
+        self._thread_names = {}
+        self._epoch = time.perf_counter()
+        self._flush_interval = flush_interval
+        self._last_flush = time.time()
+        self._writer = None
+        self._write_lock = threading.Lock()
@@ -1,15 +1,27 @@
 import sys
 sys.path.append('lib')
 
-from ikalog.utils.ikamatcher2.reference import Numpy_uint8, Numpy_uint8_fast
-from ikalog.utils.ikamatcher2.arm_neon import NEON
-from lib.ikamatcher2_kernel_hal import HAL
+from ikalog.utils.ikamatcher2.reference import Numpy_uint8, Numpy_uint8_fast, Numpy_1bit
 import numpy as np
 import time
 
+kernels = [Numpy_uint8, Numpy_uint8_fast, Numpy_1bit]
+
+try:
+    from ikalog.utils.ikamatcher2.arm_neon import NEON
+    kernels.append(NEON)
+except ImportError:
+    pass
+
+try:
+    from lib.ikamatcher2_kernel_hal import HAL
+    kernels.append(HAL)
+except ImportError:
+    pass
+
 def generate_img():
     img1 = np.random.randint(2, size=(1024, 1024))
-    img2 = np.array(img1, dtype=np.uint8)
+    img2 = np.array(img1 * 255, dtype=np.uint8)
     return img2
 
 def test(kernel):
@@ -30,7 +42,5 @@ def test(kernel):
 
     print('encode %0.9fs logical_and_popcnt %0.9fs total %0.9fs %s' % (t2 - t1, t3 - t2, t3 - t1, kernel))
 
-test(Numpy_uint8)
-test(Numpy_uint8_fast)
-test(NEON)
-test(HAL)
+for kernel in kernels:
+    test(kernel)
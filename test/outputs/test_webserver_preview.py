@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for PreviewBroadcaster.
+#  Usage:
+#    python ./test_webserver_preview.py
+#  or
+#    py.test ./test_webserver_preview.py
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.outputs.webserver.preview import PreviewBroadcaster
+
+
+def _frame(value):
+    return np.full((72, 128, 3), value, dtype=np.uint8)
+
+
+class TestPreviewBroadcaster(unittest.TestCase):
+
+    def test_no_listeners(self):
+        broadcaster = PreviewBroadcaster()
+        for i in range(10):
+            broadcaster.put_frame(_frame(i))
+        self.assertEqual(broadcaster.num_encoded_frames, 0)
+        broadcaster.stop()
+
+    def test_shared_encode(self):
+        broadcaster = PreviewBroadcaster(max_fps=1000)
+        broadcaster.add_listener()
+        broadcaster.add_listener()
+        broadcaster.put_frame(_frame(0))
+
+        r1 = broadcaster.wait_jpeg(0, timeout=5)
+        r2 = broadcaster.wait_jpeg(0, timeout=5)
+        self.assertIsNotNone(r1)
+        self.assertIs(r1[1], r2[1])
+        self.assertTrue(r1[1].startswith(b'\xff\xd8'))
+        self.assertEqual(broadcaster.num_encoded_frames, 1)
+
+        # No new image without a new frame.
+        self.assertIsNone(broadcaster.wait_jpeg(r1[0], timeout=0.1))
+        broadcaster.stop()
+
+    def test_max_fps(self):
+        broadcaster = PreviewBroadcaster(max_fps=5)
+        broadcaster.add_listener()
+        start = time.time()
+        while time.time() - start < 0.5:
+            broadcaster.put_frame(_frame(0))
+            time.sleep(0.005)
+        broadcaster.stop()
+
+        self.assertTrue(1 <= broadcaster.num_encoded_frames <= 4)
+
+    def test_stop(self):
+        broadcaster = PreviewBroadcaster()
+        broadcaster.add_listener()
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(broadcaster.wait_jpeg(0)))
+        thread.start()
+
+        broadcaster.stop()
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(results, [None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for WebSocketServer.
+#  Usage:
+#    python ./test_websocket_server.py
+#  or
+#    py.test ./test_websocket_server.py
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+import unittest
+
+import tornado.websocket
+import umsgpack
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.outputs import websocket_server
+from ikalog.outputs.websocket_server import *
+
+
+def _free_port():
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def _wait(cond, timeout=5):
+    start = time.time()
+    while not cond():
+        if time.time() - start > timeout:
+            raise AssertionError('timed out')
+        time.sleep(0.01)
+
+
+class TestMessage(unittest.TestCase):
+
+    def test_encode(self):
+        message = Message({'event': 'on_game_start', 'stage': 'ama'})
+        self.assertEqual(json.loads(message.encode()),
+                         {'event': 'on_game_start', 'stage': 'ama'})
+        self.assertIs(message.encode(), message.encode())
+        self.assertEqual(umsgpack.unpackb(message.encode(binary=True)),
+                         {'event': 'on_game_start', 'stage': 'ama'})
+        self.assertFalse(message.coalesce)
+        self.assertTrue(
+            Message({'event': 'on_game_paint_score_update'}).coalesce)
+
+
+class TestWebSocketServer(unittest.TestCase):
+
+    def setUp(self):
+        self._port = _free_port()
+        self._server = WebSocketServer(enabled=True, port=self._port,
+                                       max_buffer=4)
+        _wait(lambda: self._server._ioloop is not None)
+        self._loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self._server.shutdown_server()
+        self._server.worker_thread.join(timeout=5)
+        self._loop.close()
+        del websocket_server.websockets[:]
+
+    def _connect(self, query=''):
+        url = 'ws://127.0.0.1:%d/ws%s' % (self._port, query)
+        n = len(websocket_server.websockets)
+
+        async def connect():
+            return await tornado.websocket.websocket_connect(url)
+
+        conn = self._loop.run_until_complete(connect())
+        _wait(lambda: len(websocket_server.websockets) > n)
+        return conn
+
+    def _read(self, conn):
+        async def read():
+            return await asyncio.wait_for(conn.read_message(), 5)
+
+        return self._loop.run_until_complete(read())
+
+    def test_send(self):
+        conn1 = self._connect()
+        conn2 = self._connect('?format=msgpack')
+
+        self._server.on_game_killed({}, {})
+        self._server.on_game_dead({}, {})
+
+        self.assertEqual(json.loads(self._read(conn1)),
+                         {'event': 'on_game_killed'})
+        self.assertEqual(json.loads(self._read(conn1)),
+                         {'event': 'on_game_dead'})
+        self.assertEqual(umsgpack.unpackb(self._read(conn2)),
+                         {'event': 'on_game_killed'})
+        self.assertEqual(umsgpack.unpackb(self._read(conn2)),
+                         {'event': 'on_game_dead'})
+
+    def test_coalesce(self):
+        conn = self._connect()
+
+        for score in range(100):
+            self._server.on_game_paint_score_update(
+                {'game': {'paint_score': score}}, {})
+        self._server.on_game_finish({}, {})
+
+        scores = []
+        while True:
+            d = json.loads(self._read(conn))
+            if d['event'] == 'on_game_finish':
+                break
+            scores.append(d['paint_score'])
+
+        self.assertEqual(scores[-1], 99)
+        self.assertTrue(len(scores) < 100)
+
+    def test_slow_client(self):
+        conn = self._connect()
+        handler = websocket_server.websockets[0]
+
+        def fill():
+            # Messages are written after this callback returns.
+            for i in range(10):
+                handler.send(Message({'event': 'on_game_killed'}))
+
+        self._server._ioloop.add_callback(fill)
+        _wait(lambda: len(websocket_server.websockets) == 0)
+
+        messages = []
+        while True:
+            message = self._read(conn)
+            if message is None:
+                break
+            messages.append(message)
+        self.assertTrue(len(messages) <= 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
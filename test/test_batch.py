@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for ikalog.batch.
+#  Usage:
+#    python ./test_batch.py
+#  or
+#    py.test ./test_batch.py
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ikalog.batch import *
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _write_video(self, blank_seconds, seconds=10, fps=10):
+        filename = os.path.join(self._tmpdir, 'video.avi')
+        writer = cv2.VideoWriter(
+            filename, cv2.VideoWriter_fourcc(*'MJPG'), fps, (1280, 720))
+        if not writer.isOpened():
+            self.skipTest('VideoWriter is not available')
+
+        img_game = np.full((720, 1280, 3), 128, dtype=np.uint8)
+        img_blank = np.zeros((720, 1280, 3), dtype=np.uint8)
+        for i in range(seconds * fps):
+            blank = (i // fps) in blank_seconds
+            writer.write(img_blank if blank else img_game)
+        writer.release()
+        return filename
+
+    def test_find_split_points(self):
+        filename = self._write_video(blank_seconds=(4, 8))
+
+        split_points = find_split_points(filename, 3000)
+        self.assertEqual(split_points, [4000, 8000])
+
+        # No blank frame is found within the search window.
+        self.assertEqual(find_split_points(filename, 20000), [])
+
+    def test_plan_tasks(self):
+        filename = self._write_video(blank_seconds=(4,))
+
+        tasks = plan_tasks([filename, filename], segment_msec=3000)
+        self.assertEqual(
+            [(t.index, t.start_msec, t.end_msec) for t in tasks],
+            [(0, 0, 4000), (1, 4000, None), (2, 0, 4000), (3, 4000, None)])
+
+        tasks = plan_tasks([filename])
+        self.assertEqual(len(tasks), 1)
+        self.assertEqual(tasks[0].end_msec, None)
+
+    def test_merge_results(self):
+        def event(name, game_index):
+            return {'event': name, 'msec': 0, 'game_index': game_index}
+
+        results = [
+            BatchResult(
+                task=BatchTask(index=1, source_file='a', start_msec=1000),
+                events=[event('on_game_start', 0)],
+                payloads=['a1'],
+                num_sessions=1),
+            BatchResult(
+                task=BatchTask(index=0, source_file='a', end_msec=1000),
+                events=[event('on_game_start', 0), event('on_game_start', 1)],
+                payloads=['a0'],
+                num_sessions=2),
+            BatchResult(
+                task=BatchTask(index=2, source_file='b'),
+                events=[event('on_game_start', 0)],
+                payloads=['b0'],
+                num_sessions=1),
+        ]
+
+        merged = merge_results(results)
+        self.assertEqual([m['source_file'] for m in merged], ['a', 'b'])
+        self.assertEqual(
+            [e['game_index'] for e in merged[0]['events']], [0, 1, 2])
+        self.assertEqual(merged[0]['payloads'], ['a0', 'a1'])
+        self.assertEqual(
+            [e['game_index'] for e in merged[1]['events']], [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for SceneCircuitBreaker.
+#  Usage:
+#    python ./test_circuit_breaker.py
+#  or
+#    py.test ./test_circuit_breaker.py
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import ikalog.engine
+from ikalog.scenes.scene import Scene
+from ikalog.scenes.circuit_breaker import *
+
+
+class BrokenScene(Scene):
+
+    def match_no_cache(self, context):
+        self.num_runs += 1
+        if self.broken:
+            raise ValueError('broken %d' % self.num_runs)
+        return False
+
+    def __init__(self, engine):
+        self.num_runs = 0
+        self.broken = True
+        super(BrokenScene, self).__init__(engine)
+
+
+class Clock(object):
+
+    def __call__(self):
+        return self.now
+
+    def __init__(self):
+        self.now = 1000.0
+
+
+def _fail(breaker, scene):
+    try:
+        scene.new_frame({})
+        scene.match({})
+    except ValueError:
+        return breaker.record_failure(scene, sys.exc_info())
+
+
+class TestSceneCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = SceneCircuitBreaker(
+            max_failures=3, window=10, backoff=30, max_backoff=100,
+            clock=self.clock)
+        self.scene = BrokenScene(None)
+
+    def test_dedupe(self):
+        text, is_new = _fail(self.breaker, self.scene)
+        self.assertTrue(is_new)
+        self.assertIn('ValueError: broken 1', text)
+
+        # Same signature with a different message.
+        text2, is_new = _fail(self.breaker, self.scene)
+        self.assertFalse(is_new)
+        self.assertEqual(text2, text)
+
+        exceptions = self.breaker.status()['BrokenScene']['exceptions']
+        self.assertEqual(len(exceptions), 1)
+        self.assertEqual(exceptions[0]['exception'], 'ValueError')
+        self.assertEqual(exceptions[0]['count'], 2)
+
+    def test_window(self):
+        for i in range(5):
+            _fail(self.breaker, self.scene)
+            self.clock.now += 6
+        # Failures are not frequent enough.
+        self.assertTrue(self.breaker.allow(self.scene))
+        self.assertEqual(self.breaker.status()['BrokenScene']['state'],
+                         STATE_ENABLED)
+
+    def test_backoff(self):
+        for i in range(3):
+            self.assertTrue(self.breaker.allow(self.scene))
+            _fail(self.breaker, self.scene)
+        self.assertFalse(self.breaker.allow(self.scene))
+
+        status = self.breaker.status()['BrokenScene']
+        self.assertEqual(status['state'], STATE_DISABLED)
+        self.assertEqual(status['disabled_remaining_sec'], 30)
+
+        # Still failing after the backoff; disabled for twice as long.
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow(self.scene))
+        _fail(self.breaker, self.scene)
+        self.assertEqual(self.breaker.status()['BrokenScene']['backoff_sec'],
+                         60)
+        self.clock.now += 59
+        self.assertFalse(self.breaker.allow(self.scene))
+
+        self.clock.now += 1
+        self.assertTrue(self.breaker.allow(self.scene))
+        _fail(self.breaker, self.scene)
+        self.assertEqual(self.breaker.status()['BrokenScene']['backoff_sec'],
+                         100)
+
+        # Recovered.
+        self.clock.now += 100
+        self.assertTrue(self.breaker.allow(self.scene))
+        self.breaker.record_success(self.scene)
+        status = self.breaker.status()['BrokenScene']
+        self.assertEqual(status['state'], STATE_ENABLED)
+        self.assertEqual(status['backoff_sec'], 0)
+        self.assertEqual(status['num_disabled'], 3)
+
+    def test_rate_limited_log(self):
+        breaker = SceneCircuitBreaker(max_failures=1000, log_interval=60,
+                                      clock=self.clock)
+        with self.assertLogs(level='INFO') as logs:
+            for i in range(100):
+                _fail(breaker, self.scene)
+            self.clock.now += 60
+            _fail(breaker, self.scene)
+
+        summaries = [l for l in logs.output if 'again' in l]
+        self.assertEqual(len(summaries), 1)
+        self.assertIn('100 times', summaries[0])
+        self.assertEqual(
+            len([l for l in logs.output if 'raised an exception' in l]), 1)
+
+
+class TestEngineCircuitBreaker(unittest.TestCase):
+
+    def test_process_scene(self):
+        with mock.patch.object(ikalog.engine, 'initialize_scenes',
+                               return_value=[]):
+            engine = ikalog.engine.IkaEngine()
+        scene = BrokenScene(engine)
+        engine.scenes = [scene]
+        engine.context['engine']['frame'] = object()
+
+        for i in range(10):
+            engine.process_scene(scene)
+        log = engine.context['engine']['exceptions_log']['BrokenScene']
+        self.assertEqual(log['count'], 10)
+        self.assertIn('ValueError', log['text'])
+
+        self.assertFalse(engine.scene_circuit_breaker.allow(scene))
+        self.assertEqual(
+            engine.scene_circuit_breaker.status()['BrokenScene']['state'],
+            STATE_DISABLED)
+
+
+if __name__ == '__main__':
+    unittest.main()
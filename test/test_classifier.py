@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for ImageClassifier.
+#  Usage:
+#    python ./test_classifier.py
+#  or
+#    py.test ./test_classifier.py
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ikalog.ml.classifier import ImageClassifier
+
+
+def _dataset(n=60, dim=32):
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 255, (3, dim))
+    x = []
+    y = []
+    for label in range(3):
+        x.extend(centers[label] + rng.normal(0, 30, (n, dim)))
+        y.extend([label] * n)
+    return np.array(x, dtype=np.float32), np.array(y, dtype=np.int32)
+
+
+class TestImageClassifier(unittest.TestCase):
+
+    def _classifier(self):
+        x, y = _dataset()
+        c = ImageClassifier(num_classes=3)
+        c.train(x, y)
+        return c, x, y
+
+    def test_compiled_model(self):
+        c, x, y = self._classifier()
+        self.assertEqual(c._weights.shape, (3, x.shape[1]))
+
+        compiled = c.predict_vector(x)
+        weights = c._weights
+        c._weights = None
+        svm = c.predict_vector(x)
+        c._weights = weights
+
+        self.assertTrue(np.array_equal(compiled, svm))
+
+    def test_predict_batch(self):
+        c, x, y = self._classifier()
+        y_batch, margins = c.predict_batch(x)
+
+        self.assertTrue(np.array_equal(y_batch, c.predict_index(x)))
+        self.assertTrue(np.all(margins[y_batch >= 0] >= 0))
+        self.assertTrue(np.mean(y_batch == y) > 0.9)
+
+        # A list of images works too.
+        images = [f.reshape(4, 8) for f in x[:5]]
+        self.assertTrue(np.array_equal(c.predict_batch(images)[0],
+                                       y_batch[:5]))
+
+        y_empty, margins_empty = c.predict_batch(np.zeros((0, x.shape[1])))
+        self.assertEqual(len(y_empty), 0)
+
+    def test_save_and_load(self):
+        c, x, y = self._classifier()
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'test.dat')
+            c.save_to_file(filename)
+            self.assertTrue(os.path.exists(filename + '.linear.npz'))
+
+            c2 = ImageClassifier(num_classes=3)
+            c2.load_from_file(filename)
+            self.assertIsNone(c2._svm_dict)
+            self.assertTrue(np.array_equal(c2.predict_index(x),
+                                           c.predict_index(x)))
+
+            # Fall back to the SVMs without the compiled model.
+            os.remove(filename + '.linear.npz')
+            c3 = ImageClassifier(num_classes=3)
+            c3.load_from_file(filename)
+            self.assertEqual(len(c3._svm_dict), 3)
+            self.assertTrue(np.array_equal(c3.predict_index(x),
+                                           c.predict_index(x)))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
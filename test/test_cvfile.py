@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for CVFile.
+#  Usage:
+#    python ./test_cvfile.py
+#  or
+#    py.test ./test_cvfile.py
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ikalog.inputs import CVFile, GStreamer
+
+
+class TestCVFile(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._filename = os.path.join(self._tmpdir, 'video.avi')
+
+        # 3 seconds at 10 fps. Frame n is filled with n * 8.
+        writer = cv2.VideoWriter(
+            self._filename, cv2.VideoWriter_fourcc(*'MJPG'), 10, (1280, 720))
+        if not writer.isOpened():
+            self.skipTest('VideoWriter is not available')
+        for i in range(30):
+            writer.write(np.full((720, 1280, 3), i * 8, dtype=np.uint8))
+        writer.release()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _read_all(self, prefetch_frames=0, frame_rate=None, pos_msec=0,
+                  seek_threshold_msec=None):
+        source = CVFile()
+        source.set_prefetch(prefetch_frames)
+        source.select_source(name=self._filename)
+        source.set_frame_rate(frame_rate)
+        source.set_seek_threshold(seek_threshold_msec)
+        source.set_pos_msec(pos_msec)
+
+        frames = []
+        try:
+            while True:
+                img = source.read_frame()
+                frames.append(
+                    (round(img[0, 0, 0] / 8), source.get_current_timestamp()))
+        except EOFError:
+            pass
+        return frames
+
+    def test_prefetch(self):
+        frames = self._read_all(0)
+        frames_prefetched = self._read_all(8)
+        self.assertEqual(len(frames), 30)
+
+        # The first frame has no timestamp (falls back to the tick).
+        self.assertEqual(frames[1:], frames_prefetched[1:])
+        self.assertEqual(frames[0][0], frames_prefetched[0][0])
+
+    def test_prefetch_drop_oldest(self):
+        # Recorded videos never lose frames; GStreamer pipelines are live.
+        self.assertFalse(CVFile.prefetch_drop_oldest)
+        self.assertTrue(GStreamer.prefetch_drop_oldest)
+
+        source = CVFile()
+        source.set_prefetch(8, drop_oldest=True)
+        source.select_source(name=self._filename)
+        source.read_frame()
+        self.assertTrue(source._prefetcher._drop_oldest)
+        source.set_prefetch(0)
+
+    def test_frame_rate(self):
+        for prefetch_frames in (0, 8):
+            frames = self._read_all(
+                prefetch_frames, frame_rate=2, pos_msec=500)
+
+            self.assertEqual(
+                [n for n, msec in frames], [5, 11, 17, 23, 29])
+
+            # Frames have the timestamps of themselves.
+            for n, msec in frames:
+                self.assertAlmostEqual(msec, n * 100)
+
+    def test_seek(self):
+        for prefetch_frames in (0, 8):
+            frames = self._read_all(
+                prefetch_frames, frame_rate=2, pos_msec=500,
+                seek_threshold_msec=300)
+
+            self.assertEqual(
+                frames, [(5, 500), (10, 1000), (15, 1500), (20, 2000),
+                         (25, 2500)])
+
+    def test_end_pos_msec(self):
+        source = CVFile()
+        source.select_source(name=self._filename)
+        source.set_pos_msec(1000)
+        source.set_end_pos_msec(2000)
+
+        frames = []
+        with self.assertRaises(EOFError):
+            while True:
+                frames.append(source.read_frame())
+        self.assertEqual(len(frames), 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
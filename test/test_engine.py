@@ -25,15 +25,22 @@
 #  or
 #    py.test ./test_engine.py
 
+import json
 import unittest
 import os.path
+import shutil
 import sys
+import tempfile
 import time
+from unittest import mock
 
 # Append the Ikalog root dir to sys.path to import IkaUtils.
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 import ikalog.engine
 from ikalog.utils import *
+from ikalog.utils.latency import get_latency_metrics
+from ikalog.scenes.scheduler import PHASE_BATTLE, PHASE_RESULT
+from ikalog.scenes.v3.game.finish import Spl3GameFinish
 
 class TestEngine(unittest.TestCase):
     def test_reset(self):
@@ -83,5 +90,129 @@ class TestEngine(unittest.TestCase):
                             engine.context['game']['kills'])
 
 
+
+class EventPlugin(object):
+
+    def on_game_start(self, context):
+        self.events.append('on_game_start')
+
+    def __init__(self):
+        self.events = []
+
+
+class UncaughtEventPlugin(object):
+
+    def on_uncaught_event(self, event_name, context):
+        self.events.append(event_name)
+
+    def __init__(self):
+        self.events = []
+
+
+class TestEngineDispatch(unittest.TestCase):
+
+    def _engine(self):
+        with mock.patch.object(ikalog.engine, 'initialize_scenes',
+                               return_value=[]):
+            return ikalog.engine.IkaEngine()
+
+    def test_dispatch_table(self):
+        engine = self._engine()
+        plugin = EventPlugin()
+        uncaught = UncaughtEventPlugin()
+        engine.set_plugins([plugin, uncaught])
+
+        handlers = engine._dispatch_table['on_game_start']
+        # The engine itself comes first.
+        self.assertEqual([h[0] for h in handlers],
+                         [engine, plugin, uncaught])
+        self.assertEqual([h[2] for h in handlers], [False, False, True])
+
+        engine.call_plugins('on_game_start')
+        engine.call_plugins('on_some_new_event')
+        self.assertEqual(plugin.events, ['on_game_start'])
+        self.assertEqual(uncaught.events,
+                         ['on_initialize_plugin', 'on_game_start',
+                          'on_some_new_event'])
+
+    def test_no_subscribers(self):
+        engine = self._engine()
+        engine.set_plugins([EventPlugin()])
+
+        num_events = engine.num_dispatched_events
+        engine.call_plugins('on_nobody_listens')
+        self.assertEqual(engine._dispatch_table['on_nobody_listens'], [])
+        self.assertEqual(engine.num_dispatched_events, num_events)
+
+        engine.call_plugins('on_game_start')
+        self.assertEqual(engine.num_dispatched_events, num_events + 1)
+
+    def test_set_plugins_rebuilds_table(self):
+        engine = self._engine()
+        plugin1 = EventPlugin()
+        engine.set_plugins([plugin1])
+        engine.call_plugins('on_game_start')
+
+        plugin2 = EventPlugin()
+        engine.set_plugins([plugin2])
+        engine.call_plugins('on_game_start')
+
+        self.assertEqual(plugin1.events, ['on_game_start'])
+        self.assertEqual(plugin2.events, ['on_game_start'])
+
+    def test_handler_latency(self):
+        engine = self._engine()
+        engine.set_plugins([EventPlugin()])
+
+        hist = get_latency_metrics().histogram(
+            'ikalog_plugin_handler_seconds',
+            (('plugin', 'EventPlugin'), ('event', 'on_game_start')))
+        count = hist.count
+        engine.call_plugins('on_game_start')
+        self.assertEqual(hist.count, count + 1)
+
+    def test_trace(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            trace_file = os.path.join(tmpdir, 'trace.json')
+            engine = self._engine()
+            engine.enable_trace(trace_file)
+            engine.set_plugins([EventPlugin()])
+
+            engine.context['engine']['frame_index'] = 3
+            engine.context['engine']['msec'] = 1000
+            engine.call_plugins('on_game_start')
+            engine.disable_trace()
+
+            with open(trace_file) as f:
+                events = json.load(f)['traceEvents']
+        finally:
+            shutil.rmtree(tmpdir)
+
+        spans = {e['name']: e for e in events if e['ph'] == 'X'}
+        self.assertEqual(spans['on_game_start']['cat'], 'event')
+        self.assertEqual(spans['EventPlugin.on_game_start']['cat'], 'plugin')
+        self.assertEqual(spans['EventPlugin.on_game_start']['args'],
+                         {'frame': 3, 'msec': 1000})
+
+    def test_timer_reset_keeps_battle_phase(self):
+        engine = self._engine()
+        engine.set_plugins([])
+        finish = Spl3GameFinish.__new__(Spl3GameFinish)
+
+        engine.call_plugins('on_game_start')
+        self.assertEqual(engine.context['engine']['phase'], PHASE_BATTLE)
+
+        # The timer can't be read in the last minute or in overtime.
+        engine.call_plugins('on_game_timer_reset')
+        self.assertEqual(engine.context['engine']['phase'], PHASE_BATTLE)
+        self.assertTrue(engine._scheduler.schedule(finish, 0))
+
+        engine.call_plugins('on_game_finish')
+        self.assertEqual(engine.context['engine']['phase'], PHASE_RESULT)
+        self.assertTrue(engine._scheduler.schedule(finish, 1000))
+
+
+
 if __name__ == '__main__':
     unittest.main()
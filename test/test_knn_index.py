@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for KNNIndex.
+#  Usage:
+#    python ./test_knn_index.py
+#  or
+#    py.test ./test_knn_index.py
+
+import os
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ikalog.ml.knn_index import KNNIndex
+
+
+def _binary_dataset(n=40, dim=170, value=255):
+    rng = np.random.default_rng(0)
+    samples = (rng.random((n, dim)) < 0.3) * value
+    # Duplicates make a lot of ties.
+    samples = np.concatenate([samples, samples[:10]])
+    responses = rng.integers(ord('0'), ord('9') + 1, len(samples))
+    return samples, responses
+
+
+def _queries(samples, value=255):
+    rng = np.random.default_rng(1)
+    queries = samples[rng.integers(0, len(samples), 100)].copy()
+    flip = rng.random(queries.shape) < 0.05
+    queries[flip] = value - queries[flip]
+    queries[0] = 0
+    return queries
+
+
+class TestKNNIndex(unittest.TestCase):
+
+    def _assert_same_as_cv2(self, samples, responses, queries, binary):
+        model = cv2.ml.KNearest_create()
+        model.train(np.array(samples, np.float32), cv2.ml.ROW_SAMPLE,
+                    np.array(responses, np.float32))
+        index = KNNIndex(samples, responses)
+        self.assertEqual(index.is_binary(), binary)
+
+        for k in (1, 3, 5, 100):
+            retval, results, neigh_resp, dists = model.findNearest(
+                np.array(queries, np.float32), k)
+            results2, neigh_resp2, dists2 = index.find_nearest(queries, k)
+
+            self.assertTrue(np.array_equal(results.ravel(), results2))
+            self.assertTrue(np.array_equal(neigh_resp, neigh_resp2))
+            self.assertTrue(np.array_equal(dists, dists2))
+
+    def test_binary(self):
+        samples, responses = _binary_dataset()
+        self._assert_same_as_cv2(
+            samples, responses, _queries(samples), binary=True)
+
+    def test_binary_non_binary_query(self):
+        samples, responses = _binary_dataset(value=1)
+        queries = _queries(samples, value=1) * 0.5
+        self._assert_same_as_cv2(samples, responses, queries, binary=True)
+
+    def test_grayscale(self):
+        rng = np.random.default_rng(2)
+        samples = rng.integers(0, 256, (60, 208))
+        responses = rng.integers(0, 5, len(samples))
+        queries = (rng.random((50, 208)) < 0.5) * 255
+        self._assert_same_as_cv2(samples, responses, queries, binary=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
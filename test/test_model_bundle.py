@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for ModelBundle.
+#  Usage:
+#    python ./test_model_bundle.py
+#  or
+#    py.test ./test_model_bundle.py
+
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import ikalog.utils
+from ikalog.ml import model_bundle
+from ikalog.ml.classifier import ImageClassifier
+from ikalog.ml.model_bundle import ModelBundle, compile_models
+from ikalog.utils.character_recoginizer.character_rev2 import \
+    CharacterRecoginizer_rev2
+
+
+def _classifier():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 255, (60, 32)).astype(np.float32)
+    y = np.arange(60, dtype=np.int32) % 2
+    c = ImageClassifier(rect=(1, 2, 9, 6), num_classes=2, labels=['a', 'b'])
+    c.train(x, y)
+    return c, x
+
+
+class TestModelBundle(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._data_dir = os.path.join(self._tmpdir, 'data')
+        os.makedirs(os.path.join(self._data_dir, 'spl2'))
+        self._prev_bundle = model_bundle.set_bundle(ModelBundle(None))
+
+    def tearDown(self):
+        model_bundle.set_bundle(self._prev_bundle).close()
+        shutil.rmtree(self._tmpdir)
+
+    def _compile(self):
+        bundle_filename = os.path.join(self._tmpdir, 'models.bundle.npz')
+        models = compile_models(bundle_filename, self._data_dir)
+        model_bundle.set_bundle(ModelBundle(bundle_filename))
+        return models
+
+    def test_compile(self):
+        c, x = _classifier()
+        classifier_filename = os.path.join(self._data_dir, 'spl2', 'test.dat')
+        c.save_to_file(classifier_filename)
+
+        knn_filename = os.path.join(self._data_dir, 'test.model')
+        samples = np.array([[0, 255], [255, 0]], dtype=np.float64)
+        with open(knn_filename, 'wb') as f:
+            pickle.dump([samples, [ord('0'), ord('1')]], f)
+
+        self.assertEqual(self._compile(),
+                         sorted([classifier_filename, knn_filename]))
+
+        # The bundle is enough to load the models.
+        for filename in os.listdir(os.path.join(self._data_dir, 'spl2')):
+            os.remove(os.path.join(self._data_dir, 'spl2', filename))
+        os.remove(knn_filename)
+
+        c2 = ImageClassifier()
+        c2.load_from_file(classifier_filename)
+        self.assertEqual(c2._rect, (1, 2, 9, 6))
+        self.assertEqual(c2._labels, ['a', 'b'])
+        self.assertEqual(c2._num_classes, 2)
+        self.assertTrue(np.array_equal(c2.predict_index(x),
+                                       c.predict_index(x)))
+
+        r = CharacterRecoginizer_rev2()
+        r.load_model_from_file(knn_filename)
+        self.assertTrue(np.array_equal(r.samples, samples))
+        self.assertEqual(r.responses, [ord('0'), ord('1')])
+
+    def test_out_of_date(self):
+        knn_filename = os.path.join(self._data_dir, 'test.model')
+        with open(knn_filename, 'wb') as f:
+            pickle.dump([np.zeros((1, 2)), [0]], f)
+        self._compile()
+
+        self.assertIsNotNone(model_bundle.load_model_arrays(knn_filename))
+
+        t = time.time() + 10
+        os.utime(knn_filename, (t, t))
+        self.assertIsNone(model_bundle.load_model_arrays(knn_filename))
+
+    def test_version(self):
+        bundle_filename = os.path.join(self._tmpdir, 'models.bundle.npz')
+        np.savez(bundle_filename, **{
+            '__version__': np.array(model_bundle.BUNDLE_VERSION + 1),
+            'test.model/samples': np.zeros((1, 2)),
+        })
+        bundle = ModelBundle(bundle_filename)
+        self.assertIsNone(bundle.get('test.model'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for PluginWorker.
+#  Usage:
+#    python ./test_plugin_worker.py
+#  or
+#    py.test ./test_plugin_worker.py
+
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import ikalog.engine
+from ikalog.plugin_worker import *
+
+
+class RecordingPlugin(object):
+
+    def on_game_start(self, context):
+        self.events.append(('on_game_start', context['game']['index']))
+
+    def on_game_killed(self, context, params):
+        self.events.append(('on_game_killed', params['n']))
+
+    def on_game_dead(self, context, params):
+        raise Exception('on_game_dead')
+
+    def __init__(self, block=False):
+        self.events = []
+        self.thread_names = []
+        self.unblock = threading.Event()
+        if not block:
+            self.unblock.set()
+
+    def on_frame_next(self, context):
+        self.unblock.wait()
+        self.thread_names.append(threading.current_thread().name)
+        self.events.append(('on_frame_next', context['engine']['msec']))
+
+
+class KeyPressPlugin(object):
+
+    def on_frame_next(self, context):
+        if self._keys:
+            return self._keys.pop(0)
+
+    def on_key_press(self, context, *args):
+        # Called without the key if the engine has no key to pass.
+        self.keys.append(args)
+
+    def __init__(self, keys=None):
+        self.keys = []
+        self._keys = list(keys or [])
+
+
+def _call_plugin(plugin, event_name, params, debug=False, context=None):
+    # Same as IkaEngine.call_plugin() without exception handling.
+    try:
+        if params is None:
+            getattr(plugin, event_name)(context)
+        else:
+            getattr(plugin, event_name)(context, params)
+    except Exception:
+        pass
+
+
+def _context(msec=0, index=0):
+    return {'engine': {'msec': msec}, 'game': {'index': index}}
+
+
+class TestPluginWorker(unittest.TestCase):
+
+    def test_order(self):
+        plugin = RecordingPlugin()
+        worker = PluginWorker(plugin, _call_plugin)
+        worker.put('on_game_start', _context(index=1), None)
+        worker.put('on_game_dead', _context(), {})
+        worker.put('on_game_killed', _context(), {'n': 2})
+        worker.stop()
+
+        self.assertEqual(plugin.events,
+                         [('on_game_start', 1), ('on_game_killed', 2)])
+        self.assertFalse(worker.put('on_game_start', _context(), None))
+
+    def test_drop_oldest(self):
+        plugin = RecordingPlugin(block=True)
+        worker = PluginWorker(plugin, _call_plugin, queue_size=3)
+        for msec in range(10):
+            worker.put('on_frame_next', _context(msec=msec), None)
+        plugin.unblock.set()
+        worker.stop()
+
+        # The first event may have been taken before the queue was full.
+        msecs = [msec for event, msec in plugin.events]
+        self.assertEqual(msecs[-3:], [7, 8, 9])
+        self.assertTrue(worker.num_dropped_events >= 6)
+
+    def test_coalesce(self):
+        plugin = RecordingPlugin(block=True)
+        worker = PluginWorker(plugin, _call_plugin, overflow='coalesce')
+        for msec in range(10):
+            worker.put('on_frame_next', _context(msec=msec), None)
+            worker.put('on_game_killed', _context(), {'n': msec})
+        plugin.unblock.set()
+        worker.stop()
+
+        frames = [v for event, v in plugin.events if event == 'on_frame_next']
+        kills = [v for event, v in plugin.events if event == 'on_game_killed']
+        self.assertEqual(frames[-1], 9)
+        self.assertTrue(len(frames) <= 2)
+        self.assertEqual(kills[-1], 9)
+        self.assertEqual(worker.num_dropped_events, 0)
+
+    def test_event_snapshotter(self):
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        context = {
+            'engine': {'engine': self, 'frame': frame, 'msec': 100},
+            'game': {'index': 0, 'kills': 1},
+        }
+        params = {'list': [1, 2]}
+        snapshot, params_snapshot = EventSnapshotter().snapshot(
+            context, params)
+
+        context['game']['kills'] = 2
+        params['list'].append(3)
+
+        self.assertEqual(snapshot['game']['kills'], 1)
+        self.assertEqual(params_snapshot['list'], [1, 2])
+        self.assertIs(snapshot['engine']['engine'], self)
+        self.assertIs(snapshot['engine']['frame'], frame)
+
+
+class TestEngineAsyncPlugins(unittest.TestCase):
+
+    def test_dispatch(self):
+        with mock.patch.object(ikalog.engine, 'initialize_scenes',
+                               return_value=[]):
+            engine = ikalog.engine.IkaEngine()
+
+        plugin = RecordingPlugin()
+        plugin.async_dispatch = True
+        sync_plugin = RecordingPlugin()
+        engine.set_plugins([plugin, sync_plugin])
+
+        engine.context['engine']['msec'] = 100
+        engine.call_plugins('on_game_start')
+        engine._put_async_event('on_frame_next', None, engine.context)
+        engine.stop()
+
+        self.assertEqual(sync_plugin.events, [('on_game_start', 0)])
+        self.assertEqual(plugin.events,
+                         [('on_game_start', 0), ('on_frame_next', 100)])
+        self.assertTrue(plugin.thread_names[0].startswith('PluginWorker'))
+
+    def test_key_press(self):
+        with mock.patch.object(ikalog.engine, 'initialize_scenes',
+                               return_value=[]):
+            engine = ikalog.engine.IkaEngine()
+
+        plugin = KeyPressPlugin()
+        plugin.async_dispatch = True
+        key_plugin = KeyPressPlugin(keys=[None, ord('q')])
+        engine.set_plugins([plugin, key_plugin])
+
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        with mock.patch.object(engine, 'read_next_frame',
+                               return_value=(frame, 0)):
+            engine.process_frame()
+            engine.process_frame()
+        engine.stop()
+
+        # No on_key_press without the key.
+        self.assertEqual(plugin.keys, [(ord('q'),)])
+        self.assertEqual(key_plugin.keys, [(None,), (ord('q'),)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for FramePrefetcher.
+#  Usage:
+#    python ./test_prefetcher.py
+#  or
+#    py.test ./test_prefetcher.py
+
+import os
+import sys
+import threading
+import unittest
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ikalog.inputs.prefetcher import FramePrefetcher
+
+
+class TestFramePrefetcher(unittest.TestCase):
+
+    def _decode_func(self, num_frames, gate=None):
+        frames = iter(range(num_frames))
+
+        def decode():
+            if gate is not None:
+                gate.wait()
+            try:
+                n = next(frames)
+            except StopIteration:
+                raise EOFError()
+            return n, n * 100
+        return decode
+
+    def test_block(self):
+        prefetcher = FramePrefetcher(self._decode_func(20), 4)
+
+        for n in range(20):
+            self.assertEqual(prefetcher.get(), (n, n * 100))
+
+        with self.assertRaises(EOFError):
+            prefetcher.get()
+        self.assertEqual(prefetcher.num_dropped_frames, 0)
+
+    def test_drop_oldest(self):
+        prefetcher = FramePrefetcher(
+            self._decode_func(20), 4, drop_oldest=True)
+        prefetcher._thread.join()
+
+        # Only the latest frames and EOF remain.
+        for n in range(17, 20):
+            self.assertEqual(prefetcher.get()[0], n)
+        with self.assertRaises(EOFError):
+            prefetcher.get()
+        self.assertEqual(prefetcher.num_dropped_frames, 17)
+
+    def test_exception(self):
+        def decode():
+            raise ValueError()
+
+        prefetcher = FramePrefetcher(decode, 4)
+        with self.assertRaises(ValueError):
+            prefetcher.get()
+
+    def test_stop(self):
+        gate = threading.Event()
+        prefetcher = FramePrefetcher(self._decode_func(20, gate), 1)
+        gate.set()
+        prefetcher.stop()
+        self.assertFalse(prefetcher._thread.is_alive())
+
+    def test_stop_while_reading(self):
+        gate = threading.Event()
+        prefetcher = FramePrefetcher(self._decode_func(20, gate), 1)
+
+        result = []
+        reader = threading.Thread(
+            target=lambda: result.append(prefetcher.get()))
+        reader.start()
+
+        # The decoder is still blocked, so stop() waits for it.
+        stopper = threading.Thread(target=prefetcher.stop)
+        stopper.start()
+
+        reader.join(timeout=5.0)
+        self.assertFalse(reader.is_alive())
+        self.assertEqual(result, [(None, None)])
+
+        gate.set()
+        stopper.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
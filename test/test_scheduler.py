@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for SceneScheduler.
+#  Usage:
+#    python ./test_scheduler.py
+#  or
+#    py.test ./test_scheduler.py
+
+import os
+import sys
+import unittest
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ikalog.scenes.scene import Scene
+from ikalog.scenes.scheduler import *
+
+
+class BattleScene(Scene):
+    scene_phases = (PHASE_BATTLE,)
+
+
+class SlowScene(Scene):
+    scene_interval_msec = 250
+
+
+class TestSceneScheduler(unittest.TestCase):
+
+    def test_phases(self):
+        scheduler = SceneScheduler()
+        scene = BattleScene(None)
+        any_scene = Scene(None)
+
+        self.assertEqual(scheduler.phase, PHASE_LOBBY)
+        self.assertFalse(scheduler.schedule(scene, 0))
+        self.assertTrue(scheduler.schedule(any_scene, 0))
+
+        self.assertTrue(scheduler.set_phase(PHASE_BATTLE))
+        self.assertFalse(scheduler.set_phase(PHASE_BATTLE))
+        self.assertTrue(scheduler.schedule(scene, 0))
+
+        scheduler.reset()
+        self.assertEqual(scheduler.phase, PHASE_LOBBY)
+
+    def test_interval(self):
+        scheduler = SceneScheduler()
+        scene = SlowScene(None)
+
+        scheduled = [msec for msec in range(0, 1000, 100)
+                     if scheduler.schedule(scene, msec)]
+        self.assertEqual(scheduled, [0, 300, 600, 900])
+
+        # The timestamp went backwards (e.g. seeked).
+        self.assertTrue(scheduler.schedule(scene, 0))
+
+    def test_disabled(self):
+        scheduler = SceneScheduler(enabled=False)
+        self.assertTrue(scheduler.schedule(BattleScene(None), 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for TextReader.
+#  Usage:
+#    python ./test_text_reader.py
+#  or
+#    py.test ./test_text_reader.py
+
+import os
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ikalog.ml.text_reader import PerCharacter, TextReader
+
+
+def _text_image(text):
+    img = np.zeros((60, 260), dtype=np.uint8)
+    cv2.putText(img, text, (5, 45), cv2.FONT_HERSHEY_SIMPLEX, 1.4, 255, 4)
+    return img
+
+
+class TestTextReader(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.reader = TextReader()
+
+    def test_cut(self):
+        hist = np.array([0, 1, 1, 1, 1, 0, 1, 1, 0, 0, 1, 1, 1, 1, 1, 0, 1])
+        # Narrow runs are dropped, except for the last one.
+        self.assertEqual(PerCharacter().cut(None, hist),
+                         [(1, 4), (10, 14), (16, 16)])
+        self.assertEqual(PerCharacter().cut(None, np.zeros(5)), [])
+
+    def test_segment(self):
+        self.assertIsNone(self.reader.segment(np.zeros((10, 10), np.uint8)))
+        chars = self.reader.segment(_text_image('123'))
+        self.assertEqual(len(chars), 3)
+
+    def test_gray_model(self):
+        glyphs = self.reader.normalize(
+            self.reader.segment(_text_image('3:45')))
+        bgr = [cv2.cvtColor(g, cv2.COLOR_GRAY2BGR) for g in glyphs]
+
+        margins_bgr = self.reader._c.decision_function(bgr)
+        margins_gray = self.reader._c_gray.decision_function(glyphs)
+        self.assertTrue(np.allclose(margins_bgr, margins_gray, atol=1e-2))
+
+    def test_read_char_list(self):
+        imgs = [_text_image(t) for t in ('3:45', '12345', '')]
+        results = self.reader.read_char_list(imgs)
+
+        self.assertEqual(results[:2],
+                         [self.reader.read_char(img) for img in imgs[:2]])
+        self.assertIsNone(results[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for the benchmark harness.
+#  Usage:
+#    python ./test_benchmark.py
+#  or
+#    py.test ./test_benchmark.py
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils import benchmark
+from ikalog.utils.matcher import IkaMatcher
+from ikalog.utils.ikamatcher2.matcher import MultiClassIkaMatcher2 as MultiClassIkaMatcher
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_measure(self):
+        r = benchmark.measure(lambda: None, repeat=10, warmup=0)
+        self.assertEqual(r['repeat'], 10)
+        self.assertTrue(r['min'] <= r['p50'] <= r['p90'] <= r['p99'] <= r['max'])
+
+    def test_available_kernels(self):
+        names = [name for name, kernel_class in benchmark.available_kernels()]
+        self.assertIn('Numpy_uint8_fast', names)
+        self.assertIn('Numpy_1bit', names)
+
+    def test_matcher_sizes(self):
+        img = np.zeros((720, 1280), dtype=np.uint8)
+
+        class Scene(object):
+            def __init__(self, engine):
+                self.mask = IkaMatcher(0, 0, 100, 50, img=img)
+                self.masks = MultiClassIkaMatcher()
+                self.masks.add_mask(IkaMatcher(10, 10, 100, 50, img=img))
+                self.masks.add_mask(IkaMatcher(10, 10, 30, 20, img=img))
+
+        class BrokenScene(object):
+            def __init__(self, engine):
+                raise FileNotFoundError()
+
+        self.assertEqual(benchmark.matcher_sizes([Scene, BrokenScene]),
+                         [(100, 50), (30, 20)])
+        self.assertEqual(
+            benchmark.matcher_sizes([Scene], max_sizes=1), [(100, 50)])
+
+    def test_mask_sizes(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(tmpdir, 'ja'))
+            # Full frames with the regions painted, and an empty mask.
+            rects = [(10, 20, 100, 50), (300, 0, 100, 50), (5, 5, 30, 20),
+                     None]
+            for i, rect in enumerate(rects):
+                img = np.zeros((720, 1280), dtype=np.uint8)
+                if rect is not None:
+                    x, y, w, h = rect
+                    img[y: y + h, x: x + w] = 255
+                cv2.imwrite(os.path.join(tmpdir, 'ja', '%d.png' % i), img)
+
+            self.assertEqual(benchmark.mask_sizes(tmpdir),
+                             [(100, 50), (30, 20)])
+            self.assertEqual(benchmark.mask_sizes(tmpdir, max_sizes=1),
+                             [(100, 50)])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_run_and_compare(self):
+        report = benchmark.run(
+            suites=['kernels'], mask_dir='/nonexistent', repeat=2)
+        report = json.loads(json.dumps(report))
+        self.assertTrue(report['results'])
+
+        self.assertEqual(benchmark.compare(report, report), [])
+
+        slower = dict(report, results=[
+            dict(r, p50=r['p50'] * 2 + 1.0) for r in report['results']])
+        regressions = benchmark.compare(report, slower)
+        self.assertEqual(len(regressions), len(report['results']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2015 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for ColorLUT.
+#  Usage:
+#    python ./test_color_lut.py
+#  or
+#    py.test ./test_color_lut.py
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+import cv2
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.image_filters import *
+from ikalog.utils.image_filters import color_lut
+from ikalog.utils.image_filters.color_lut import ColorLUT
+
+
+def _filters():
+    return [
+        MM_WHITE(),
+        MM_NOT_WHITE(),
+        MM_WHITE(sat=(0, 96), visibility=(150, 255)),
+        MM_COLOR_BY_HUE(hue=(30 - 5, 30 + 5), visibility=(200, 255)),
+        MM_NOT_COLOR_BY_HUE(hue=(120 - 5, 120 + 5), visibility=(100, 255)),
+    ]
+
+
+def _random_image():
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    # Add some white and yellow pixels.
+    img[:40] = np.maximum(img[:40], 220)
+    img[40:60, :, 0] = img[40:60, :, 0] // 4
+    return img
+
+
+class TestColorLUT(unittest.TestCase):
+
+    def test_filters(self):
+        img = _random_image()
+        img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+
+        for f in _filters():
+            img_hsv_result = f(img_bgr=img)
+            self.assertTrue(np.array_equal(f(img_hsv=img_hsv), img_hsv_result))
+
+            self.assertTrue(f.enable_color_lut())
+            img_lut_result = f(img_bgr=img)
+            self.assertTrue(np.array_equal(img_lut_result, img_hsv_result))
+
+            # Cropped (non-contiguous) image.
+            self.assertTrue(np.array_equal(f(img_bgr=img[10:50, 20:90]),
+                                           img_hsv_result[10:50, 20:90]))
+
+    def test_masks(self):
+        img = _random_image()
+        filters = _filters()
+        lut = ColorLUT([f._match_bgr for f in filters])
+
+        masks = lut.masks(img)
+        self.assertEqual(len(masks), len(filters))
+        for f, mask in zip(filters, masks):
+            self.assertTrue(np.array_equal(mask, f._match_bgr(img)))
+
+        img_packed = lut.lookup(img)
+        self.assertTrue(np.array_equal(lut.mask(img_packed, 1, invert=True),
+                                       255 - masks[1]))
+
+    def test_quantized(self):
+        # Colors at the center of the cells give the same result.
+        rng = np.random.default_rng(1)
+        img = (rng.integers(0, 32, (64, 64, 3), dtype=np.uint8) << 3) | 4
+
+        for f in _filters():
+            lut = ColorLUT([f._match_bgr], bits=5)
+            self.assertTrue(np.array_equal(lut(img), f._match_bgr(img)))
+
+    def test_shared_luts_full(self):
+        with mock.patch.object(color_lut, '_shared_luts', []), \
+                mock.patch.object(color_lut, '_shared_filters', {}), \
+                mock.patch.object(color_lut, 'MAX_SHARED_LUTS', 1), \
+                mock.patch.object(color_lut, 'ColorLUT',
+                                  lambda: ColorLUT(bits=2)):
+            filters = [MM_WHITE(visibility=(200 + i, 256)) for i in range(9)]
+            self.assertTrue(all(f.enable_color_lut() for f in filters[:8]))
+
+            # No more filters are compiled; the filter stays in HSV.
+            img = _random_image()
+            self.assertFalse(filters[8].enable_color_lut())
+            self.assertTrue(np.array_equal(
+                filters[8](img_bgr=img), filters[8]._match_bgr(img)))
+
+            # Compiled keys are still found.
+            self.assertTrue(
+                MM_WHITE(visibility=(200, 256)).enable_color_lut())
+
+    def test_too_many_filters(self):
+        lut = ColorLUT([MM_WHITE()._match_bgr] * 8, bits=2)
+        self.assertRaises(ValueError, lut.add, MM_WHITE()._match_bgr)
+
+
+if __name__ == '__main__':
+    unittest.main()
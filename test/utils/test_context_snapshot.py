@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for context snapshots.
+#  Usage:
+#    python ./test_context_snapshot.py
+#  or
+#    py.test ./test_context_snapshot.py
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils import IkaUtils
+from ikalog.utils.context_snapshot import *
+
+
+class TestContextSnapshot(unittest.TestCase):
+
+    def _context(self):
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        return {
+            'engine': {
+                'engine': self,
+                'service': {'call_plugins': print},
+                'frame': frame,
+                'frame_hd': None,
+                'msec': 100,
+                'exceptions_log': {'Scene': {'count': 1}},
+            },
+            'game': {
+                'index': 0,
+                'kills': 1,
+                'events': {'objective': [[0, 0], [320, 99]]},
+                'image_judge': np.ones((10, 10), dtype=np.uint8),
+            },
+            'lobby': {'type': 'private'},
+            'scenes': {},
+            'config': {},
+        }
+
+    def test_copy(self):
+        context = self._context()
+        snapshot = snapshot_context(context)
+
+        context['game']['kills'] = 2
+        context['game']['events']['objective'].append([640, 50])
+        context['engine']['exceptions_log']['Scene']['count'] = 2
+
+        self.assertEqual(snapshot['game']['kills'], 1)
+        self.assertEqual(len(snapshot['game']['events']['objective']), 2)
+        self.assertEqual(snapshot['engine']['exceptions_log']['Scene']['count'], 1)
+
+        # Images and the engine are shared.
+        self.assertIs(snapshot['engine']['frame'], context['engine']['frame'])
+        self.assertIs(snapshot['game']['image_judge'],
+                      context['game']['image_judge'])
+        self.assertIs(snapshot['engine']['engine'], self)
+
+    def test_drop_frames(self):
+        context = self._context()
+        snapshot = snapshot_context(context, frames=False, engine=False)
+
+        self.assertIsNone(snapshot['engine']['frame'])
+        self.assertIsNone(snapshot['engine']['engine'])
+        self.assertEqual(snapshot['engine']['service'], {})
+        self.assertEqual(snapshot['engine']['msec'], 100)
+
+    def test_structural_sharing(self):
+        context = self._context()
+        snapshot1 = snapshot_context(context)
+        snapshot2 = snapshot_context(context, prev=snapshot1)
+
+        # Nothing has changed.
+        self.assertIs(snapshot2['game'], snapshot1['game'])
+        self.assertIs(snapshot2['lobby'], snapshot1['lobby'])
+
+        context['game']['kills'] = 2
+        context['game']['image_judge'] = np.zeros((10, 10), dtype=np.uint8)
+        snapshot3 = snapshot_context(context, prev=snapshot2)
+
+        self.assertIsNot(snapshot3['game'], snapshot2['game'])
+        self.assertEqual(snapshot3['game']['kills'], 2)
+        self.assertIs(snapshot3['game']['image_judge'],
+                      context['game']['image_judge'])
+        self.assertIs(snapshot3['game']['events'], snapshot2['game']['events'])
+        self.assertIs(snapshot3['lobby'], snapshot2['lobby'])
+
+        # The previous snapshots are not modified.
+        self.assertEqual(snapshot2['game']['kills'], 1)
+
+    def test_copy_context(self):
+        context = self._context()
+        copied = IkaUtils.copy_context(context)
+
+        self.assertIsNone(copied['engine']['frame'])
+        self.assertIsNone(copied['engine']['engine'])
+        self.assertEqual(copied['game']['kills'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
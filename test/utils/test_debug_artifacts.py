@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2015 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for DebugArtifacts.
+#  Usage:
+#    python ./test_debug_artifacts.py
+#  or
+#    py.test ./test_debug_artifacts.py
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.debug_artifacts import DebugArtifacts
+
+
+def _files(dirname):
+    r = []
+    for root, dirs, files in os.walk(dirname):
+        r.extend(os.path.relpath(os.path.join(root, f), dirname)
+                 for f in files)
+    return sorted(r)
+
+
+class TestDebugArtifacts(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def test_disabled(self):
+        artifacts = DebugArtifacts()
+        self.assertFalse(artifacts.submit('test', np.zeros((4, 4))))
+        self.assertEqual(_files(self._tmpdir), [])
+
+    def test_write(self):
+        artifacts = DebugArtifacts()
+        artifacts.enable(self._tmpdir, min_interval=0)
+
+        img = np.zeros((4, 6, 3), dtype=np.uint8)
+        self.assertTrue(artifacts.submit('timer/default', img, msec=1234))
+        # The image is copied on submit.
+        img[:] = 255
+        self.assertTrue(artifacts.submit('paint counter', img))
+        artifacts.disable()
+
+        files = _files(self._tmpdir)
+        self.assertEqual(len(files), 2)
+        self.assertTrue(files[0].startswith('paint_counter' + os.sep))
+        self.assertTrue(files[1].startswith(os.path.join('timer', 'default')))
+        self.assertTrue(files[1].endswith('_1234ms.png'))
+        self.assertEqual(artifacts.num_written, 2)
+
+        img2 = cv2.imread(os.path.join(self._tmpdir, files[1]))
+        self.assertEqual(img2.shape, (4, 6, 3))
+        self.assertEqual(img2.max(), 0)
+
+    def test_sampling(self):
+        artifacts = DebugArtifacts()
+        artifacts.enable(self._tmpdir, sample_every=3, min_interval=0)
+        accepted = [artifacts.submit('a', np.zeros((2, 2))) for i in range(7)]
+        artifacts.disable()
+        self.assertEqual(accepted,
+                         [True, False, False, True, False, False, True])
+
+    def test_rate_limit(self):
+        artifacts = DebugArtifacts()
+        artifacts.enable(self._tmpdir, min_interval=3600)
+        self.assertTrue(artifacts.submit('a', np.zeros((2, 2))))
+        self.assertFalse(artifacts.submit('a', np.zeros((2, 2))))
+        # Names are limited independently.
+        self.assertTrue(artifacts.submit('b', np.zeros((2, 2))))
+        artifacts.disable()
+        self.assertEqual(len(_files(self._tmpdir)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for FrameView.
+#  Usage:
+#    python ./test_frame_view.py
+#  or
+#    py.test ./test_frame_view.py
+
+import os
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils import FrameView, get_frame_view
+from ikalog.utils.image_filters import *
+from ikalog.utils.ikamatcher2.matcher import IkaMatcher2
+
+
+class TestFrameView(unittest.TestCase):
+
+    def _random_frame(self):
+        np.random.seed(0)
+        return np.random.randint(0, 256, (720, 1280, 3), dtype=np.uint8)
+
+    def test_planes_are_memoized(self):
+        view = FrameView(self._random_frame())
+        self.assertIs(view.gray, view.gray)
+        self.assertIs(view.hsv, view.hsv)
+        self.assertIs(view.resize((128, 72)), view.resize((128, 72)))
+
+    def test_crop_matches_converted_crop(self):
+        frame = self._random_frame()
+        view = FrameView(frame)
+
+        img_roi = frame[100: 150, 200: 300]
+        img_hsv = cv2.cvtColor(img_roi, cv2.COLOR_BGR2HSV)
+        img_gray = cv2.cvtColor(img_roi, cv2.COLOR_BGR2GRAY)
+
+        self.assertTrue(np.array_equal(
+            view.crop(200, 100, 100, 50, plane='hsv'), img_hsv))
+        self.assertTrue(np.array_equal(
+            view.crop(200, 100, 100, 50, plane='gray'), img_gray))
+
+    def test_crop_hd(self):
+        frame = self._random_frame()
+        frame_hd = cv2.resize(frame, (1920, 1080))
+
+        for x, y, w, h in ((900, 48, 120, 53), (1496, 52, 167, 67),
+                           (0, 0, 1920, 1080), (1, 2, 5, 7),
+                           (1917, 1077, 3, 3)):
+            view = FrameView(frame)
+            self.assertTrue(np.array_equal(
+                view.crop_hd(x, y, w, h), frame_hd[y: y + h, x: x + w]))
+
+    def test_get_frame_view(self):
+        frame = self._random_frame()
+        context = {'engine': {'frame': frame}}
+
+        view = get_frame_view(context)
+        self.assertIs(view.bgr, frame)
+        self.assertIs(get_frame_view(context), view)
+
+        # Replacing the frame invalidates the view.
+        context['engine']['frame'] = frame.copy()
+        self.assertIsNot(get_frame_view(context), view)
+
+    def test_matcher_with_frame_view(self):
+        frame = self._random_frame()
+        cv2.rectangle(frame, (10, 10), (90, 90), (255, 255, 255), 3)
+        img_mask = np.zeros((100, 100), dtype=np.uint8)
+        cv2.rectangle(img_mask, (10, 10), (90, 90), 255, 3)
+
+        for fg_method, bg_method in (
+                (MM_WHITE(), MM_NOT_WHITE()),
+                (MM_COLOR_BY_HUE(hue=(0, 180), visibility=(230, 255)),
+                 MM_DARK())):
+            mask = IkaMatcher2(
+                0, 0, 100, 100, img=img_mask,
+                fg_method=fg_method, bg_method=bg_method)
+
+            self.assertEqual(
+                mask.match_score(frame), mask.match_score(FrameView(frame)))
+
+
+if __name__ == '__main__':
+    unittest.main()
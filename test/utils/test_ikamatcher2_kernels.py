@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for IkaMatcher2 kernels.
+#  Usage:
+#    python ./test_ikamatcher2_kernels.py
+#  or
+#    py.test ./test_ikamatcher2_kernels.py
+
+import os
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.image_filters import *
+from ikalog.utils.ikamatcher2 import matcher
+from ikalog.utils.ikamatcher2.matcher import IkaMatcher2
+from ikalog.utils.ikamatcher2.reference import *
+
+KERNELS = [Numpy_uint8, Numpy_uint8_fast, Numpy_1bit]
+
+
+def _f(value):
+    # Ratios may be numpy scalars or arrays of a single element.
+    return np.asarray(value, dtype=np.float64).reshape(-1)[0]
+
+
+class TestKernels(unittest.TestCase):
+
+    def _truth_table(self, kernel_class, w, h):
+        # Each pixel of the truth table (Mask, Image) is repeated to fill
+        # the image, so that the packed image has padding.
+        mask = np.zeros((h, w), dtype=np.uint8)
+        img = np.zeros((h, w), dtype=np.uint8)
+        mask.reshape(-1)[2::4] = 255
+        mask.reshape(-1)[3::4] = 255
+        img.reshape(-1)[1::2] = 255
+
+        kernel = kernel_class(w, h)
+        kernel.load_mask(mask)
+        return kernel, mask, kernel.encode(img), img
+
+    def test_logical_or(self):
+        for kernel_class in KERNELS:
+            kernel, mask, img_encoded, img = \
+                self._truth_table(kernel_class, 100, 30)
+            r = kernel.decode(kernel.logical_or(img_encoded))
+
+            self.assertTrue(np.array_equal(r, np.maximum(mask, img)),
+                            kernel_class)
+            self.assertEqual(int(kernel.logical_or_popcnt(img_encoded)[0]),
+                             np.count_nonzero(mask | img))
+
+    def test_logical_and(self):
+        for kernel_class in KERNELS:
+            kernel, mask, img_encoded, img = \
+                self._truth_table(kernel_class, 100, 30)
+            r = kernel.decode(kernel.logical_and(img_encoded))
+
+            self.assertTrue(np.array_equal(r, np.minimum(mask, img)),
+                            kernel_class)
+            self.assertEqual(int(kernel.logical_and_popcnt(img_encoded)[0]),
+                             np.count_nonzero(mask & img))
+
+    def test_encode_decode(self):
+        np.random.seed(0)
+        img = np.random.randint(0, 256, (30, 99), dtype=np.uint8)
+
+        kernel = Numpy_1bit(99, 30)
+        img_encoded = kernel.encode(img)
+        self.assertEqual(img_encoded.shape[0] % 16, 0)
+
+        expected = np.where(img >= kernel.popcnt_threshold, 255, 0)
+        self.assertTrue(np.array_equal(kernel.decode(img_encoded), expected))
+
+    def test_popcnt_type(self):
+        # The ratios must be computed in the same type among the kernels.
+        for kernel_class in KERNELS:
+            kernel, mask, img_encoded, img = \
+                self._truth_table(kernel_class, 100, 30)
+            r = kernel.logical_and_popcnt(img_encoded)
+            self.assertEqual(r.dtype, np.float32)
+            self.assertEqual(r.shape, (1,))
+
+    def test_match_score(self):
+        np.random.seed(0)
+        frame = np.random.randint(0, 256, (720, 1280, 3), dtype=np.uint8)
+        frame[100: 130, 100: 180] = 255
+
+        for i in range(8):
+            img_mask = np.zeros((60, 100), dtype=np.uint8)
+            x, y = np.random.randint(0, 80), np.random.randint(0, 40)
+            cv2.rectangle(img_mask, (x, y), (x + 20, y + 20), 255, -1)
+
+            results = []
+            for kernel_class in KERNELS:
+                mask = IkaMatcher2(
+                    90, 90, 100, 60, img=img_mask, threshold=0.1 * i,
+                    orig_threshold=0.05 * i, kernel_class=kernel_class)
+                results.append(mask.match_score(frame))
+
+            for r in results[1:]:
+                self.assertEqual(bool(r[0]), bool(results[0][0]))
+                self.assertEqual(_f(r[1]), _f(results[0][1]))
+                self.assertEqual(_f(r[2]), _f(results[0][2]))
+
+    def test_load_kernel(self):
+        default_kernel = matcher.default_kernel
+        try:
+            matcher.load_kernel('Numpy_1bit')
+            self.assertIs(matcher.default_kernel, Numpy_1bit)
+
+            mask = IkaMatcher2(0, 0, 10, 10,
+                               img=np.zeros((10, 10), dtype=np.uint8))
+            self.assertIsInstance(mask._kernel, Numpy_1bit)
+
+            with self.assertRaises(ValueError):
+                matcher.load_kernel('NoSuchKernel')
+        finally:
+            matcher.default_kernel = default_kernel
+
+
+if __name__ == '__main__':
+    unittest.main()
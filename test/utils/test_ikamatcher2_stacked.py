@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for stacked matching in MultiClassIkaMatcher2.
+#  Usage:
+#    python ./test_ikamatcher2_stacked.py
+#  or
+#    py.test ./test_ikamatcher2_stacked.py
+
+import os
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils import FrameView
+from ikalog.utils.image_filters import *
+from ikalog.utils.ikamatcher2.matcher import IkaMatcher2, MultiClassIkaMatcher2
+from ikalog.utils.ikamatcher2.stacked import popcnt_rows
+
+
+def _f(value):
+    # Ratios may be numpy scalars or arrays of a single element.
+    return np.asarray(value, dtype=np.float64).reshape(-1)[0]
+
+
+class TestMaskStack(unittest.TestCase):
+
+    def _random_frame(self, seed):
+        np.random.seed(seed)
+        frame = np.random.randint(0, 256, (720, 1280, 3), dtype=np.uint8)
+        # Some white and dark areas for the filters.
+        frame[100: 130, 100: 180] = 255
+        frame[130: 160, 100: 180] = 0
+        return frame
+
+    def _random_mask(self, seed):
+        np.random.seed(seed)
+        img = np.zeros((60, 100), dtype=np.uint8)
+        for i in range(5):
+            x, y = np.random.randint(0, 90), np.random.randint(0, 50)
+            cv2.rectangle(img, (x, y), (x + 20, y + 10), 255, -1)
+        return img
+
+    def _masks(self):
+        masks = []
+        for i in range(8):
+            masks.append(IkaMatcher2(
+                90, 90, 100, 60, img=self._random_mask(i),
+                threshold=0.1 * i, orig_threshold=0.05 * i,
+                label='white%d' % i))
+
+        masks.append(IkaMatcher2(
+            90, 90, 100, 60, img=self._random_mask(10),
+            threshold=None, orig_threshold=None, label='none'))
+
+        for i in range(4):
+            masks.append(IkaMatcher2(
+                90, 90, 100, 60, img=self._random_mask(20 + i),
+                fg_method=MM_DARK(), bg_method=MM_NOT_DARK(),
+                threshold=0.1, orig_threshold=0.5, label='dark%d' % i))
+
+        for i in range(2):
+            masks.append(IkaMatcher2(
+                90, 90, 100, 60, img=self._random_mask(30 + i),
+                fg_method=MM_COLOR_BY_HUE(hue=(0, 30), visibility=(100, 255)),
+                bg_method=MM_NOT_COLOR_BY_HUE(hue=(0, 30), visibility=(100, 255)),
+                threshold=0.01, orig_threshold=0.9, label='hue%d' % i))
+        return masks
+
+    def test_popcnt_rows(self):
+        np.random.seed(0)
+        img = np.random.randint(0, 256, (4, 100), dtype=np.uint8)
+        expected = np.unpackbits(img, axis=1).sum(axis=1)
+        self.assertTrue(np.array_equal(popcnt_rows(img), expected))
+
+    def test_match_scores(self):
+        masks = self._masks()
+        multi = MultiClassIkaMatcher2()
+        for mask in masks:
+            multi.add_mask(mask)
+
+        for seed in range(5):
+            frame = self._random_frame(seed)
+
+            for img in (frame, FrameView(frame)):
+                results = multi.match_scores(img)
+                self.assertEqual(len(results), len(masks))
+
+                for mask, result in zip(masks, results):
+                    expected = mask.match_score(frame)
+                    self.assertEqual(result[3], mask)
+                    self.assertEqual(bool(result[0]), bool(expected[0]))
+                    self.assertEqual(_f(result[1]), _f(expected[1]))
+                    self.assertEqual(_f(result[2]), _f(expected[2]))
+
+    def test_thresholds_on_boundary(self):
+        frame = self._random_frame(0)
+        img_mask = self._random_mask(0)
+
+        # Use the ratios themselves as the thresholds.
+        mask = IkaMatcher2(90, 90, 100, 60, img=img_mask)
+        fg_matched, fg_ratio, bg_ratio = mask.match_score(frame)
+
+        multi = MultiClassIkaMatcher2()
+        for threshold, orig_threshold in (
+                (_f(fg_ratio), _f(bg_ratio)),
+                (_f(fg_ratio) - 1e-7, _f(bg_ratio) - 1e-7)):
+            mask = IkaMatcher2(
+                90, 90, 100, 60, img=img_mask, threshold=threshold,
+                orig_threshold=orig_threshold)
+            multi.add_mask(mask)
+
+        for result, mask in zip(multi.match_scores(frame), multi._masks):
+            self.assertEqual(bool(result[0]), bool(mask.match(frame)))
+
+    def test_match_best(self):
+        masks = self._masks()
+        multi = MultiClassIkaMatcher2()
+        for mask in masks:
+            multi.add_mask(mask)
+
+        frame = self._random_frame(1)
+        ratio, best = multi.match_best(frame)
+
+        scores = [(_f(mask.match_score(frame)[1]), mask) for mask in masks
+                  if mask.match(frame)]
+        expected_ratio, expected_best = max(scores, key=lambda x: x[0])
+
+        self.assertIs(best, expected_best)
+        self.assertEqual(_f(ratio), expected_ratio)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2015 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for LatencyMetrics.
+#  Usage:
+#    python ./test_latency.py
+#  or
+#    py.test ./test_latency.py
+
+import os
+import sys
+import time
+import unittest
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+import ikalog.utils
+from ikalog.scenes.scene import Scene
+from ikalog.utils.latency import LatencyHistogram, LatencyMetrics, \
+    get_latency_metrics
+
+
+class SlowScene(Scene):
+
+    def match_no_cache(self, context):
+        time.sleep(0.02)
+        if self.other:
+            self.is_another_scene_matched(context, self.other)
+            self._call_plugins('on_test', {})
+        return True
+
+    def __init__(self, engine, other=None):
+        self.other = other
+        super(SlowScene, self).__init__(engine)
+
+
+class OtherScene(SlowScene):
+    pass
+
+
+class SlowEngine(object):
+
+    def find_scene_object(self, scene_name):
+        return self.scenes[scene_name]
+
+    def call_plugins(self, event_name, params=None):
+        metrics = get_latency_metrics()
+        metrics.enter()
+        time.sleep(0.03)
+        metrics.exit(None)
+
+    call_plugins_later = call_plugins
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_buckets(self):
+        hist = LatencyHistogram(buckets=(0.001, 0.01, 0.1))
+        for seconds in (0.0005, 0.001, 0.002, 0.05, 1.0):
+            hist.observe(seconds)
+
+        self.assertEqual(hist.bucket_counts(), [2, 3, 4, 5])
+        self.assertEqual(hist.count, 5)
+        self.assertAlmostEqual(hist.sum, 1.0535)
+
+    def test_rolling_percentiles(self):
+        hist = LatencyHistogram(window=100)
+        self.assertIsNone(hist.percentiles())
+
+        for i in range(1000):
+            hist.observe(i)
+        # Only the latest 100 samples (900 - 999).
+        self.assertEqual(hist.percentiles((0.0, 0.5, 0.99, 1.0)),
+                         [900, 950, 999, 999])
+        self.assertEqual(hist.count, 1000)
+
+
+class TestLatencyMetrics(unittest.TestCase):
+
+    def test_exclusive_time(self):
+        engine = SlowEngine()
+        scene = SlowScene(engine, other='OtherScene')
+        other = OtherScene(engine)
+        engine.scenes = {'OtherScene': other}
+
+        scene.new_frame({})
+        other.new_frame({})
+        scene.match({'engine': {'msec': 0}})
+
+        # The nested scene (20ms) and the plugin handler (30ms) are not
+        # included in the scene.
+        self.assertGreaterEqual(scene._prof_time_took, 0.02)
+        self.assertLess(scene._prof_time_took, 0.04)
+        self.assertGreaterEqual(other._prof_time_took, 0.02)
+        self.assertEqual(scene._prof_histogram.count, 1)
+
+    def test_exception(self):
+        metrics = LatencyMetrics()
+        hist = metrics.histogram('test_seconds')
+
+        metrics.enter()
+        try:
+            metrics.enter()
+            raise ValueError()
+        except ValueError:
+            metrics.exit(None)
+        metrics.exit(hist, inclusive=True)
+        self.assertEqual(metrics._get_stack(), [])
+        self.assertEqual(hist.count, 1)
+
+    def test_format_prometheus(self):
+        metrics = LatencyMetrics(buckets=(0.01, 0.1), window=10)
+        metrics.observe('ikalog_frame_seconds', 0.05)
+        metrics.observe('ikalog_scene_seconds', 0.005,
+                        (('scene', 'Spl3"Scene'),))
+
+        text = metrics.format_prometheus(quantiles=(0.5,))
+        lines = text.splitlines()
+        self.assertIn('# TYPE ikalog_frame_seconds histogram', lines)
+        self.assertIn('ikalog_frame_seconds_bucket{le="0.01"} 0', lines)
+        self.assertIn('ikalog_frame_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('ikalog_frame_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn('ikalog_frame_seconds_count 1', lines)
+        self.assertIn(
+            'ikalog_scene_seconds_bucket{scene="Spl3\\"Scene",le="0.01"} 1',
+            lines)
+        self.assertIn('# TYPE ikalog_frame_seconds_rolling summary', lines)
+        self.assertIn(
+            'ikalog_frame_seconds_rolling{quantile="0.5"} 0.050000000', lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for PreviewLayer.
+#  Usage:
+#    python ./test_preview_layer.py
+#  or
+#    py.test ./test_preview_layer.py
+
+import os
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils import PreviewLayer
+
+
+class TestPreviewLayer(unittest.TestCase):
+
+    def test_render(self):
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        preview = PreviewLayer(frame)
+
+        preview.rectangle((10, 10), (90, 90), (0, 0, 255), thickness=2)
+        preview.put_text('IkaLog', (100, 100), cv2.FONT_HERSHEY_SIMPLEX,
+                         0.7, (255, 255, 255), 2)
+        preview.fill_rect((200, 200), (210, 205), (0, 255, 0))
+
+        img_expected = frame.copy()
+        cv2.rectangle(img_expected, (10, 10), (90, 90), (0, 0, 255), 2)
+        cv2.putText(img_expected, 'IkaLog', (100, 100),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        img_expected[200: 205, 200: 210] = (0, 255, 0)
+
+        img = preview.render()
+        self.assertTrue(np.array_equal(img, img_expected))
+
+        # The frame itself must not be modified.
+        self.assertEqual(np.max(frame), 0)
+
+    def test_render_incremental(self):
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        preview = PreviewLayer(frame)
+
+        preview.fill_rect((0, 0), (10, 10), (255, 255, 255))
+        img1 = preview.render()
+        preview.fill_rect((20, 20), (30, 30), (255, 255, 255))
+        img2 = preview.render()
+
+        self.assertIs(img1, img2)
+        self.assertEqual(np.sum(img2 > 0), 200 * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
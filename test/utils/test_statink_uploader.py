@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for StatInkUploader.
+#  Usage:
+#    python ./test_statink_uploader.py
+#  or
+#    py.test ./test_statink_uploader.py
+
+import http.server
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+import umsgpack
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.statink_uploader import *
+
+
+class StatInkHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+
+        status = server.statuses.pop(0) if server.statuses else 201
+        if status == 201:
+            server.payloads.append(umsgpack.unpackb(body))
+
+        self.send_response(status)
+        self.send_header(
+            'Location', 'https://stat.ink/battle/%d' % len(server.payloads))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestStatInkUploader(unittest.TestCase):
+
+    def setUp(self):
+        self._spool_dir = tempfile.mkdtemp()
+
+        self._server = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0), StatInkHandler)
+        self._server.statuses = []
+        self._server.payloads = []
+        self._url = 'http://127.0.0.1:%d/api/v2/battle' % \
+            self._server.server_address[1]
+
+        threading.Thread(target=self._server.serve_forever,
+                         daemon=True).start()
+
+    def tearDown(self):
+        self._server.shutdown()
+        self._server.server_close()
+        shutil.rmtree(self._spool_dir)
+
+    def _uploader(self):
+        return StatInkUploader(self._spool_dir, backoff_initial=0.05,
+                               backoff_max=0.2)
+
+    def test_prepare_payload(self):
+        body = prepare_payload({'map': 'ama'}, 'KEY', video_id='abc',
+                               dry_run=True)
+        self.assertIsInstance(body, bytes)
+        self.assertEqual(umsgpack.unpackb(body), {
+            'map': 'ama', 'apikey': 'KEY', 'test': 'dry_run',
+            'link_url': 'https://www.youtube.com/watch?v=abc'})
+
+    def test_upload(self):
+        results = []
+        uploader = self._uploader()
+        uploader.submit({'map': 'ama', 'image': b'\x00\xff'}, 'KEY',
+                        url=self._url,
+                        callback=lambda *args: results.append(args))
+
+        self.assertTrue(uploader.flush(timeout=10))
+        uploader.stop()
+
+        self.assertEqual(self._server.payloads[0]['image'], b'\x00\xff')
+        self.assertEqual(self._server.payloads[0]['apikey'], 'KEY')
+        self.assertEqual(
+            results, [(False, {'battle_url': 'https://stat.ink/battle/1'})])
+        self.assertEqual(uploader.pending(), [])
+
+    def test_retry(self):
+        self._server.statuses = [503, 503]
+        results = []
+        uploader = self._uploader()
+        uploader.submit({'map': 'ama'}, 'KEY', url=self._url,
+                        callback=lambda *args: results.append(args))
+
+        # flush() returns on failures, so wait for the callback.
+        for i in range(100):
+            if results:
+                break
+            uploader.flush(timeout=0.1)
+        uploader.stop()
+
+        self.assertEqual(len(self._server.payloads), 1)
+        self.assertFalse(results[0][0])
+
+    def test_client_error(self):
+        self._server.statuses = [400]
+        results = []
+        uploader = self._uploader()
+        uploader.submit({'map': 'ama'}, 'KEY', url=self._url,
+                        callback=lambda *args: results.append(args))
+        uploader.flush(timeout=10)
+        uploader.stop()
+
+        # Rejected payloads are not retried.
+        self.assertTrue(results[0][0])
+        self.assertEqual(uploader.pending(), [])
+
+    def test_drain_on_start(self):
+        # The server is down.
+        url = 'http://127.0.0.1:1/api/v2/battle'
+        uploader = self._uploader()
+        uploader.stop()
+        for i in range(3):
+            uploader.submit({'index': i}, 'KEY', url=url)
+        self.assertEqual(len(uploader.pending()), 3)
+
+        # Rewrite the URL of the spooled payloads to the local server.
+        for filename in uploader.pending():
+            path = os.path.join(self._spool_dir, filename)
+            with open(path, 'rb') as f:
+                entry = umsgpack.unpackb(f.read())
+            entry['url'] = self._url
+            with open(path, 'wb') as f:
+                f.write(umsgpack.packb(entry))
+
+        uploader = self._uploader()
+        self.assertTrue(uploader.flush(timeout=10))
+        uploader.stop()
+
+        self.assertEqual([p['index'] for p in self._server.payloads],
+                         [0, 1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
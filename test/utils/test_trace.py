@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2015 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for TraceRecorder.
+#  Usage:
+#    python ./test_trace.py
+#  or
+#    py.test ./test_trace.py
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.trace import TraceRecorder
+
+
+class TestTraceRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._filename = os.path.join(self._tmpdir, 'trace.json')
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _read(self):
+        with open(self._filename) as f:
+            return json.load(f)['traceEvents']
+
+    def test_spans(self):
+        tracer = TraceRecorder(self._filename)
+        outer = tracer.now()
+        inner = tracer.now()
+        tracer.add_span('inner', 'test', inner, {'frame': 1, 'msec': 33})
+        tracer.add_span('outer', 'test', outer)
+
+        t = threading.Thread(
+            target=lambda: tracer.add_span('worker', 'test', tracer.now()),
+            name='worker-thread')
+        t.start()
+        t.join()
+        tracer.close()
+
+        events = self._read()
+        spans = {e['name']: e for e in events if e['ph'] == 'X'}
+        self.assertEqual(spans['inner']['args'], {'frame': 1, 'msec': 33})
+        self.assertNotIn('args', spans['outer'])
+        self.assertLessEqual(spans['outer']['ts'], spans['inner']['ts'])
+        self.assertGreaterEqual(spans['outer']['dur'], spans['inner']['dur'])
+        self.assertNotEqual(spans['worker']['tid'], spans['outer']['tid'])
+
+        thread_names = [e['args']['name'] for e in events if e['ph'] == 'M']
+        self.assertIn('worker-thread', thread_names)
+
+    def test_rolling(self):
+        tracer = TraceRecorder(self._filename, max_events=10)
+        for i in range(25):
+            tracer.add_span('span%d' % i, 'test', tracer.now())
+        tracer.flush()
+        tracer.close()
+
+        names = [e['name'] for e in self._read() if e['ph'] == 'X']
+        self.assertEqual(names, ['span%d' % i for i in range(15, 25)])
+
+
+if __name__ == '__main__':
+    unittest.main()
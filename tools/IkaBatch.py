@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+# Analyze recorded video files with multiple processes.
+#
+# Usage:
+#   python3 tools/IkaBatch.py --segment_min 20 --output_json out.json \
+#       --statink_payload_dir payloads/ video1.mp4 video2.mp4
+
+import argparse
+import json
+import os
+import sys
+
+import umsgpack
+
+sys.path.append('.')
+
+from ikalog.batch import BatchRunner
+from ikalog.logger import init_logger
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('input_file', type=str, nargs='+',
+                        help='Input video files.')
+    parser.add_argument('--processes', '-j', dest='processes', type=int,
+                        help='Number of worker processes. '
+                        'Defaults to the number of CPUs.')
+    parser.add_argument('--segment_min', dest='segment_min', type=float,
+                        help='Split files into segments of about this '
+                        'length (in minutes) at blank frames.')
+    parser.add_argument('--frame_rate', dest='frame_rate', type=float,
+                        help='Frame rate to analyze.')
+    parser.add_argument('--output_json', '--json',
+                        dest='output_json', type=str)
+    parser.add_argument('--statink_payload_dir',
+                        dest='statink_payload_dir', type=str,
+                        help='Directory to write stat.ink payloads to.')
+
+    return vars(parser.parse_args())
+
+
+def write_events(results, filename):
+    records = []
+    for result in results:
+        for event in result['events']:
+            record = {'source_file': result['source_file']}
+            record.update(event)
+            records.append(record)
+
+    with open(filename, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def write_payloads(results, dirname):
+    os.makedirs(dirname, exist_ok=True)
+
+    n = 0
+    for result in results:
+        for payload in result['payloads']:
+            filename = os.path.join(dirname, 'statink_%04d.msgpack' % n)
+            with open(filename, 'wb') as f:
+                umsgpack.pack(payload, f)
+            n += 1
+
+
+if __name__ == '__main__':
+    init_logger()
+    args = get_args()
+
+    segment_msec = None
+    if args['segment_min']:
+        segment_msec = args['segment_min'] * 60 * 1000
+
+    runner = BatchRunner(
+        processes=args['processes'],
+        segment_msec=segment_msec,
+        frame_rate=args['frame_rate'],
+    )
+    results = runner.run(args['input_file'])
+
+    if args['output_json']:
+        write_events(results, args['output_json'])
+
+    if args['statink_payload_dir']:
+        write_payloads(results, args['statink_payload_dir'])
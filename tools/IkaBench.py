@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+# Benchmark IkaMatcher2 kernels, image filters and recognizers.
+#
+# Usage:
+#   python3 tools/IkaBench.py --output_json bench.json
+#   python3 tools/IkaBench.py --suite kernels --baseline bench.json
+#
+# Exits with status 1 if --baseline is given and any benchmark is slower
+# than the baseline by more than --tolerance.
+
+import argparse
+import json
+import sys
+
+sys.path.append('.')
+
+from ikalog.logger import init_logger
+from ikalog.utils import benchmark
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--suite', dest='suites', type=str, action='append',
+                        choices=sorted(benchmark.SUITES),
+                        help='Suite to run. Can be repeated. '
+                        'Defaults to all suites.')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=100)
+    parser.add_argument('--mask_dir', dest='mask_dir', type=str,
+                        default='masks',
+                        help='Directory of the masks to take the sizes from, '
+                        'if the scenes can\'t be initialized.')
+    parser.add_argument('--max_sizes', dest='max_sizes', type=int, default=5,
+                        help='Number of the most common matcher sizes to use.')
+    parser.add_argument('--output_json', '--json',
+                        dest='output_json', type=str)
+    parser.add_argument('--baseline', dest='baseline', type=str,
+                        help='JSON of a previous run to compare with.')
+    parser.add_argument('--tolerance', dest='tolerance', type=float,
+                        default=0.2,
+                        help='Allowed slowdown of p50 against the baseline.')
+
+    return vars(parser.parse_args())
+
+
+def print_report(report):
+    print('# %s numpy %s opencv %s kernels %s' % (
+        report['platform'], report['numpy'], report['opencv'],
+        ','.join(report['kernels'])))
+
+    for r in report['results']:
+        key = ' '.join('%s=%s' % kv for kv in benchmark.result_key(r))
+        print('%-70s p50 %9.3fms p90 %9.3fms p99 %9.3fms' % (
+            key, r['p50'], r['p90'], r['p99']))
+
+
+if __name__ == '__main__':
+    init_logger()
+    args = get_args()
+
+    report = benchmark.run(
+        suites=args['suites'],
+        mask_dir=args['mask_dir'],
+        max_sizes=args['max_sizes'],
+        repeat=args['repeat'],
+    )
+    print_report(report)
+
+    if args['output_json']:
+        with open(args['output_json'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args['baseline']:
+        with open(args['baseline']) as f:
+            baseline = json.load(f)
+
+        regressions = benchmark.compare(
+            baseline, report, tolerance=args['tolerance'])
+        for key, baseline_msec, msec in regressions:
+            print('REGRESSION %s: %.3fms -> %.3fms' % (
+                ' '.join('%s=%s' % kv for kv in key), baseline_msec, msec))
+
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2022 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  tools/compile_models.py compiles the models under data/ into
+#  data/models.bundle.npz, so IkaLog starts without parsing the SVMs and
+#  retraining the KNN models. Run it again after updating the models;
+#  models newer than the bundle are loaded from their sources.
+#  Usage:
+#    ./tools/compile_models.py [--output data/models.bundle.npz]
+
+import argparse
+import logging
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import ikalog.utils
+from ikalog.ml.model_bundle import compile_models, default_bundle_filename
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', dest='output', type=str,
+                        default=default_bundle_filename())
+    parser.add_argument('--data_dir', dest='data_dir', type=str,
+                        default=None)
+    return vars(parser.parse_args())
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    args = get_args()
+    models = compile_models(args['output'], args['data_dir'])
+    for filename in models:
+        print(filename)
+    print('%s: %d models' % (args['output'], len(models)))